@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Small in-process TTL cache for expensive, slowly-changing read results
+# (e.g. filtered row counts behind paginated admin lists).
+#
+#   cache.get_or_compute(key, compute)
+#       returns the cached value while it is younger than ttl_s, otherwise
+#       calls compute() and stores the result. compute() runs OUTSIDE the
+#       lock, so a slow count never blocks readers of other keys; two
+#       threads missing the same key at once may both compute it (last
+#       write wins — harmless for read-only results).
+#
+# Least recently used entries are evicted beyond max_entries. Per process:
+# every worker keeps its own copy, so values can differ between workers by
+# up to ttl_s. Only cache results that may be that stale.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class TTLCache:
+    def __init__(self, ttl_s: float, max_entries: int = 256):
+        self.ttl_s       = ttl_s
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()   # key → (expires_at, value)
+        self._lock       = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import tempfile
+import time
+import traceback
+from typing import Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Size-bounded LRU cache of generated files on local disk, shared by every
+# worker process on the host (generated reports: app/services/audit.py).
+#
+# An entry is one file  <sha256(name)[:24]>-<version><suffix>  in directory.
+# The version is whatever identifies the content (a digest of the source
+# rows); a new version of a name replaces the previous one.
+#
+#   lookup(name, version)   path of the cached file, or None. Bumps its
+#                           mtime — the LRU clock.
+#   store(name, version, data)
+#                           writes a temp file and renames it into place
+#                           (readers never see a partial file, concurrent
+#                           writers of one entry both produce the same
+#                           content), deletes older versions of the name,
+#                           then evicts least recently used files until the
+#                           directory is under max_bytes again.
+#
+# Nothing is held in memory: any worker sees the others' entries, and the
+# cache survives restarts. Cache I/O errors are logged and treated as a
+# miss — a full or read-only disk never fails the request itself.
+# ─────────────────────────────────────────────────────────────────────────────
+
+_STALE_TMP_S = 3600   # temp files older than this are leftovers of a crashed write
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix    = suffix
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _prefix(self, name: str) -> str:
+        return hashlib.sha256(name.encode()).hexdigest()[:24] + "-"
+
+    def path(self, name: str, version: str) -> str:
+        return os.path.join(self.directory, f"{self._prefix(name)}{version}{self.suffix}")
+
+    def lookup(self, name: str, version: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self.path(name, version)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            traceback.print_exc()
+            return None
+        return path
+
+    def store(self, name: str, version: str, data: bytes) -> Optional[str]:
+        """Cache data as name@version. Returns its path, or None if not cached."""
+        if not self.enabled:
+            return None
+        path = self.path(name, version)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                _unlink(tmp)
+                raise
+
+            prefix = self._prefix(name)
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.path != path:
+                        _unlink(entry.path)
+            self.evict()
+        except OSError:
+            traceback.print_exc()
+            return None
+        return path if os.path.exists(path) else None
+
+    def evict(self) -> int:
+        """Delete least recently used files until under max_bytes. Returns bytes freed."""
+        files = []
+        now   = time.time()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if now - stat.st_mtime > _STALE_TMP_S:
+                        _unlink(entry.path)
+                    continue
+                if entry.name.endswith(self.suffix):
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= self.max_bytes:
+                break
+            _unlink(path)
+            freed += size
+        return freed
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(self.suffix) or entry.name.endswith(".tmp"):
+                    _unlink(entry.path)
@@ -0,0 +1,380 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.core.pubsub import event_bus
+from app.database import SessionLocal, engine
+from app.models.job import IngestJob
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Background ingestion jobs.
+#
+# Upload endpoints called with ?background=true hand their parsed request
+# (spooled upload + filename, see app/core/upload_spool.py) to
+# `await jobs.submit()` and return 202 + job_id immediately. The pending
+# count and the insert of the job's row run on Starlette's thread pool, not
+# on the event loop.
+# The job body runs on a bounded thread pool with its OWN session, so:
+#   - no proxy timeout on large files
+#   - no request-scoped DB connection held while parsing
+#   - the event loop keeps serving barcode scans
+#
+# Job body contract:   fn(db, *args, progress=callback) -> dict
+#   progress(processed, total)   total may be None when unknown (streaming)
+#   raise HTTPException          → job "failed" with the detail as error
+#
+# Status: queued → running → complete | failed
+# Progress is readable via GET /jobs/{id} or pushed over /jobs/ws/{id}.
+#
+# A job runs on the uvicorn worker that accepted it, but its state is a row
+# of ingest_jobs (app/models/job.py), so every worker can report it and
+# finished jobs survive a restart:
+#
+#   - the row is written on submit, start and finish, and (PostgreSQL only,
+#     at most every JOB_PROGRESS_INTERVAL_S) on progress — on SQLite the
+#     job's own transaction holds the write lock. Every write publishes a
+#     "job" event (app/core/pubsub.py): /jobs/ws/{id} on another worker
+#     re-reads the row when it arrives.
+#   - the accepting worker refreshes heartbeat_at of its unfinished jobs
+#     every JOB_HEARTBEAT_S. An unfinished job whose heartbeat is older
+#     than JOB_STALE_S (on SQLite — one process — any unfinished job not
+#     running here) lost its worker to a restart or crash: it is reported
+#     and stored as failed. Jobs are not resumed; the client re-uploads.
+#   - INGEST_MAX_PENDING counts unfinished jobs across all workers.
+#   - finished jobs are deleted after JOB_RETENTION_DAYS (prune_jobs, at
+#     startup).
+#
+#   INGEST_WORKERS       job threads per uvicorn worker, default 2
+#   INGEST_MAX_PENDING   default 20
+#   JOB_RETENTION_DAYS   default 7
+# ─────────────────────────────────────────────────────────────────────────────
+
+INGEST_WORKERS     = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_PENDING_JOBS   = int(os.getenv("INGEST_MAX_PENDING", "20"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+MAX_KEPT_JOBS      = 500   # finished jobs of this worker kept in memory for status lookups
+
+JOB_PROGRESS_INTERVAL_S = 0.5
+JOB_HEARTBEAT_S         = 15.0
+JOB_STALE_S             = 4 * JOB_HEARTBEAT_S
+
+TERMINAL = ("complete", "failed")
+WORKER   = f"{socket.gethostname()}:{os.getpid()}"
+
+_LOST_WORKER = "The worker running this job stopped before it finished (restart or crash). Upload again."
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps come back naive on SQLite; they are UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class Job:
+    def __init__(self, kind: str, filename: Optional[str]):
+        self.id          = uuid.uuid4().hex
+        self.kind        = kind
+        self.filename    = filename
+        self.status      = "queued"
+        self.processed   = 0
+        self.total: Optional[int] = None
+        self.result: Optional[dict] = None
+        self.error       = None
+        self.worker      = WORKER
+        self.created_at  = _now()
+        self.started_at: Optional[datetime]  = None
+        self.finished_at: Optional[datetime] = None
+        self.heartbeat_at: Optional[datetime] = None
+        self._saved_at   = 0.0   # monotonic time of the last progress write
+
+    @classmethod
+    def from_row(cls, row: IngestJob) -> "Job":
+        job = cls.__new__(cls)
+        for column in IngestJob.__table__.columns:
+            value = getattr(row, column.name)
+            setattr(job, column.name, _utc(value) if isinstance(value, datetime) else value)
+        job._saved_at = 0.0
+        return job
+
+    def values(self) -> dict:
+        """Column values of the job's ingest_jobs row."""
+        return {
+            "id":           self.id,
+            "kind":         self.kind,
+            "filename":     self.filename,
+            "status":       self.status,
+            "processed":    self.processed,
+            "total":        self.total,
+            "result":       jsonable_encoder(self.result),
+            "error":        jsonable_encoder(self.error),
+            "worker":       self.worker,
+            "created_at":   self.created_at,
+            "started_at":   self.started_at,
+            "finished_at":  self.finished_at,
+            "heartbeat_at": self.heartbeat_at,
+        }
+
+    def lost(self) -> bool:
+        """Unfinished, but the worker that ran it is gone."""
+        if self.status in TERMINAL:
+            return False
+        if engine.dialect.name != "postgresql":
+            return True   # one process: an unfinished job not held in memory is from before a restart
+        beat = self.heartbeat_at or self.created_at
+        return _now() - beat > timedelta(seconds=JOB_STALE_S)
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id":      self.id,
+            "kind":        self.kind,
+            "filename":    self.filename,
+            "status":      self.status,
+            "progress":    {"processed": self.processed, "total": self.total},
+            "result":      self.result,
+            "error":       self.error,
+            "created_at":  self.created_at.isoformat(),
+            "started_at":  self.started_at.isoformat()  if self.started_at  else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int):
+        self._executor    = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat: Optional[threading.Thread] = None
+
+    # ── Submission ───────────────────────────────────────────────────────────
+
+    def _pending(self) -> int:
+        """Unfinished jobs across all workers (PostgreSQL) or in this process."""
+        if engine.dialect.name != "postgresql":
+            return sum(1 for j in list(self._jobs.values()) if j.status not in TERMINAL)
+        cutoff = _now() - timedelta(seconds=JOB_STALE_S)
+        with SessionLocal() as db:
+            return (
+                db.query(IngestJob)
+                  .filter(IngestJob.status.notin_(TERMINAL), IngestJob.heartbeat_at >= cutoff)
+                  .count()
+            )
+
+    async def submit(self, kind: str, fn: Callable, *args, filename: Optional[str] = None) -> Job:
+        """Queue fn (see header) and return its job once the row is stored. 503 when the queue is full."""
+        pending = await run_in_threadpool(self._pending)
+        if pending >= MAX_PENDING_JOBS:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Ingestion queue is full ({pending} jobs pending). Retry shortly."
+            )
+
+        self._loop = asyncio.get_running_loop()
+        job = Job(kind, filename)
+        job.heartbeat_at = job.created_at
+        await run_in_threadpool(self._store, job, True)
+        self._jobs[job.id] = job
+        self._trim()
+        self._start_heartbeat()
+
+        self._loop.create_task(self._run(job, fn, args))
+        return job
+
+    async def _run(self, job: Job, fn: Callable, args: tuple):
+        await self._loop.run_in_executor(self._executor, self._execute, job, fn, args)
+        self._publish(job)
+
+    def _execute(self, job: Job, fn: Callable, args: tuple):
+        """Runs on a pool thread."""
+        job.status     = "running"
+        job.started_at = _now()
+        self._store(job)
+        self._publish_threadsafe(job)
+
+        def progress(processed: int, total: Optional[int] = None):
+            job.processed = processed
+            if total is not None:
+                job.total = total
+            self._publish_threadsafe(job)
+            if engine.dialect.name == "postgresql" and time.monotonic() - job._saved_at >= JOB_PROGRESS_INTERVAL_S:
+                self._store(job)
+
+        db = SessionLocal()
+        try:
+            job.result = fn(db, *args, progress=progress)
+            job.status = "complete"
+        except HTTPException as e:
+            db.rollback()
+            job.error  = e.detail
+            job.status = "failed"
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            job.error  = str(e)
+            job.status = "failed"
+        finally:
+            db.close()
+            job.finished_at = _now()
+            self._store(job)
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+
+    def _store(self, job: Job, insert: bool = False) -> None:
+        """
+        Write the job's row and announce it to every worker. Only the insert
+        raises: a failed status write is logged, the job itself carries on.
+        """
+        job.heartbeat_at = _now()
+        try:
+            with SessionLocal() as db:
+                if insert:
+                    db.add(IngestJob(**job.values()))
+                else:
+                    db.query(IngestJob).filter(IngestJob.id == job.id).update(job.values(), synchronize_session=False)
+                event_bus.publish(db, "job", job_id=job.id, status=job.status)
+                db.commit()
+            job._saved_at = time.monotonic()
+        except Exception:
+            if insert:
+                raise
+            traceback.print_exc()
+
+    def _start_heartbeat(self) -> None:
+        if engine.dialect.name != "postgresql" or (self._heartbeat and self._heartbeat.is_alive()):
+            return
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self) -> None:
+        """Heartbeat thread: keep this worker's unfinished jobs from looking lost."""
+        while True:
+            time.sleep(JOB_HEARTBEAT_S)
+            ids = [j.id for j in list(self._jobs.values()) if j.status not in TERMINAL]
+            if not ids:
+                continue
+            try:
+                with SessionLocal() as db:
+                    db.query(IngestJob).filter(IngestJob.id.in_(ids), IngestJob.status.notin_(TERMINAL)) \
+                      .update({"heartbeat_at": _now()}, synchronize_session=False)
+                    db.commit()
+            except Exception:
+                traceback.print_exc()
+
+    # ── Lookup / subscription ────────────────────────────────────────────────
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """This worker's job, else the stored row (blocking: call off the event loop)."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        with SessionLocal() as db:
+            row = db.get(IngestJob, job_id)
+            if row is None:
+                return None
+            job = Job.from_row(row)
+            if job.lost():
+                job.status      = "failed"
+                job.error       = _LOST_WORKER
+                job.finished_at = _now()
+                db.query(IngestJob).filter(IngestJob.id == job_id, IngestJob.status.notin_(TERMINAL)) \
+                  .update({"status": job.status, "error": job.error, "finished_at": job.finished_at},
+                          synchronize_session=False)
+                db.commit()
+        return job
+
+    def is_local(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+
+    def _publish(self, job: Job):
+        snapshot = job.snapshot()
+        for queue in self._subscribers.get(job.id, []):
+            queue.put_nowait(snapshot)
+
+    def on_event(self, event: dict):
+        """
+        Bus handler: a job running on another worker changed (or events may
+        have been missed). Subscribers get None — re-read the row.
+        """
+        topic = event.get("topic")
+        if topic == "job":
+            targets = [event.get("job_id")]
+        elif topic == "resync":
+            targets = list(self._subscribers)
+        else:
+            return
+        for job_id in targets:
+            if job_id in self._jobs:
+                continue   # ours: subscribers already get every snapshot
+            for queue in self._subscribers.get(job_id, []):
+                queue.put_nowait(None)
+
+    def _publish_threadsafe(self, job: Job):
+        if self._loop is not None and job.id in self._subscribers:
+            self._loop.call_soon_threadsafe(self._publish, job)
+
+    def _trim(self):
+        while len(self._jobs) > MAX_KEPT_JOBS:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status not in TERMINAL:
+                break
+            self._jobs.pop(oldest_id)
+
+
+jobs = JobManager(INGEST_WORKERS)
+
+event_bus.subscribe(jobs.on_event)
+
+
+def prune_jobs(db: Session) -> int:
+    """Delete jobs finished more than JOB_RETENTION_DAYS ago. Returns rows deleted."""
+    if JOB_RETENTION_DAYS <= 0:
+        return 0
+    cutoff  = _now() - timedelta(days=JOB_RETENTION_DAYS)
+    deleted = (
+        db.query(IngestJob)
+          .filter(IngestJob.status.in_(TERMINAL), IngestJob.finished_at < cutoff)
+          .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def accepted(job: Job) -> dict:
+    """Standard 202 body returned by upload endpoints in background mode."""
+    return {
+        "status":     "Accepted",
+        "job_id":     job.id,
+        "status_url": f"/jobs/{job.id}",
+        "ws_url":     f"/jobs/ws/{job.id}",
+    }
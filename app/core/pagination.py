@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Tuple
+
+from fastapi import HTTPException
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Opaque keyset-pagination cursors.
+#
+# A cursor is the sort key of the last row on a page, e.g.
+# (registration_date, cell_id), as URL-safe base64 JSON. The next page is
+# "rows after this key" — an index range scan whose cost does not depend on
+# how deep the page is, unlike OFFSET, which reads and discards every
+# earlier row.
+#
+# Clients must treat the token as opaque and only send back next_cursor
+# exactly as received. A malformed token is a 400.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def encode_cursor(*values) -> str:
+    """Cursor for the row whose sort key is `values`."""
+    plain = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw   = json.dumps(plain, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, *types: type) -> Tuple:
+    """Sort key from a cursor; each value is converted to the matching type."""
+    try:
+        raw    = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong arity")
+        return tuple(
+            None if v is None else
+            t.fromisoformat(v) if t in (date, datetime) else t(v)
+            for v, t in zip(values, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,119 @@
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Parse pool for CPU-bound upload parsing (openpyxl + pandas).
+#
+# openpyxl is pure Python and holds the GIL, so a thread pool parses files
+# almost serially. The process backend sends raw bytes to worker processes
+# and gets compact column arrays back (no DataFrame pickling), so a
+# 250-file PDI batch scales with the number of cores.
+#
+#   PARSE_BACKEND              process (default) | thread
+#   PARSE_WORKERS              worker count, default = CPU count
+#   PARSE_MAX_TASKS_PER_CHILD  recycle a worker after N files (bounds
+#                              openpyxl / allocator growth), default 200;
+#                              needs Python 3.11+, ignored before
+#
+# Workers start from a forkserver that has already imported the reader
+# modules, so a new or recycled worker is ready in milliseconds without
+# forking the threaded web process. warm() starts them all up front.
+#
+# Worker functions must live in modules that do not touch the database
+# (app.services.upload_reader) and must return errors instead of raising,
+# so one bad file never aborts the rest of the batch.
+#
+# The same pool class, with its own workers and preload, renders audit
+# bundles (bundle_pool, app/core/report_pool.py).
+# ─────────────────────────────────────────────────────────────────────────────
+
+PARSE_BACKEND   = os.getenv("PARSE_BACKEND", "process").lower()
+PARSE_WORKERS   = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))
+PARSE_MAX_TASKS = int(os.getenv("PARSE_MAX_TASKS_PER_CHILD", "200"))
+
+_PRELOAD = ["app.services.upload_reader"]
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class ParsePool:
+    def __init__(self, backend: str, workers: int, max_tasks_per_child: int,
+                 preload: Optional[List[str]] = None, name: str = "parse"):
+        self.backend   = backend if backend in ("process", "thread") else "process"
+        self.workers   = max(1, workers)
+        self.max_tasks = max_tasks_per_child
+        self.name      = name
+        # One forkserver serves every pool: it preloads all pools' modules
+        _PRELOAD.extend(m for m in preload or [] if m not in _PRELOAD)
+        self._executor: Optional[Executor] = None
+        self._lock     = threading.Lock()
+
+    # ── Executor lifecycle ───────────────────────────────────────────────────
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create()
+            return self._executor
+
+    def _create(self) -> Executor:
+        if self.backend == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx    = multiprocessing.get_context(method)
+        if method == "forkserver":
+            ctx.set_forkserver_preload(_PRELOAD)
+
+        options = {"max_workers": self.workers, "mp_context": ctx}
+        if sys.version_info >= (3, 11) and self.max_tasks:
+            options["max_tasks_per_child"] = self.max_tasks
+        return ProcessPoolExecutor(**options)
+
+    def warm(self) -> None:
+        """Start every worker now instead of on the first upload."""
+        executor = self._get_executor()
+        for future in [executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # ── Mapping ──────────────────────────────────────────────────────────────
+
+    def map(self, fn: Callable, *iterables: Iterable) -> Iterator:
+        """
+        Ordered, lazy map over the pool. Items are sent in chunks (a few per
+        worker) to amortise inter-process round trips on small files. If a
+        worker dies, the pool is rebuilt and the remaining items run on a
+        thread pool, so the batch still completes.
+        """
+        items = list(zip(*iterables))
+        if not items:
+            return
+
+        chunksize = max(1, math.ceil(len(items) / (self.workers * 4)))
+
+        done = 0
+        try:
+            for result in self._get_executor().map(fn, *zip(*items), chunksize=chunksize):
+                done += 1
+                yield result
+        except BrokenProcessPool:
+            self.shutdown()
+            with ThreadPoolExecutor(max_workers=self.workers) as fallback:
+                yield from fallback.map(fn, *zip(*items[done:]))
+
+
+parse_pool = ParsePool(PARSE_BACKEND, PARSE_WORKERS, PARSE_MAX_TASKS)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import select
+import threading
+import traceback
+from typing import Callable, Iterable, List, Mapping, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Cross-worker change events over PostgreSQL LISTEN/NOTIFY.
+#
+# With several uvicorn workers each process has its own websocket hub, so an
+# upload handled by worker A used to refresh only A's screens. Now:
+#
+#   event_bus.publish(db, topic, **data)
+#       called by a write path INSIDE its transaction, next to the counter
+#       bump. On PostgreSQL it is a pg_notify(), which the server delivers
+#       at COMMIT — a rolled-back write publishes nothing, a committed one
+#       reaches every worker (the sender included). Events are compact JSON:
+#       {"topic": ..., "n": rows, "ids": [...] | {id: value}, ...} with ids
+#       capped at EVENT_MAX_IDS and the whole payload at EVENT_MAX_BYTES
+#       (NOTIFY's limit is 8000): beyond that ids and other list / dict
+#       details become null and consumers fall back to re-reading.
+#
+#   listener thread (one per worker)
+#       a dedicated connection, detached from the pool, that LISTENs on
+#       PUBSUB_CHANNEL and hands each event to the local handlers on the
+#       event loop. After a (re)connect it emits {"topic": "resync"}, as
+#       events may have been missed while it was down.
+#
+#   event_bus.subscribe(handler)
+#       handler(event) runs on the event loop; keep it cheap. Handlers: the
+#       dashboard refresher (app/core/signals.py) and the station event hub
+#       (app/core/websocket_manager.py).
+#
+# Any other dialect (local SQLite, single process) keeps the events on the
+# session and delivers them in-process after commit. Needs no extra service.
+#
+#   PUBSUB_CHANNEL   default maxtrace_events
+# ─────────────────────────────────────────────────────────────────────────────
+
+PUBSUB_CHANNEL  = os.getenv("PUBSUB_CHANNEL", "maxtrace_events")
+EVENT_MAX_IDS   = 200
+EVENT_MAX_BYTES = 7000
+_POLL_S         = 1.0    # listener wake-up interval (shutdown check)
+_RETRY_S        = 5.0    # wait before reconnecting after a lost connection
+_PENDING        = "pubsub_events"   # session.info key (non-PostgreSQL)
+
+
+def _compact(topic: str, ids, data: dict) -> dict:
+    event = {"topic": topic, **data}
+    if ids is not None:
+        ids          = dict(ids) if isinstance(ids, Mapping) else list(dict.fromkeys(ids))
+        event["n"]   = event.get("n", len(ids))
+        event["ids"] = ids if len(ids) <= EVENT_MAX_IDS else None
+    return event
+
+
+def _encode(event: dict) -> str:
+    payload = json.dumps(event, default=str, separators=(",", ":"))
+    if len(payload.encode()) > EVENT_MAX_BYTES:
+        event   = {k: None if isinstance(v, (list, dict)) else v for k, v in event.items()}
+        payload = json.dumps(event, default=str, separators=(",", ":"))
+    return payload
+
+
+class EventBus:
+    def __init__(self, channel: str):
+        self.channel   = channel
+        self._handlers: List[Callable[[dict], None]] = []
+        self._loop     = None
+        self._stop     = threading.Event()
+        self._thread   = None
+
+    # ── Publishing (write paths) ─────────────────────────────────────────────
+
+    def publish(
+        self,
+        db:    Session,
+        topic: str,
+        ids:   Union[Iterable[str], Mapping[str, object], None] = None,
+        **data,
+    ) -> None:
+        """
+        Queue a change event; it is delivered only if the transaction commits.
+        ids: affected ids, or {id: new value}. An event with no ids is not sent.
+        """
+        event = _compact(topic, ids, data)
+        if ids is not None and not event["n"]:
+            return
+        payload = _encode(event)
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload},
+            )
+        else:
+            db.info.setdefault(_PENDING, []).append(json.loads(payload))
+
+    # ── Delivery (every worker) ──────────────────────────────────────────────
+
+    def subscribe(self, handler: Callable[[dict], None]) -> None:
+        self._handlers.append(handler)
+
+    def start(self):
+        """Start delivering events on the running event loop (app startup)."""
+        self._loop = asyncio.get_running_loop()
+        if engine.dialect.name == "postgresql":
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._loop = None
+        if self._thread is not None:
+            self._thread.join(_POLL_S + 1)
+            self._thread = None
+
+    def deliver(self, event: dict) -> None:
+        """Hand an event to the local handlers (thread-safe)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:   # loop closed during shutdown
+            pass
+
+    def _dispatch(self, event: dict):
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                traceback.print_exc()
+
+    def _listen(self):
+        """Listener thread: LISTEN on a dedicated connection, reconnect on loss."""
+        while not self._stop.is_set():
+            conn = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()                     # ours for good; the pool opens a replacement
+                conn = raw.dbapi_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                self.deliver({"topic": "resync"})
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], _POLL_S) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        try:
+                            self.deliver(json.loads(note.payload))
+                        except ValueError:
+                            traceback.print_exc()
+            except Exception:
+                traceback.print_exc()
+                self._stop.wait(_RETRY_S)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+event_bus = EventBus(PUBSUB_CHANNEL)
+
+
+# ── In-process delivery (non-PostgreSQL) ──────────────────────────────────────
+
+@event.listens_for(Session, "after_commit")
+def _deliver_after_commit(session: Session):
+    for evt in session.info.pop(_PENDING, []):
+        event_bus.deliver(evt)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+from fastapi import HTTPException
+
+from app.core.parse_pool import PARSE_MAX_TASKS, ParsePool
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bounded executor for report rendering (audit workbooks, app/routers/
+# report_router.py).
+#
+# A workbook build is 100ms+ of pure-Python CPU (xlsxwriter + charts). Run
+# on the event loop it stalls every other request of the worker — barcode
+# scans included — for the whole build, and a burst of downloads for all
+# of them back to back. Instead report_pool.run() hands it
+# to a small dedicated thread pool:
+#
+#   REPORT_WORKERS      renders running at once, default 1. Renders hold the
+#                       GIL, so more threads do not render faster — they
+#                       only take more GIL time from the event loop. With
+#                       one, the loop always gets its share between slices.
+#   REPORT_MAX_QUEUED   renders waiting for a worker, default 16. Beyond
+#                       that the request gets a 503 instead of queueing for
+#                       minutes.
+#
+# run(..., key=) collapses concurrent renders of the same thing: later
+# callers await the render already in flight. Renders are never cancelled
+# when a client disconnects — the result still lands in the audit cache,
+# so the retry is a cache hit.
+#
+# stats() (GET /reports/render-queue) reports running / queued renders
+# and the time renders waited for a worker.
+#
+# Audit bundles (app/services/audit_bundle.py) render hundreds of
+# workbooks per request, so they use worker PROCESSES instead — bundle_pool,
+# a ParsePool (app/core/parse_pool.py) of its own whose workers preload
+# app.services.audit_workbook. Bundle renders run in parallel on every core
+# and never hold this process's GIL.
+#
+#   REPORT_BUNDLE_BACKEND   process (default) | thread
+#   REPORT_BUNDLE_WORKERS   default = CPU count
+# ─────────────────────────────────────────────────────────────────────────────
+
+REPORT_WORKERS    = int(os.getenv("REPORT_WORKERS", "1"))
+REPORT_MAX_QUEUED = int(os.getenv("REPORT_MAX_QUEUED", "16"))
+
+REPORT_BUNDLE_BACKEND = os.getenv("REPORT_BUNDLE_BACKEND", "process").lower()
+REPORT_BUNDLE_WORKERS = int(os.getenv("REPORT_BUNDLE_WORKERS", str(os.cpu_count() or 2)))
+
+
+class ReportPool:
+    def __init__(self, workers: int, max_queued: int):
+        self.workers    = max(1, workers)
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock      = threading.Lock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self._queued      = 0
+        self._running     = 0
+        self._completed   = 0
+        self._failed      = 0
+        self._rejected    = 0
+        self._joined      = 0
+        self._wait_last_s = 0.0
+        self._wait_max_s  = 0.0
+
+    # ── Executor lifecycle ───────────────────────────────────────────────────
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # ── Submission ───────────────────────────────────────────────────────────
+
+    async def run(self, fn: Callable, *args, key: Optional[Hashable] = None):
+        """fn(*args) on the pool. 503 if REPORT_MAX_QUEUED renders are already waiting."""
+        if key is not None and key in self._inflight:
+            self._joined += 1
+            return await asyncio.shield(self._inflight[key])
+
+        with self._lock:
+            if self._queued >= self.max_queued:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Report queue is full ({self._queued} reports waiting). Retry shortly."
+                )
+            self._queued += 1
+
+        loop   = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_executor(), self._call, time.monotonic(), fn, args)
+        # Never "exception was never retrieved" when every caller has gone
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if key is not None:
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def _call(self, submitted: float, fn: Callable, args: tuple):
+        """Runs on a pool thread."""
+        waited = time.monotonic() - submitted
+        with self._lock:
+            self._queued     -= 1
+            self._running    += 1
+            self._wait_last_s = waited
+            self._wait_max_s  = max(self._wait_max_s, waited)
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    # ── Metrics ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers":      self.workers,
+                "running":      self._running,
+                "queued":       self._queued,
+                "max_queued":   self.max_queued,
+                "completed":    self._completed,
+                "failed":       self._failed,
+                "rejected":     self._rejected,
+                "joined":       self._joined,
+                "wait_last_ms": round(self._wait_last_s * 1000, 1),
+                "wait_max_ms":  round(self._wait_max_s * 1000, 1),
+            }
+
+
+report_pool = ReportPool(REPORT_WORKERS, REPORT_MAX_QUEUED)
+
+bundle_pool = ParsePool(REPORT_BUNDLE_BACKEND, REPORT_BUNDLE_WORKERS, PARSE_MAX_TASKS,
+                        preload=["app.services.audit_workbook"], name="bundle")
@@ -0,0 +1,84 @@
+import traceback
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.database import Base
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Additive schema upgrades run at startup, after Base.metadata.create_all.
+#
+# create_all only creates missing TABLES — an index added to a model whose
+# table already exists is never created. ensure_indexes() creates every
+# index declared on the models that the database does not have yet.
+#
+# ensure_search_indexes() adds the PostgreSQL-only search indexes of
+# app/services/search.py, which cannot be declared on the models (they need
+# the pg_trgm extension and operator classes):
+#
+#   ix_trgm_<table>_<column>     GIN (column gin_trgm_ops)      substring
+#   ix_prefix_<table>_<column>   btree (upper(column) text_pattern_ops)  prefix
+#
+# If pg_trgm cannot be installed (no privilege) the trigram indexes are
+# skipped and substring search falls back to a sequential scan.
+#
+# Plain CREATE INDEX (not CONCURRENTLY): it briefly blocks writes to the
+# table, so new indexes on very large tables are best created by hand
+# before deploying.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# (table, column) → kinds of search index
+SEARCH_INDEXES = {
+    ("cells",            "cell_id"):    ("trgm", "prefix"),
+    ("batteries",        "battery_id"): ("trgm", "prefix"),
+    ("bms_inventory",    "bms_id"):     ("trgm", "prefix"),
+    ("dispatch_records", "invoice_id"): ("trgm", "prefix"),
+    ("cell_gradings",    "brand"):      ("trgm",),
+    ("cell_gradings",    "lot"):        ("trgm",),
+}
+
+_SEARCH_INDEX_DDL = {
+    "trgm":   "CREATE INDEX IF NOT EXISTS ix_trgm_{table}_{column} ON {table} USING gin ({column} gin_trgm_ops)",
+    "prefix": "CREATE INDEX IF NOT EXISTS ix_prefix_{table}_{column} ON {table} (upper({column}) text_pattern_ops)",
+}
+
+
+def ensure_indexes(engine: Engine) -> list:
+    """Create model-declared indexes missing from the database. Returns their names."""
+    inspector = inspect(engine)
+    tables    = set(inspector.get_table_names())
+    created   = []
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+
+    return created
+
+
+def ensure_search_indexes(engine: Engine) -> bool:
+    """Create the search indexes (PostgreSQL only). Returns False if pg_trgm is unavailable."""
+    if engine.dialect.name != "postgresql":
+        return False
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        trigram = True
+    except Exception:
+        traceback.print_exc()
+        trigram = False
+
+    with engine.begin() as conn:
+        for (table, column), kinds in SEARCH_INDEXES.items():
+            for kind in kinds:
+                if kind == "trgm" and not trigram:
+                    continue
+                conn.execute(text(_SEARCH_INDEX_DDL[kind].format(table=table, column=column)))
+    return trigram
@@ -1,8 +1,131 @@
-from app.routers.admin_router import manager, fetch_dashboard_stats
+import asyncio
+import os
+import traceback
+
+from app.routers.admin_router import fetch_dashboard_stats
 from app.database import SessionLocal
+from app.core.websocket_manager import dashboard_hub
+from app.core.pubsub import event_bus
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Live dashboard refresh, coalesced and off the request path.
+#
+# Write endpoints used to await a full dashboard recompute (own session +
+# fetch_dashboard_stats + broadcast) before responding, so at shift peak
+# every scan paid for it. Now:
+#
+#   trigger_dashboard_update()   marks the dashboard dirty and returns at
+#                                once — callable from the event loop or any
+#                                thread, never blocks, never raises. Write
+#                                paths do not call it: every change event
+#                                (app/core/pubsub.py) does, in every worker,
+#                                so a write on one worker refreshes the
+#                                screens connected to all of them.
+#
+#   dashboard_refresher          the single producer for every admin screen
+#                                (app/core/websocket_manager.py): waits until
+#                                the dashboard is dirty — or DASHBOARD_TICK_S
+#                                passed — then recomputes ONCE in a worker
+#                                thread and publishes to the hub. At most one
+#                                recompute per DASHBOARD_REFRESH_INTERVAL_S:
+#                                writes arriving sooner are folded into one
+#                                run at the end of the interval, so the
+#                                pushed figures always include the last write.
+#                                Nothing is computed while no admin screen
+#                                is connected; the hub's cached snapshot is
+#                                then stale and the next screen to connect
+#                                triggers a refresh.
+#
+#   DASHBOARD_REFRESH_INTERVAL_S   default 2
+#   DASHBOARD_TICK_S               default 30   (refresh even without writes)
+#
+# Started / stopped with the app (main.py). Until it is started (scripts,
+# one-off sessions) trigger_dashboard_update() is a no-op.
+# ─────────────────────────────────────────────────────────────────────────────
+
+DASHBOARD_REFRESH_INTERVAL_S = float(os.getenv("DASHBOARD_REFRESH_INTERVAL_S", "2"))
+DASHBOARD_TICK_S             = float(os.getenv("DASHBOARD_TICK_S", "30"))
 
-async def trigger_dashboard_update():
-    """Call this anywhere to refresh the admin dashboard live"""
+
+def _compute_dashboard() -> dict:
+    """Runs on a worker thread with its own session."""
     with SessionLocal() as db:
-        new_stats = await fetch_dashboard_stats(db)
-        await manager.broadcast({"success": True, "data": new_stats})
\ No newline at end of file
+        return fetch_dashboard_stats(db)
+
+
+class DashboardRefresher:
+    def __init__(self, interval_s: float, tick_s: float):
+        self.interval_s = interval_s
+        self.tick_s     = tick_s
+        self._loop      = None
+        self._dirty     = None    # asyncio.Event, created on the app's loop
+        self._task      = None
+        self._last_run  = float("-inf")
+
+    def start(self):
+        """Start the refresh task on the running event loop (app startup)."""
+        self._loop  = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        self._task  = self._loop.create_task(self._run())
+
+    async def stop(self):
+        task, self._task, self._loop = self._task, None, None
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def mark_dirty(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._dirty.set()
+            return
+        try:
+            loop.call_soon_threadsafe(self._dirty.set)
+        except RuntimeError:   # loop closed during shutdown
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), self.tick_s)
+            except asyncio.TimeoutError:
+                pass   # periodic tick
+
+            # Coalesce: writes arriving before the interval is up join this run
+            delay = self._last_run + self.interval_s - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._dirty.clear()
+            self._last_run = loop.time()
+
+            if not dashboard_hub.subscribers:
+                dashboard_hub.latest = None   # stale from here on
+                continue
+            try:
+                data = await loop.run_in_executor(None, _compute_dashboard)
+                dashboard_hub.publish(data)
+            except Exception:
+                traceback.print_exc()
+
+
+dashboard_refresher = DashboardRefresher(DASHBOARD_REFRESH_INTERVAL_S, DASHBOARD_TICK_S)
+
+
+def trigger_dashboard_update():
+    """Call this anywhere after a write to refresh the admin dashboard live."""
+    dashboard_refresher.mark_dirty()
+
+
+# Any committed change, on any worker (and a resync after a listener reconnect);
+# background-job status events (app/core/jobs.py) change no dashboard figure
+event_bus.subscribe(lambda event: event.get("topic") == "job" or trigger_dashboard_update())
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import BinaryIO, Callable, List, Optional
+
+from fastapi import HTTPException, UploadFile
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Upload spooling + per-process memory budget.
+#
+# `await file.read()` keeps the whole upload in RAM for the lifetime of the
+# request (or job), next to everything parsed from it. Instead:
+#
+#   spool_upload(file)   copies the upload to a temp file in SPOOL_BLOCK
+#                        blocks; readers get a file handle (upload.open())
+#                        or the path (parse-pool workers open it themselves),
+#                        so raw bytes live in the OS page cache, not the heap
+#
+#   upload_budget        caps the parse working set of all uploads running
+#                        in this worker process. Each upload reserves
+#                        size × UPLOAD_PARSE_FACTOR (xlsx unzips to several
+#                        times its size, plus the DataFrames) before it is
+#                        parsed; when the budget is used up, later uploads
+#                        wait up to UPLOAD_BUDGET_WAIT_S, then get a 503.
+#                        A single upload larger than the whole budget runs
+#                        alone instead of never running.
+#
+#   UPLOAD_MEMORY_BUDGET_MB   default 384   (per uvicorn worker)
+#   UPLOAD_PARSE_FACTOR       default 8
+#   UPLOAD_BUDGET_WAIT_S      default 60
+#   UPLOAD_SPOOL_DIR          default: system temp dir
+#
+# Spooled files are deleted when the upload is released (uploads_held*,
+# run_spooled), or at garbage collection if a caller forgets.
+# ─────────────────────────────────────────────────────────────────────────────
+
+UPLOAD_MEMORY_BUDGET_MB = int(os.getenv("UPLOAD_MEMORY_BUDGET_MB", "384"))
+UPLOAD_PARSE_FACTOR     = int(os.getenv("UPLOAD_PARSE_FACTOR", "8"))
+UPLOAD_BUDGET_WAIT_S    = float(os.getenv("UPLOAD_BUDGET_WAIT_S", "60"))
+UPLOAD_SPOOL_DIR        = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+SPOOL_BLOCK  = 1 << 20   # bytes copied per read from the request body
+_ASYNC_POLL  = 0.05      # seconds between budget checks on the event loop
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpooledUpload:
+    """One upload copied to a temp file on disk."""
+
+    def __init__(self, path: str, filename: Optional[str], size: int):
+        self.path      = path
+        self.filename  = filename
+        self.size      = size
+        self._finalize = weakref.finalize(self, _unlink, path)
+
+    @property
+    def cost(self) -> int:
+        """Bytes reserved from upload_budget while this upload is parsed."""
+        return self.size * UPLOAD_PARSE_FACTOR
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def close(self) -> None:
+        """Delete the temp file. Safe to call more than once."""
+        self._finalize()
+
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """Copy a request upload to a temp file without holding it in memory."""
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while block := await file.read(SPOOL_BLOCK):
+                out.write(block)
+                size += len(block)
+    except BaseException:
+        _unlink(path)
+        raise
+    return SpooledUpload(path, file.filename, size)
+
+
+# ── Memory budget ─────────────────────────────────────────────────────────────
+
+class MemoryBudget:
+    def __init__(self, limit_bytes: int, wait_s: float):
+        self.limit   = max(1, limit_bytes)
+        self.wait_s  = wait_s
+        self.used    = 0
+        self._cond   = threading.Condition()
+
+    def _try_reserve(self, nbytes: int) -> bool:
+        with self._cond:
+            if self.used and self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            return True
+
+    def _release(self, nbytes: int) -> None:
+        with self._cond:
+            self.used -= nbytes
+            self._cond.notify_all()
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy processing other uploads. Retry shortly."
+        )
+
+    @contextmanager
+    def hold(self, nbytes: int):
+        """Reserve nbytes for the duration of the block (blocking — worker threads)."""
+        nbytes   = min(nbytes, self.limit)
+        deadline = time.monotonic() + self.wait_s
+        with self._cond:
+            while self.used and self.used + nbytes > self.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._busy()
+                self._cond.wait(remaining)
+            self.used += nbytes
+        try:
+            yield
+        finally:
+            self._release(nbytes)
+
+    @asynccontextmanager
+    async def hold_async(self, nbytes: int):
+        """Same as hold(), but waits without blocking the event loop."""
+        nbytes   = min(nbytes, self.limit)
+        deadline = time.monotonic() + self.wait_s
+        while not self._try_reserve(nbytes):
+            if time.monotonic() >= deadline:
+                raise self._busy()
+            await asyncio.sleep(_ASYNC_POLL)
+        try:
+            yield
+        finally:
+            self._release(nbytes)
+
+
+upload_budget = MemoryBudget(UPLOAD_MEMORY_BUDGET_MB * 1024 * 1024, UPLOAD_BUDGET_WAIT_S)
+
+
+# ── Holding uploads while they are processed ──────────────────────────────────
+
+@asynccontextmanager
+async def uploads_held(uploads: List[SpooledUpload]):
+    """
+    Request path: reserve the uploads' budget (waiting off the event loop),
+    then delete their temp files when the block exits.
+    """
+    try:
+        async with upload_budget.hold_async(sum(u.cost for u in uploads)):
+            yield
+    finally:
+        for upload in uploads:
+            upload.close()
+
+
+@contextmanager
+def uploads_held_blocking(uploads: List[SpooledUpload]):
+    """uploads_held() for job threads, which may block while waiting."""
+    try:
+        with upload_budget.hold(sum(u.cost for u in uploads)):
+            yield
+    finally:
+        for upload in uploads:
+            upload.close()
+
+
+def run_spooled(db, fn: Callable, upload: SpooledUpload, *args, progress: Optional[Callable] = None):
+    """
+    Job body adapter (app/core/jobs.py): hold the budget, open the spooled
+    file, call fn(db, handle, *args, progress=...), delete the file after.
+    """
+    with uploads_held_blocking([upload]), upload.open() as handle:
+        return fn(db, handle, *args, progress=progress)
@@ -1,24 +1,223 @@
-from typing import List
+import asyncio
+import fnmatch
+import os
+from typing import Callable, Dict, Iterable, Optional, Set
+
 from fastapi import WebSocket
 
-class ConnectionManager:
+from app.core.pubsub import event_bus
+from app.services.dashboard_delta import dashboard_delta
+from app.services.event_topics import route_event
+
+# ─────────────────────────────────────────────────────────────────────────────
+# WebSocket fan-out hubs (admin dashboard, station events).
+#
+# ONE producer (app/core/signals.py) computes each dashboard snapshot once
+# and hands it to publish(); every connected screen gets it from there. The
+# old per-connection loops ran the stats query once per open screen, and
+# broadcast awaited each send_json in turn, so one slow TV stalled all.
+#
+#   publish(data)   never awaits: puts the message on every subscriber's
+#                   bounded queue (WS_SEND_QUEUE). Snapshots supersede each
+#                   other, so a full queue drops its OLDEST message.
+#   sender task     one per subscriber, drains its queue. A send that takes
+#                   longer than WS_SEND_TIMEOUT_S closes that connection;
+#                   the other subscribers never wait on it.
+#   latest          last published snapshot, sent to new subscribers right
+#                   away (None until computed, or when it went stale while
+#                   nobody was connected).
+#
+# Messages:  {"success": true, "type": "full",  "data": snapshot}
+#            {"success": true, "type": "delta", "data": changes}
+#
+# Subscribers that ask for deltas (hub built with a diff function) get one
+# full snapshot on connect — i.e. a resync on every reconnect — and after
+# that only diff(last sent, newest) (app/services/dashboard_delta.py).
+# The diff is taken when the message is SENT, against what that client
+# actually received, so snapshots dropped from a full queue never break the
+# chain; nothing is sent when nothing changed. Subscribers in step share
+# one diff per snapshot.
+#
+# TopicHub (station screens, /admin/ws/events) routes bus events
+# (app/core/pubsub.py) by topic (app/services/event_topics.py): a screen
+# gets only the topics it subscribed to. Events do not supersede each other,
+# so its queue is longer (WS_EVENT_QUEUE) and on overflow it is replaced by
+# ONE {"type": "resync"} message — the screen re-reads over REST instead of
+# silently missing an event. Same sender / timeout as above.
+#
+#   {"success": true, "type": "event",  "topic": ..., "data": payload}
+#   {"success": true, "type": "resync", "topic": pattern | null}
+#       re-read what the subscribed topics matching the pattern show
+#       (null after a queue overflow: re-read everything)
+#
+#   WS_SEND_QUEUE        default 4
+#   WS_EVENT_QUEUE       default 64
+#   WS_MAX_TOPICS        default 50    (per connection)
+#   WS_SEND_TIMEOUT_S    default 10
+# ─────────────────────────────────────────────────────────────────────────────
+
+WS_SEND_QUEUE     = int(os.getenv("WS_SEND_QUEUE", "4"))
+WS_EVENT_QUEUE    = int(os.getenv("WS_EVENT_QUEUE", "64"))
+WS_MAX_TOPICS     = int(os.getenv("WS_MAX_TOPICS", "50"))
+WS_SEND_TIMEOUT_S = float(os.getenv("WS_SEND_TIMEOUT_S", "10"))
+
+
+class Subscriber:
+    def __init__(self, websocket: WebSocket, delta: bool):
+        self.websocket = websocket
+        self.delta     = delta
+        self.queue     = asyncio.Queue(maxsize=WS_SEND_QUEUE)
+        self.sent: Optional[dict]         = None   # last snapshot delivered
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, data: dict):
+        if self.queue.full():
+            self.queue.get_nowait()   # drop the oldest; the newer one supersedes it
+        self.queue.put_nowait(data)
+
+
+class WebSocketHub:
+    def __init__(self, diff: Optional[Callable[[dict, dict], dict]] = None):
+        self.subscribers: Set[Subscriber] = set()
+        self.latest: Optional[dict]       = None
+        self._diff      = diff
+        self._last_diff = (None, None, None)   # (old, new, delta) by identity
+
+    async def connect(self, websocket: WebSocket, delta: bool = False) -> Subscriber:
+        await websocket.accept()
+        sub      = Subscriber(websocket, delta and self._diff is not None)
+        sub.task = asyncio.create_task(self._sender(sub))
+        self.subscribers.add(sub)
+        if self.latest is not None:
+            sub.push(self.latest)
+        return sub
+
+    def disconnect(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+        if sub.task and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+
+    def publish(self, data: dict):
+        """Queue data for every subscriber (never blocks on a slow client)."""
+        self.latest = data
+        for sub in list(self.subscribers):
+            sub.push(data)
+
+    def _message(self, sub: Subscriber, data: dict) -> Optional[dict]:
+        if not sub.delta or sub.sent is None:
+            return {"success": True, "type": "full", "data": data}
+
+        old, new, delta = self._last_diff
+        if old is not sub.sent or new is not data:
+            delta           = self._diff(sub.sent, data)
+            self._last_diff = (sub.sent, data, delta)
+        return {"success": True, "type": "delta", "data": delta} if delta else None
+
+    async def _sender(self, sub: Subscriber):
+        try:
+            while True:
+                data    = await sub.queue.get()
+                message = self._message(sub, data)
+                if message is not None:
+                    await asyncio.wait_for(sub.websocket.send_json(message), WS_SEND_TIMEOUT_S)
+                sub.sent = data
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Timed out or connection gone: drop this subscriber only
+            self.disconnect(sub)
+            try:
+                await sub.websocket.close()
+            except Exception:
+                pass
+
+
+class TopicSubscriber:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.topics: Set[str]             = set()
+        self.queue     = asyncio.Queue(maxsize=WS_EVENT_QUEUE)
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, message: dict):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = {"success": True, "type": "resync", "topic": None}
+        self.queue.put_nowait(message)
+
+
+class TopicHub:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.subscribers: Set[TopicSubscriber]            = set()
+        self._by_topic:   Dict[str, Set[TopicSubscriber]] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, topics: Iterable[str] = ()) -> TopicSubscriber:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        sub      = TopicSubscriber(websocket)
+        sub.task = asyncio.create_task(self._sender(sub))
+        self.subscribers.add(sub)
+        self.subscribe(sub, topics)
+        return sub
+
+    def disconnect(self, sub: TopicSubscriber):
+        self.unsubscribe(sub, list(sub.topics))
+        self.subscribers.discard(sub)
+        if sub.task and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+
+    def subscribe(self, sub: TopicSubscriber, topics: Iterable[str]) -> Set[str]:
+        """Add topics (beyond WS_MAX_TOPICS they are ignored); returns the current set."""
+        for topic in topics:
+            if len(sub.topics) >= WS_MAX_TOPICS:
+                break
+            if isinstance(topic, str) and topic and topic not in sub.topics:
+                sub.topics.add(topic)
+                self._by_topic.setdefault(topic, set()).add(sub)
+        return sub.topics
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def unsubscribe(self, sub: TopicSubscriber, topics: Iterable[str]) -> Set[str]:
+        for topic in topics:
+            sub.topics.discard(topic)
+            subs = self._by_topic.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_topic[topic]
+        return sub.topics
 
-    async def broadcast(self, data: dict):
-        """Send JSON data to all connected admins"""
-        for connection in self.active_connections:
+    def publish_event(self, event: dict):
+        """Bus handler: push one event to the subscribers of its topics (never blocks)."""
+        if not self.subscribers:
+            return
+        for topic, payload in route_event(event):
+            if payload is not None:
+                for sub in self._by_topic.get(topic, ()):
+                    sub.push({"success": True, "type": "event", "topic": topic, "data": payload})
+                continue
+            # Pattern → one resync per matching subscriber, naming the pattern
+            matched = set()
+            for subscribed in fnmatch.filter(list(self._by_topic), topic):
+                matched |= self._by_topic[subscribed]
+            for sub in matched:
+                sub.push({"success": True, "type": "resync", "topic": topic})
+
+    async def _sender(self, sub: TopicSubscriber):
+        try:
+            while True:
+                message = await sub.queue.get()
+                await asyncio.wait_for(sub.websocket.send_json(message), WS_SEND_TIMEOUT_S)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(sub)
             try:
-                await connection.send_json(data)
+                await sub.websocket.close()
             except Exception:
-                # Handle stale connections
-                self.active_connections.remove(connection)
+                pass
+
+
+dashboard_hub = WebSocketHub(diff=dashboard_delta)
+event_hub     = TopicHub()
 
-manager = ConnectionManager()
\ No newline at end of file
+event_bus.subscribe(event_hub.publish_event)
@@ -4,13 +4,32 @@ from app.database import engine, Base
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session        
 from sqlalchemy import text              
-from app.database import engine, Base, get_db  
+from app.database import engine, Base, get_db, SessionLocal
+import threading
+import traceback
+from app.core.jobs import prune_jobs
+from app.core.parse_pool import parse_pool
+from app.core.pubsub import event_bus
+from app.core.report_pool import bundle_pool, report_pool
+from app.core.signals import dashboard_refresher
+from app.core.schema_upgrades import ensure_indexes, ensure_search_indexes
+from app.services.cell_catalog import ensure_catalog
+from app.services.production_counters import ensure_counters
+from app.services.upload_fingerprint import prune_upload_hashes
 
 
-from app.routers import cell_router, battery_router, battery_pack_router, bms_router, welding_router, pdi_router, dispatch_router, report_router, user_router
+from app.routers import cell_router, battery_router, battery_pack_router, bms_router, welding_router, pdi_router, dispatch_router, report_router, user_router, job_router
 
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
+ensure_search_indexes(engine)
+
+# First deploy: build the dashboard counters and the brand / lot catalog
+# from the existing tables
+with SessionLocal() as db:
+    ensure_counters(db)
+    ensure_catalog(db)
 
 app = FastAPI(title="Maxvolt Energies Production Portal")
 
@@ -33,9 +52,56 @@ app.include_router(pdi_router.router)
 app.include_router(dispatch_router.router)
 app.include_router(user_router.router)
 app.include_router(report_router.router)
+app.include_router(job_router.router)
 from app.routers import admin_router
 app.include_router(admin_router.router)
 
+@app.on_event("startup")
+def start_parse_pool():
+    # Start PDI parse workers in the background so the first batch upload
+    # does not pay for process start-up; startup itself is not delayed.
+    threading.Thread(target=parse_pool.warm, name="parse-pool-warm", daemon=True).start()
+
+def _prune_history():
+    try:
+        with SessionLocal() as db:
+            prune_upload_hashes(db)
+            prune_jobs(db)
+    except Exception:
+        traceback.print_exc()
+
+@app.on_event("startup")
+def start_history_prune():
+    # Drop re-upload fingerprints past UPLOAD_HASH_RETENTION_DAYS and jobs
+    # past JOB_RETENTION_DAYS without delaying startup (the first run after
+    # deploy may delete millions of row hashes).
+    threading.Thread(target=_prune_history, name="history-prune", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_parse_pool():
+    parse_pool.shutdown()
+
+@app.on_event("shutdown")
+def stop_report_pool():
+    report_pool.shutdown()
+    bundle_pool.shutdown()
+
+@app.on_event("startup")
+async def start_dashboard_refresher():
+    dashboard_refresher.start()
+
+@app.on_event("shutdown")
+async def stop_dashboard_refresher():
+    await dashboard_refresher.stop()
+
+@app.on_event("startup")
+async def start_event_bus():
+    event_bus.start()
+
+@app.on_event("shutdown")
+def stop_event_bus():
+    event_bus.stop()
+
 @app.get("/")
 def home():
     return {"message": "Backend is Live"}
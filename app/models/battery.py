@@ -1,17 +1,7 @@
 from sqlalchemy import Column, String, Integer, Enum
 from sqlalchemy.ext.hybrid import hybrid_property
 from app.database import Base
-import enum
-
-
-class WeldingType(enum.Enum):
-    LASER = "LASER"
-    SPOT  = "SPOT"
-
-
-class CellType(enum.Enum):
-    NMC = "NMC"
-    LFP = "LFP"
+from app.models.enums import CellType, WeldingType  # noqa: F401 (re-exported)
 
 
 class BatteryModel(Base):
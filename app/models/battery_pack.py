@@ -22,7 +22,7 @@ class Battery(Base):
     model_id       = Column(String, ForeignKey("battery_models.model_id"), nullable=False)
     had_ng_status  = Column(Boolean, default=False)   # True = had NG at any stage, never reset
     overall_status = Column(String(50), default="PROD", index=True)
-    created_at     = Column(DateTime(timezone=True), server_default=func.now())
+    created_at     = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     # ── Assembly-time cell parameter ranges ──────────────────────────────────
     # Stored here (not on BatteryModel) so audit report always reflects the
@@ -41,6 +41,11 @@ class Battery(Base):
     dispatch_record = relationship("Dispatch",  back_populates="battery", uselist=False)
     pack_test       = relationship("PackTest",  back_populates="battery", uselist=False)
 
+    __table_args__ = (
+        # Keyset pagination of the admin traceability list (newest first)
+        Index("ix_battery_created_keyset", "created_at", "battery_id"),
+    )
+
     def __repr__(self):
         return f"<Battery {self.battery_id} [{self.overall_status}] Model:{self.model_id}>"
 
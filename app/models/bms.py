@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 from sqlalchemy.orm import relationship
@@ -17,5 +17,10 @@ class BMS(Base):
 
     battery = relationship("Battery", back_populates="bms_record")
 
+    __table_args__ = (
+        # BMS of a battery (BMS info lookups, admin traceability)
+        Index("ix_bms_battery_id", "battery_id"),
+    )
+
     def __repr__(self):
         return f"<BMS {self.bms_id} → Battery:{self.battery_id}>"
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+# ── Cell brand / lot catalog ──────────────────────────────────────────────────
+#
+#   One row per (brand, lot) pair seen in cell_gradings: how many cells
+#   currently carry it, and the earliest / latest grading test date among
+#   them. Missing brand or lot is stored as "". Maintained incrementally by
+#   grading ingestion in the same transaction as the gradings, rebuilt from
+#   cell_gradings by rebuild_catalog (app/services/cell_catalog.py).
+#
+# ─────────────────────────────────────────────────────────────────────────────
+
+class CellCatalogEntry(Base):
+    __tablename__ = "cell_catalog"
+
+    brand      = Column(String(100), primary_key=True)
+    lot        = Column(String(100), primary_key=True)
+    cells      = Column(BigInteger, nullable=False, default=0)
+    first_seen = Column(DateTime)
+    last_seen  = Column(DateTime)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -39,6 +39,11 @@ class Cell(Base):
         lazy="select"
     )
 
+    __table_args__ = (
+        # Keyset pagination of the admin cell inventory (newest first)
+        Index("ix_cell_registration_keyset", "registration_date", "cell_id"),
+    )
+
     def __repr__(self):
         return f"<Cell {self.cell_id} [{self.status}] ng:{self.ng_count}>"
 
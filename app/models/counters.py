@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+# ── Production counters ───────────────────────────────────────────────────────
+#
+#   One row per KPI counter, name → value. Maintained incrementally by the
+#   write paths in the same transaction as the rows they count, rebuilt from
+#   the source tables by reconcile (app/services/production_counters.py).
+#
+#   cells.total  cells.used  cells.status.<status>
+#   batteries.total  batteries.had_ng  batteries.status.<overall_status>
+#   pdi.total  pdi.passed  pdi.batteries
+#   pack_tests.total  pack_tests.passed
+#   dispatch.total  dispatch.day.<YYYY-MM-DD>
+#
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ProductionCounter(Base):
+    __tablename__ = "production_counters"
+
+    name       = Column(String(100), primary_key=True)
+    value      = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
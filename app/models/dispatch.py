@@ -14,7 +14,7 @@ class Dispatch(Base):
     invoice_id    = Column(String(100), nullable=False)
     invoice_date  = Column(Date,        nullable=False)
 
-    dispatch_timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    dispatch_timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     # On dispatch: battery.overall_status is set to "DISPATCHED"
     battery = relationship("Battery", back_populates="dispatch_record")
\ No newline at end of file
@@ -0,0 +1,19 @@
+import enum
+
+# ── Battery model enums ───────────────────────────────────────────────────────
+#
+#   Kept apart from the models (app/models/battery.py re-exports them) so
+#   code that must not import the database layer — report worker processes
+#   rendering audit workbooks — can use and unpickle them.
+#
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class WeldingType(enum.Enum):
+    LASER = "LASER"
+    SPOT  = "SPOT"
+
+
+class CellType(enum.Enum):
+    NMC = "NMC"
+    LFP = "LFP"
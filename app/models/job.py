@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON
+from app.database import Base
+
+# ── Background jobs ───────────────────────────────────────────────────────────
+#
+#   One row per background job (app/core/jobs.py), so any uvicorn worker can
+#   answer GET /jobs/{id} and finished jobs survive a restart.
+#
+#   status        queued → running → complete | failed
+#   worker        host:pid of the process running it
+#   heartbeat_at  refreshed by that process while the job is unfinished; a
+#                 stale heartbeat means the process died and the job failed
+#
+# ─────────────────────────────────────────────────────────────────────────────
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id           = Column(String(32), primary_key=True)   # uuid4 hex
+    kind         = Column(String(50), nullable=False)
+    filename     = Column(String(255))
+    status       = Column(String(20), nullable=False, index=True)
+    processed    = Column(Integer, nullable=False, default=0)
+    total        = Column(Integer)
+    result       = Column(JSON)
+    error        = Column(JSON)                           # HTTPException detail or message
+    worker       = Column(String(100))
+    created_at   = Column(DateTime(timezone=True), nullable=False)
+    started_at   = Column(DateTime(timezone=True))
+    finished_at  = Column(DateTime(timezone=True), index=True)
+    heartbeat_at = Column(DateTime(timezone=True))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database import Base
 from sqlalchemy.orm import relationship
@@ -31,6 +31,11 @@ class PDIReport(Base):
     test_result                = Column(String(100))       # Test Result — "Finished PASS" or other
 
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
-    battery = relationship("Battery", back_populates="pdi_reports")
\ No newline at end of file
+    battery = relationship("Battery", back_populates="pdi_reports")
+
+    __table_args__ = (
+        # Latest report per battery (admin traceability)
+        Index("ix_pdi_battery_latest", "battery_id", "created_at"),
+    )
\ No newline at end of file
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+# ── Upload fingerprints ───────────────────────────────────────────────────────
+#
+#   UploadFingerprint  one row per fully-applied machine export (sha256 of the
+#                      raw bytes) → the response returned the first time
+#   UploadRowHash      one row per applied data row (64-bit hash of the
+#                      normalised row) → rows already applied are skipped
+#
+#   kind = "grading" | "sorting" | "pdi"
+#
+# Both are kept for UPLOAD_HASH_RETENTION_DAYS (created_at, see
+# app/services/upload_fingerprint.py); older rows are pruned.
+#
+# ─────────────────────────────────────────────────────────────────────────────
+
+class UploadFingerprint(Base):
+    __tablename__ = "upload_fingerprints"
+
+    id           = Column(Integer, primary_key=True, index=True)
+    kind         = Column(String(30), nullable=False)
+    content_hash = Column(String(64), nullable=False)   # sha256 hex of the uploaded bytes
+    filename     = Column(String(255))
+    result       = Column(JSON)                         # response body of the first upload
+    created_at   = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "content_hash", name="uq_upload_fingerprint_kind_hash"),
+    )
+
+
+class UploadRowHash(Base):
+    __tablename__ = "upload_row_hashes"
+
+    kind       = Column(String(30), primary_key=True)
+    row_hash   = Column(BigInteger, primary_key=True)   # pd.util.hash_pandas_object, as int64
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
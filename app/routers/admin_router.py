@@ -1,10 +1,10 @@
-import asyncio
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload, load_only
-from sqlalchemy import func, case, literal_column, desc
-from sqlalchemy import text
+from sqlalchemy import func, tuple_
+import json
+import os
 import traceback
-from typing import List
 
 from sqlalchemy import or_
 from datetime import datetime, date
@@ -12,83 +12,44 @@ from typing import Optional
 from app.database import get_db
 
 
-from app.database import get_db, SessionLocal
+from app.database import engine, get_db
 from app.models.cell import Cell
 from app.models.battery_pack import Battery
-from app.models.pdi import PDIReport
-from app.models.dispatch import Dispatch
 from app.models.pack_test import PackTest
 from app.models.bms import BMS
 from app.models.battery import BatteryModel
 
-from app.models.cell import Cell, CellGrading
 from app.models.battery_pack import BatteryCellMapping
+from app.services.cell_catalog import catalog_brands, catalog_lots, rebuild_catalog
+from app.services.dashboard_stats import dashboard_snapshot
+from app.services.exports import EXPORT_FORMAT_PATTERN, inventory_export, stream_export, traceability_export
+from app.services.production_counters import reconcile
+from app.services.inventory import cell_display_status, inventory_facets, inventory_filters
+from app.services.traceability import traceability_filters, traceability_page
+from app.services.upload_fingerprint import prune_upload_hashes
+from app.core.cache import TTLCache
+from app.core.jobs import jobs, accepted
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.websocket_manager import dashboard_hub, event_hub
 
 router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 
 
-# ── WebSocket Connection Manager ──────────────────────────────────────────────
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, data: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(data)
-            except Exception:
-                self.disconnect(connection)
-
-manager = ConnectionManager()
-
-
 # ── Dashboard Stats ───────────────────────────────────────────────────────────
 
-async def fetch_dashboard_stats(db: Session):
-    today = datetime.now().date()
-
-    total_cells     = db.query(func.count(Cell.cell_id)).scalar() or 0
-    batteries_count = db.query(func.count(Battery.battery_id)).scalar() or 0
-
-    pdi_total  = db.query(func.count(PDIReport.id)).scalar() or 0
-    pdi_passed = db.query(func.count(PDIReport.id)).filter(PDIReport.test_result == 'Finished PASS').scalar() or 0
-    pass_rate  = f"{(pdi_passed / pdi_total * 100):.1f}%" if pdi_total > 0 else "0%"
-
-    dispatched_today = db.query(func.count(Dispatch.id)).filter(
-        func.date(Dispatch.dispatch_timestamp) == today
-    ).scalar() or 0
-
-    failed_packs = db.query(func.count(Battery.battery_id)).filter(
-        Battery.had_ng_status == True
-    ).scalar() or 0
-
-    pending_pdi = db.query(func.count(Battery.battery_id)).outerjoin(PDIReport).filter(
-        PDIReport.id == None
-    ).scalar() or 0
-
-    recent_pdi = db.query(
-        PDIReport.battery_id.label("id"),
-        literal_column("'PDI Inspection'").label("action"),
-        PDIReport.created_at.label("time"),
-        PDIReport.test_result.label("status")
-    ).order_by(PDIReport.created_at.desc()).limit(5).all()
+def fetch_dashboard_stats(db: Session):
+    """
+    Dashboard payload. All figures come from dashboard_snapshot — one SQL
+    round-trip on PostgreSQL; today_output is capped at TODAY_OUTPUT_LIMIT
+    (newest first). Blocking: call it from a worker thread.
+    """
+    stats = dashboard_snapshot(db, datetime.now().date())
 
-    today_output_query = db.query(
-        Battery.battery_id,
-        Battery.model_id.label("model"),
-        literal_column("'Final Assembly'").label("stage"),
-        case((Battery.had_ng_status == True, "REPAIRED"), else_="HEALTHY").label("status"),
-        Battery.created_at.label("updated_at")
-    ).filter(func.date(Battery.created_at) == today).all()
+    total_cells      = stats["total_cells"]
+    batteries_count  = stats["batteries"]
+    dispatched_today = stats["dispatched_today"]
+    pdi_total        = stats["pdi_total"]
+    pass_rate        = f"{(stats['pdi_passed'] / pdi_total * 100):.1f}%" if pdi_total > 0 else "0%"
 
     return {
         "kpis": {
@@ -96,17 +57,17 @@ async def fetch_dashboard_stats(db: Session):
             "batteries_assembled": {"value": str(batteries_count), "change": "Units"},
             "pdi_pass_rate":       {"value": pass_rate,            "change": "Quality Score"},
             "dispatched_today":    {"value": str(dispatched_today),"change": "Today"},
-            "failed_batteries":    {"value": str(failed_packs),    "change": "Requires Check"},
-            "pending_inspection":  {"value": str(pending_pdi),     "change": "Queue"}
+            "failed_batteries":    {"value": str(stats["failed_packs"]), "change": "Requires Check"},
+            "pending_inspection":  {"value": str(stats["pending_pdi"]),  "change": "Queue"}
         },
         "recent_activity": [
             {
-                "time":   a.time.strftime("%H:%M") if a.time else "Now",
-                "action": a.action,
-                "id":     a.id,
-                "status": "SUCCESS" if a.status == "Finished PASS" else "ERROR"
+                "time":   hhmm or "Now",
+                "action": "PDI Inspection",
+                "id":     battery_id,
+                "status": "SUCCESS" if result == "Finished PASS" else "ERROR"
             }
-            for a in recent_pdi
+            for battery_id, hhmm, result in stats["recent_pdi"]
         ],
         "stage_breakdown": [
             {"stage": "Cell Registration", "count": total_cells,     "status": "ACTIVE"},
@@ -115,13 +76,13 @@ async def fetch_dashboard_stats(db: Session):
         ],
         "today_output": [
             {
-                "battery_id": b.battery_id,
-                "model":      b.model,
-                "stage":      b.stage,
-                "status":     b.status,
-                "updated_at": b.updated_at.strftime("%H:%M") if b.updated_at else "Today"
+                "battery_id": battery_id,
+                "model":      model_id,
+                "stage":      "Final Assembly",
+                "status":     "REPAIRED" if had_ng else "HEALTHY",
+                "updated_at": hhmm or "Today"
             }
-            for b in today_output_query
+            for battery_id, model_id, had_ng, hhmm in stats["today_output"]
         ]
     }
 
@@ -129,9 +90,9 @@ async def fetch_dashboard_stats(db: Session):
 # ── Endpoints ─────────────────────────────────────────────────────────────────
 
 @router.get("/dashboard")
-async def get_admin_dashboard(db: Session = Depends(get_db)):
+def get_admin_dashboard(db: Session = Depends(get_db)):
     try:
-        data = await fetch_dashboard_stats(db)
+        data = fetch_dashboard_stats(db)
         return {"success": True, "data": data}
     except Exception as e:
         traceback.print_exc()
@@ -139,97 +100,170 @@ async def get_admin_dashboard(db: Session = Depends(get_db)):
 
 
 @router.websocket("/ws/dashboard")
-async def websocket_dashboard(websocket: WebSocket, token: Optional[str] = Query(None)):
-    await manager.connect(websocket)
+async def websocket_dashboard(
+    websocket: WebSocket,
+    token:     Optional[str] = Query(None),
+    delta:     bool          = Query(False),
+):
+    """
+    Live dashboard. Snapshots are computed once for all screens by the
+    dashboard refresher and fanned out by dashboard_hub; this handler only
+    registers the screen and waits for it to go away.
+
+    ?delta=true → one full snapshot on connect, then only what changed
+    (app/services/dashboard_delta.py). Without it every push is a full
+    snapshot, as before.
+    """
+    # Imported here: signals pulls in this router at import time
+    from app.core.signals import trigger_dashboard_update
+
+    sub = await dashboard_hub.connect(websocket, delta=delta)
     try:
+        if dashboard_hub.latest is None:
+            trigger_dashboard_update()
         while True:
-            with SessionLocal() as db:
-                data = await fetch_dashboard_stats(db)
-                await websocket.send_json({"success": True, "data": data})
-            await asyncio.sleep(30)
+            await websocket.receive_text()   # client messages are ignored
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         print(f"WS Error: {e}")
-        manager.disconnect(websocket)
+    finally:
+        dashboard_hub.disconnect(sub)
+
+
+@router.websocket("/ws/events")
+async def websocket_events(
+    websocket: WebSocket,
+    token:     Optional[str] = Query(None),
+    topics:    str           = Query(""),
+):
+    """
+    Topic-routed change events for station screens, e.g.
+
+        /admin/ws/events?topics=pdi.results,battery.MX123.status,cells.lot.L7
+
+    Topics and payloads: app/services/event_topics.py. Pushed only after
+    the write committed, from whichever worker handled it, so stations can
+    read the current state once over REST and then stop polling.
+
+    The client changes its topics on the same connection (e.g. a dispatch
+    station scanning the next battery) by sending
+    {"subscribe": [...]} / {"unsubscribe": [...]}; each is answered with
+    {"success": true, "type": "topics", "topics": [...]}.
+    Up to WS_MAX_TOPICS topics per connection.
+    """
+    sub = await event_hub.connect(websocket, [t.strip() for t in topics.split(",")])
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            event_hub.subscribe(sub, message.get("subscribe") or [])
+            event_hub.unsubscribe(sub, message.get("unsubscribe") or [])
+            sub.push({"success": True, "type": "topics", "topics": sorted(sub.topics)})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WS Error: {e}")
+    finally:
+        event_hub.disconnect(sub)
+
+
+@router.post("/counters/reconcile")
+async def reconcile_production_counters():
+    """
+    Rebuild production_counters from the source tables on the ingestion
+    pool. Returns 202 + job_id; the job result lists any drift found
+    (stored − actual) per counter. Writers wait for the rebuild to commit
+    and then apply their own deltas on top, so it is safe to run live.
+    """
+    job = await jobs.submit("admin.counters-reconcile", reconcile)
+    return JSONResponse(status_code=202, content=accepted(job))
+
+
+# Filtered totals for the paginated admin lists, per worker (app/core/cache.py)
+ADMIN_COUNT_TTL_S = float(os.getenv("ADMIN_COUNT_TTL_S", "30"))
+_list_counts      = TTLCache(ADMIN_COUNT_TTL_S)
 
 
 @router.get("/cells/inventory")
-async def get_cell_inventory(
-    page:      int            = Query(1, ge=1),
-    page_size: int            = Query(20, ge=1),
-    cell_id:   Optional[str]  = None,
-    status:    Optional[str]  = None,
-    brand:     Optional[str]  = None,   # renamed from 'model' — matches what it actually filters
-    date_from: Optional[date] = None,
-    date_to:   Optional[date] = None,
+def get_cell_inventory(
+    page:          int            = Query(1, ge=1),
+    page_size:     int            = Query(20, ge=1, le=500),
+    cursor:        Optional[str]  = None,
+    include_total: bool           = Query(True),
+    cell_id:       Optional[str]  = None,
+    status:        Optional[str]  = None,
+    brand:         Optional[str]  = None,   # renamed from 'model' — matches what it actually filters
+    lot:           Optional[str]  = None,
+    date_from:     Optional[date] = None,
+    date_to:       Optional[date] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Paginated cell inventory with filtering.
+    Paginated cell inventory with filtering, newest first.
+
+    Keyset pagination on (registration_date, cell_id) — index
+    ix_cell_registration_keyset: pass the previous response's next_cursor
+    as ?cursor= to get the next page (null on the last page). Every page
+    costs the same, however deep; page=N (OFFSET) is still accepted for
+    existing clients but reads and discards all earlier rows.
+
+    cell_id / brand / lot: case-insensitive substring match, or prefix
+    match with a trailing * (cell_id=MX12*) — both index-backed on
+    PostgreSQL (app/services/search.py).
+
+    total_items / total_pages: a count over the whole filtered set, cached
+    per filter combination for ADMIN_COUNT_TTL_S (may lag recent uploads
+    by that much). ?include_total=false skips it — null in the
+    response.
 
     Fixes applied:
     1. Query is on Cell only — CellGrading fetched separately per page via
        joinedload so no duplicate rows from outerjoin.
     2. Status filtering uses Cell.status (reliable) not CellGrading.final_result.
     3. grading accessed as item.gradings safely (handles empty list and None).
-    4. Added distinct() guard on brand filter which uses a join.
+    4. Brand filter is an EXISTS on CellGrading (no join duplicates).
     """
     try:
-        # ── Build base query on Cell only ─────────────────────────────────────
-        query = db.query(Cell)
-
-        # Filter by cell_id (partial match)
-        if cell_id:
-            query = query.filter(Cell.cell_id.ilike(f"%{cell_id}%"))
-
-        # Filter by registration date
-        if date_from:
-            query = query.filter(func.date(Cell.registration_date) >= date_from)
-        if date_to:
-            query = query.filter(func.date(Cell.registration_date) <= date_to)
-
-        # FIX — status filter uses Cell.status (set by grading upload) not CellGrading.final_result
-        if status:
-            s = status.upper()
-            if s == "ASSIGNED":
-                query = query.filter(Cell.is_used == True)
-            elif s == "GRADED":
-                # graded = passed grading, not yet assigned
-                query = query.filter(Cell.status == "pass", Cell.is_used == False)
-            elif s == "FAILED":
-                query = query.filter(Cell.status == "ng")
-            elif s == "REGISTERED":
-                # registered but no grading data yet
-                query = query.filter(Cell.status == "pending")
-            elif s == "SORTED":
-                # passed grading AND has sorting data
-                query = query.filter(Cell.status == "pass", Cell.sorting_date.isnot(None))
-
-        # FIX — brand filter: join CellGrading only when needed, add distinct()
-        if brand:
-            query = (
-                query
-                .join(CellGrading, Cell.cell_id == CellGrading.cell_id, isouter=True)
-                .filter(CellGrading.brand.ilike(f"%{brand}%"))
-                .distinct()
+        filters = inventory_filters(cell_id, status, brand, lot, date_from, date_to)
+
+        # ── Total (optional, cached) ──────────────────────────────────────────
+        total_items = total_pages = None
+        if include_total:
+            key = ("inventory", cell_id, status and status.upper(), brand, lot, date_from, date_to)
+            total_items = _list_counts.get_or_compute(
+                key, lambda: db.query(func.count(Cell.cell_id)).filter(*filters).scalar()
             )
+            total_pages = (total_items + page_size - 1) // page_size
 
-        # ── Paginate ──────────────────────────────────────────────────────────
-        total_items = query.count()
-        total_pages = (total_items + page_size - 1) // page_size
-        offset      = (page - 1) * page_size
+        # ── Page: keyset after the cursor (or legacy OFFSET) ──────────────────
+        query = (
+            db.query(Cell)
+            .filter(*filters)
+            .order_by(Cell.registration_date.desc(), Cell.cell_id.desc())
+        )
+        if cursor:
+            after_date, after_id = decode_cursor(cursor, datetime, str)
+            query = query.filter(
+                tuple_(Cell.registration_date, Cell.cell_id) < tuple_(after_date, after_id)
+            )
+        elif page > 1:
+            query = query.offset((page - 1) * page_size)
 
         # FIX — use joinedload so grading data loads in 1 extra query, not N queries
-        # Also avoids the duplicate-row problem that outerjoin caused
+        # One row past the page tells whether there is a next page
         items = (
             query
             .options(joinedload(Cell.gradings))
-            .order_by(Cell.registration_date.desc())
-            .offset(offset)
-            .limit(page_size)
+            .limit(page_size + 1)
             .all()
         )
+        has_more, items = len(items) > page_size, items[:page_size]
+        next_cursor     = encode_cursor(items[-1].registration_date, items[-1].cell_id) if has_more else None
 
         formatted_items = []
         for item in items:
@@ -245,16 +279,7 @@ async def get_cell_inventory(
                 grading = raw
 
             # Derive display status from Cell.status + is_used
-            if item.is_used:
-                current_status = "ASSIGNED"
-            elif item.status == "pass" and item.sorting_date:
-                current_status = "SORTED"
-            elif item.status == "pass":
-                current_status = "GRADED"
-            elif item.status == "ng":
-                current_status = "FAILED"
-            else:
-                current_status = "REGISTERED"
+            current_status = cell_display_status(item.is_used, item.status, item.sorting_date)
 
             formatted_items.append({
                 "cell_id":         item.cell_id,
@@ -281,81 +306,126 @@ async def get_cell_inventory(
                 "items":        formatted_items,
                 "total_items":  total_items,
                 "total_pages":  total_pages,
-                "current_page": page
+                "current_page": None if cursor else page,
+                "next_cursor":  next_cursor,
             }
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/cells/facets")
+def get_cell_inventory_facets(
+    cell_id:   Optional[str]  = None,
+    status:    Optional[str]  = None,
+    brand:     Optional[str]  = None,
+    lot:       Optional[str]  = None,
+    date_from: Optional[date] = None,
+    date_to:   Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Counts for the inventory page, under the same filters as
+    /cells/inventory:
+
+      total    cells matching every filter but status
+      status   per bucket (ASSIGNED / SORTED / GRADED / FAILED / REGISTERED),
+               each equal to the list's total_items for that status
+      brands   cells per brand, in the selected status bucket (all
+               statuses if none), largest first; brand null = ungraded
+
+    One GROUP BY statement with a FILTER per bucket, cached for
+    FACETS_TTL_S and cleared by grading / sorting / assignment writes
+    (app/services/inventory.py).
+    """
+    try:
+        data = inventory_facets(db, cell_id, status, brand, lot, date_from, date_to)
+        return {"success": True, "data": data}
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@router.get("/cells/export")
+def export_cell_inventory(
+    format:    str            = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    cell_id:   Optional[str]  = None,
+    status:    Optional[str]  = None,
+    brand:     Optional[str]  = None,
+    lot:       Optional[str]  = None,
+    date_from: Optional[date] = None,
+    date_to:   Optional[date] = None,
+):
+    """
+    Every cell matching the inventory filters, newest first, as a CSV or
+    NDJSON download — streamed from a server-side cursor in constant
+    memory (app/services/exports.py). Same fields as the list items.
+    """
+    filters = inventory_filters(cell_id, status, brand, lot, date_from, date_to)
+    return stream_export(inventory_export(filters), format, "cell_inventory")
+
+
 @router.get("/traceability")
-async def get_battery_traceability(
-    page:       int            = Query(1, ge=1),
-    page_size:  int            = Query(15, ge=1),
-    battery_id: Optional[str]  = None,
-    status:     Optional[str]  = None,
-    date_from:  Optional[date] = None,
-    date_to:    Optional[date] = None,
+def get_battery_traceability(
+    page:          int            = Query(1, ge=1),
+    page_size:     int            = Query(15, ge=1, le=500),
+    cursor:        Optional[str]  = None,
+    include_total: bool           = Query(True),
+    battery_id:    Optional[str]  = None,
+    bms_id:        Optional[str]  = None,
+    invoice_id:    Optional[str]  = None,
+    status:        Optional[str]  = None,
+    date_from:     Optional[date] = None,
+    date_to:       Optional[date] = None,
     db: Session = Depends(get_db)
 ):
+    """
+    Battery traceability list, newest first — one statement per page
+    (app/services/traceability.py).
+
+    battery_id / bms_id / invoice_id: case-insensitive substring match, or
+    prefix match with a trailing * — index-backed on PostgreSQL
+    (app/services/search.py).
+
+    Keyset pagination on (created_at, battery_id): pass the previous
+    response's next_cursor as ?cursor= (null on the last page). page=N
+    (OFFSET) is still accepted for existing clients. total_items is cached
+    like the cell inventory's; ?include_total=false skips it.
+    """
     try:
-        query = db.query(Battery).options(
-            joinedload(Battery.pdi_reports),
-            joinedload(Battery.bms_record),
-            joinedload(Battery.dispatch_record),
-            # ← no joinedload for pack_test at all
-        )
+        filters = traceability_filters(battery_id, status, date_from, date_to, bms_id, invoice_id)
 
-        if battery_id:
-            query = query.filter(Battery.battery_id.ilike(f"%{battery_id}%"))
-        if date_from:
-            query = query.filter(func.date(Battery.created_at) >= date_from)
-        if date_to:
-            query = query.filter(func.date(Battery.created_at) <= date_to)
-        if status:
-            if status == "failed":
-                query = query.filter(Battery.had_ng_status == True)
-            else:
-                query = query.filter(Battery.overall_status == status.upper())
-
-        total_items = query.count()
-        total_pages = (total_items + page_size - 1) // page_size
-        offset      = (page - 1) * page_size
-
-        batteries = query.order_by(desc(Battery.created_at)).offset(offset).limit(page_size).all()
-
-        # ── Fetch ONLY final_result from pack_testing_reports ─────────────────
-        # Direct SQL — does NOT use the ORM model at all, so no column mismatch
-        battery_ids = [b.battery_id for b in batteries]
-        pack_results = db.execute(
-            text("""
-                SELECT battery_id, final_result
-                FROM pack_testing_reports
-                WHERE battery_id = ANY(:ids)
-            """),
-            {"ids": battery_ids}
-        ).fetchall()
-        pack_map = {row.battery_id: row.final_result for row in pack_results}
-
-        results = []
-        for b in batteries:
-            pdi      = b.pdi_reports[0] if b.pdi_reports else None
-            bms      = b.bms_record
-            dispatch = b.dispatch_record
-
-            results.append({
-                "battery_id":           b.battery_id,
-                "model":                b.model_id,
-                "bms_id":               bms.bms_id        if bms      else "Not Assigned",
-                "pack_test_result":     pack_map.get(b.battery_id, "PENDING"),
-                "pdi_result":           pdi.test_result   if pdi      else "PENDING",
-                "status":               b.overall_status,
-                "created_at":           b.created_at.strftime("%Y-%m-%d %H:%M") if b.created_at else "N/A",
-                "assembled_at":         b.created_at.strftime("%d-%b-%Y")        if b.created_at else "N/A",
-                "dispatch_destination": dispatch.customer_name if dispatch else None,
-            })
+        total_items = total_pages = None
+        if include_total:
+            key = ("traceability", battery_id, bms_id, invoice_id, status, date_from, date_to)
+            total_items = _list_counts.get_or_compute(
+                key, lambda: db.query(func.count(Battery.battery_id)).filter(*filters).scalar()
+            )
+            total_pages = (total_items + page_size - 1) // page_size
+
+        rows = traceability_page(
+            db, filters, page_size + 1,
+            after=decode_cursor(cursor, datetime, str) if cursor else None,
+            offset=0 if cursor else (page - 1) * page_size,
+        )
+        has_more, rows = len(rows) > page_size, rows[:page_size]
+        next_cursor    = encode_cursor(rows[-1].created_at, rows[-1].battery_id) if has_more else None
+
+        results = [{
+            "battery_id":           r.battery_id,
+            "model":                r.model_id,
+            "bms_id":               r.bms_id or "Not Assigned",
+            "pack_test_result":     r.pack_test_result or "PENDING",
+            "pdi_result":           r.pdi_result or "PENDING",
+            "status":               r.overall_status,
+            "created_at":           r.created_at.strftime("%Y-%m-%d %H:%M") if r.created_at else "N/A",
+            "assembled_at":         r.created_at.strftime("%d-%b-%Y")        if r.created_at else "N/A",
+            "dispatch_destination": r.dispatch_destination,
+        } for r in rows]
 
         return {
             "success": True,
@@ -363,15 +433,82 @@ async def get_battery_traceability(
                 "items":        results,
                 "total_items":  total_items,
                 "total_pages":  total_pages,
-                "current_page": page
+                "current_page": None if cursor else page,
+                "next_cursor":  next_cursor,
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Traceability failed: {str(e)}")
 
+
+@router.get("/traceability/export")
+def export_battery_traceability(
+    format:     str            = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    battery_id: Optional[str]  = None,
+    bms_id:     Optional[str]  = None,
+    invoice_id: Optional[str]  = None,
+    status:     Optional[str]  = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+):
+    """
+    Every battery matching the traceability filters, newest first, as a
+    CSV or NDJSON download — the list's statement without a limit,
+    streamed in constant memory (app/services/exports.py).
+    """
+    filters = traceability_filters(battery_id, status, date_from, date_to, bms_id, invoice_id)
+    return stream_export(traceability_export(engine.dialect.name, filters), format, "traceability")
+
 @router.get("/cells/brands")
-async def get_unique_brands(db: Session = Depends(get_db)):
-    brands = db.query(CellGrading.brand).distinct().all()
-    return {"success": True, "data": [b[0] for b in brands if b[0]]}
\ No newline at end of file
+def get_unique_brands(
+    detail: bool    = Query(False),
+    db:     Session = Depends(get_db)
+):
+    """
+    Brands for the inventory filter dropdown, by name — read from the
+    brand / lot catalog (app/services/cell_catalog.py), not a DISTINCT over
+    cell_gradings. ?detail=true: per brand, the graded cell and lot counts
+    and first / last grading test date.
+    """
+    brands = catalog_brands(db)
+    return {"success": True, "data": brands if detail else [b["brand"] for b in brands]}
+
+
+@router.get("/cells/lots")
+def get_cell_lots(
+    brand: Optional[str] = None,
+    db:    Session       = Depends(get_db)
+):
+    """
+    Lots for the inventory lot filter, most recently seen first (of one
+    brand, if given): graded cell count and first / last grading test date
+    per brand / lot pair. From the catalog, like /cells/brands.
+    """
+    return {"success": True, "data": catalog_lots(db, brand)}
+
+
+@router.post("/cells/catalog/rebuild")
+async def rebuild_cell_catalog():
+    """
+    Rebuild the brand / lot catalog from cell_gradings on the ingestion
+    pool. Returns 202 + job_id; the job result lists the pairs whose cell
+    count had drifted. Safe to run live, like /counters/reconcile.
+    """
+    job = await jobs.submit("admin.catalog-rebuild", rebuild_catalog)
+    return JSONResponse(status_code=202, content=accepted(job))
+
+
+@router.post("/uploads/prune-hashes")
+async def prune_upload_fingerprints():
+    """
+    Delete upload fingerprints and row hashes older than
+    UPLOAD_HASH_RETENTION_DAYS on the ingestion pool (also done at
+    startup; schedule this for long-running deployments). Returns 202 +
+    job_id; the job result has the rows deleted per table.
+    """
+    job = await jobs.submit("admin.upload-hash-prune", prune_upload_hashes)
+    return JSONResponse(status_code=202, content=accepted(job))
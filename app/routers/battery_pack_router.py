@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.pack_test import PackTest
@@ -6,10 +7,15 @@ from app.models.battery_pack import Battery, BatteryCellMapping
 from app.models.battery import BatteryModel
 from app.models.cell import Cell
 from pydantic import BaseModel
-from typing import List, Optional
-import io
-import pandas as pd
-from app.core.signals import trigger_dashboard_update
+from typing import BinaryIO, Callable, List, Optional
+from collections import Counter
+from app.core.jobs import jobs, accepted
+from app.core.pubsub import event_bus
+from app.core.upload_spool import run_spooled, spool_upload, uploads_held
+from app.services.upload_reader import PACK_TEST_EXPORT, read_export
+from app.services.production_counters import (
+    PACK_TEST_PASS, battery_deltas, battery_snapshot, bump, cell_status_key, status_changes,
+)
 
 router = APIRouter(prefix="/batteries", tags=["Battery Production"])
 
@@ -294,8 +300,9 @@ async def assign_cells_to_battery(
         db.add_all(valid_mappings)
         for cell in cells_to_mark:
             cell.is_used = True
+        bump(db, {"cells.used": len(cells_to_mark)})
+        event_bus.publish(db, "cells.assigned", battery_id=data.battery_id, n=len(cells_to_mark))
         db.commit()
-        await trigger_dashboard_update()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -322,8 +329,9 @@ async def assign_cells_to_battery(
 
 @router.post("/upload-report")
 async def upload_pack_report_excel(
-    file: UploadFile = File(...),
-    db:   Session = Depends(get_db)
+    file:       UploadFile = File(...),
+    background: bool       = Query(False),
+    db:         Session    = Depends(get_db)
 ):
     """
     Upload pack test results (Excel).
@@ -333,15 +341,30 @@ async def upload_pack_report_excel(
       1 query → all existing PackTest records   (bulk IN)
       All mutations in-memory
       1 bulk insert for new PackTest rows
+      1 upsert of the production counters
       1 commit
+
+    ?background=true → 202 + job_id; see GET /jobs/{job_id}.
     """
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Please upload an Excel file (.xlsx or .xls)")
 
+    upload = await spool_upload(file)
+
+    if background:
+        job = await jobs.submit("batteries.upload-report", run_spooled, _process_pack_report, upload, filename=file.filename)
+        return JSONResponse(status_code=202, content=accepted(job))
+
+    async with uploads_held([upload]):
+        with upload.open() as handle:
+            result = _process_pack_report(db, handle)
+    return result
+
+
+def _process_pack_report(db: Session, handle: BinaryIO, progress: Optional[Callable] = None) -> dict:
+    """Parse + persist + commit a pack test upload. Shared by request and job paths."""
     try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        df.columns = df.columns.str.strip()
+        df = read_export(handle, PACK_TEST_EXPORT)
 
         # Validate required columns
         required = ['Barcode', 'final Result', 'Date']
@@ -352,8 +375,10 @@ async def upload_pack_report_excel(
                 detail=f"Missing required columns: {', '.join(missing)}"
             )
 
-        df['Barcode'] = df['Barcode'].astype(str).str.strip()
-        battery_ids  = df['Barcode'].tolist()
+        # Text columns arrive as clean strings (read_export); blank → ''
+        text_cols     = [c for c in PACK_TEST_EXPORT.text if c in df.columns]
+        df[text_cols] = df[text_cols].fillna('')
+        battery_ids   = df['Barcode'].tolist()
 
         # ── Bulk fetch batteries and existing pack tests ───────────────────────
         batteries     = db.query(Battery).filter(Battery.battery_id.in_(battery_ids)).all()
@@ -362,6 +387,10 @@ async def upload_pack_report_excel(
         pack_tests    = db.query(PackTest).filter(PackTest.battery_id.in_(battery_ids)).all()
         pack_test_map = {p.battery_id: p for p in pack_tests}
 
+        # State before mutation → production counter deltas
+        batteries_before = battery_snapshot(batteries)
+        passed_before    = sum(p.final_result == PACK_TEST_PASS for p in pack_tests)
+
         skipped_batteries  = []
         ng_marked          = []
         passed_and_updated = []
@@ -413,8 +442,18 @@ async def upload_pack_report_excel(
         if new_pack_tests:
             db.bulk_save_objects(new_pack_tests)
 
+        counters = battery_deltas(batteries_before, batteries)
+        counters["pack_tests.total"]  += len(new_pack_tests)
+        counters["pack_tests.passed"] += (
+            sum(p.final_result == PACK_TEST_PASS for p in pack_test_map.values()) - passed_before
+        )
+        bump(db, counters)
+        event_bus.publish(db, "pack_tests.uploaded", n=len(batteries))
+        event_bus.publish(db, "battery.status", ids=status_changes(batteries_before, batteries))
         db.commit()
-        await trigger_dashboard_update()
+
+        if progress:
+            progress(len(df), len(df))
 
         return {
             "status": "Success",
@@ -500,9 +539,14 @@ async def replace_leaked_cell(
 
     # Atomic swap
     try:
+        counters = Counter()
+        before   = battery_snapshot([battery])
         db.delete(old_mapping)
 
         if old_cell_rec:
+            counters[cell_status_key(old_cell_rec.status)] -= 1
+            counters[cell_status_key("ng")]                += 1
+            counters["cells.used"]                         -= bool(old_cell_rec.is_used)
             old_cell_rec.is_used  = False
             old_cell_rec.status   = "ng"
             old_cell_rec.ng_count = (old_cell_rec.ng_count or 0) + 1
@@ -511,6 +555,11 @@ async def replace_leaked_cell(
         new_cell.is_used      = True
         battery.had_ng_status = True
 
+        counters["cells.used"] += 1
+        counters.update(battery_deltas(before, [battery]))
+        bump(db, counters)
+        event_bus.publish(db, "cells.replaced", battery_id=data.battery_id, n=1)
+        event_bus.publish(db, "battery.status", ids=status_changes(before, [battery]))
         db.commit()
         return {
             "status":  "Success",
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.battery import BatteryModel
 from app.models.battery_pack import Battery
 from app.schemas.battery_schema import BatteryModelCreate, BatteryModelResponse
 from pydantic import BaseModel
-from typing import Optional, List
-import pandas as pd
-import io
+from typing import BinaryIO, Callable, Optional, List
+from app.core.jobs import jobs, accepted
+from app.core.pubsub import event_bus
+from app.core.upload_spool import run_spooled, spool_upload, uploads_held
+from app.services.upload_reader import BULK_LINK_EXPORT, read_export
+from app.services.production_counters import battery_deltas, battery_status_key, bump, status_changes
 
 router = APIRouter(prefix="/battery-models", tags=["Battery Models"])
 
@@ -109,6 +113,11 @@ def update_to_ready(battery_id: str, db: Session = Depends(get_db)):
             detail=f"Cannot mark as READY. Current status is {battery.overall_status}"
         )
     battery.overall_status = "READY TO DISPATCH"
+    bump(db, {
+        battery_status_key("FG PENDING"):        -1,
+        battery_status_key("READY TO DISPATCH"): +1,
+    })
+    event_bus.publish(db, "battery.status", ids={battery_id: battery.overall_status})
     db.commit()
     return {"status": "success", "new_status": battery.overall_status}
 
@@ -168,8 +177,9 @@ def delete_battery_model(model_id: str, db: Session = Depends(get_db)):
 
 @router.post("/bulk-link")
 async def bulk_link_batteries_to_models(
-    file: UploadFile = File(...),
-    db:   Session    = Depends(get_db)
+    file:       UploadFile = File(...),
+    background: bool       = Query(False),
+    db:         Session    = Depends(get_db)
 ):
     """
     Upload an Excel file with columns: battery_id, model_name.
@@ -182,27 +192,40 @@ async def bulk_link_batteries_to_models(
 
     Total: 3 DB round-trips regardless of file size.
     Previously: 2 queries × N rows.
+
+    ?background=true → 202 + job_id; see GET /jobs/{job_id}.
     """
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Please upload an Excel file (.xlsx or .xls)")
 
-    contents = await file.read()
+    upload = await spool_upload(file)
+
+    if background:
+        job = await jobs.submit("battery-models.bulk-link", run_spooled, _process_bulk_link, upload, filename=file.filename)
+        return JSONResponse(status_code=202, content=accepted(job))
+
+    async with uploads_held([upload]):
+        with upload.open() as handle:
+            return _process_bulk_link(db, handle)
+
+
+def _process_bulk_link(db: Session, handle: BinaryIO, progress: Optional[Callable] = None) -> dict:
+    """Parse + persist + commit a bulk-link upload. Shared by request and job paths."""
     try:
-        df = pd.read_excel(io.BytesIO(contents))
+        df = read_export(handle, BULK_LINK_EXPORT)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Could not read Excel file: {str(e)}")
 
-    df.columns = df.columns.str.strip().str.lower()
-
     required_cols = {'battery_id', 'model_name'}
     missing = required_cols - set(df.columns)
     if missing:
         raise HTTPException(
             status_code=422,
-            detail=f"Missing required columns: {missing}. Found: {list(df.columns)}"
+            detail=f"Missing required columns: {missing}. Found: {df.attrs.get('source_columns', list(df.columns))}"
         )
 
     # ── Step 1: Parse and clean every row ────────────────────────────────────
+    df = df.fillna('')   # both columns are read as clean text; blank → ''
     parsed_rows = []
     errors = []
 
@@ -271,11 +294,16 @@ async def bulk_link_batteries_to_models(
     try:
         if new_batteries:
             db.bulk_save_objects(new_batteries)
+        bump(db, battery_deltas({}, new_batteries))
+        event_bus.publish(db, "battery.status", ids=status_changes({}, new_batteries))
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    if progress:
+        progress(len(df), len(df))
+
     return {
         "status": "Complete",
         "summary": {
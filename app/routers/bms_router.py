@@ -5,7 +5,7 @@ from app.models.bms import BMS
 from app.models.battery_pack import Battery
 from app.models.battery import BatteryModel
 from pydantic import BaseModel
-from app.core.signals import trigger_dashboard_update
+from app.core.pubsub import event_bus
 
 router = APIRouter(prefix="/bms", tags=["BMS Management"])
 
@@ -78,8 +78,8 @@ async def map_bms_to_battery(data: BMSMappingRequest, db: Session = Depends(get_
     bms.battery_id = data.battery_id
     bms.is_used    = True
 
+    event_bus.publish(db, "bms.mapped", ids={data.battery_id: data.bms_id})
     db.commit()
-    await trigger_dashboard_update()
 
     return {
         "status":             "Success",
@@ -1,65 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from typing import BinaryIO, Callable, Optional
+from collections import Counter
 import pandas as pd
-import io
 
 from app.database import get_db
-from app.models.cell import Cell, CellGrading
-from app.core.signals import trigger_dashboard_update
+from app.models.cell import Cell
+from app.core.jobs import jobs, accepted
+from app.core.pubsub import event_bus
+from app.core.upload_spool import run_spooled, spool_upload, uploads_held
+from app.services.upload_reader import GRADING_EXPORT, SORTING_EXPORT, iter_upload_chunks, read_export
+from app.services.grading_engine import clean_str_series, evaluate_sorting, reduce_grading_rows
+from app.services.cell_persistence import persist_grading_batch, persist_sorting_updates
+from app.services.cell_catalog import CatalogDeltas, bump_catalog
+from app.services.production_counters import bump
+from app.services.upload_fingerprint import (
+    cached_result, content_digest, new_row_mask, record_row_hashes, record_upload, row_hashes,
+)
 
 router = APIRouter(prefix="/cells", tags=["Cell Management"])
 
+# Rows per chunk in streaming grading mode — bounds both worker memory and
+# the size of each IN (...) lookup.
+GRADING_CHUNK_ROWS = 5000
 
-# ── Helper ────────────────────────────────────────────────────────────────────
 
-def _clean_str(val) -> str | None:
-    """
-    Convert a value to a clean string, handling pandas float reads of
-    integer Excel cells:
-
-        101.0       → "101"
-        4842231.0   → "4842231"
-        "TEN POWER" → "TEN POWER"   (strings unchanged)
-        NaN / None  → None
+# ── Page 1: Cell Grading Upload ───────────────────────────────────────────────
 
-    Root cause: Excel stores Cell ID and Lot as numbers. pandas reads
-    numeric columns as float64 by default, turning 101 into 101.0.
-    astype(str) then gives "101.0" instead of "101".
+def _apply_grading_chunk(
+    db:       Session,
+    df:       pd.DataFrame,
+    summary:  dict,
+    counters: Counter,
+    catalog:  CatalogDeltas,
+    lots:     Counter,
+) -> None:
     """
-    if val is None:
-        return None
-    if isinstance(val, float):
-        if pd.isna(val):
-            return None
-        # Whole-number float → strip decimal: 101.0 → "101"
-        return str(int(val)) if val == int(val) else str(val)
-    s = str(val).strip()
-    return s if s and s.lower() != 'nan' else None
-
-
-def _clean_cell_id_series(series: pd.Series) -> pd.Series:
+    Apply one block of grading rows: drop rows applied by an earlier upload
+    (upload_fingerprint), columnar state transitions (grading_engine), then
+    one bulk upsert (cell_persistence), then flush. Cell counter and brand /
+    lot catalog deltas are accumulated in `counters` / `catalog` and applied
+    once, before the final commit; graded cells per lot in `lots`, for the
+    change event.
+
+    Used for the whole file in single-shot mode and once per chunk in
+    streaming mode. Each chunk is written before the next one is read, so
+    later chunks see cells (and row hashes) written by earlier ones and both
+    modes produce the same summary.
     """
-    Apply _clean_str logic to an entire pandas Series efficiently.
-    Used to fix the Cell ID column before building cell_ids list.
-    """
-    return series.apply(lambda x: _clean_str(x) if pd.notna(x) else None)
+    hashes = row_hashes(df)
+    fresh  = new_row_mask(db, "grading", hashes)
+    summary["duplicate_rows"] += int((~fresh).sum())
 
+    if fresh.any():
+        batch = reduce_grading_rows(df[fresh])
+        for key, count in persist_grading_batch(db, batch, counters, catalog).items():
+            summary[key] += count
+        for lot, count in batch.cells["lot"].dropna().astype(str).value_counts().items():
+            lots[lot] += int(count)
+        record_row_hashes(db, "grading", hashes[fresh])
+
+    db.flush()
 
-# ── Page 1: Cell Grading Upload ───────────────────────────────────────────────
 
 @router.post("/upload-grading")
-async def upload_grading(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_grading(
+    file:       UploadFile = File(...),
+    streaming:  bool       = Query(False),
+    background: bool       = Query(False),
+    db:         Session    = Depends(get_db)
+):
     """
     Upload grading report (CSV or Excel) — optimised for 40,000+ rows/day.
 
     Performance strategy:
-    - 1 query  to fetch ALL matching Cell records at once
-    - 1 query  to fetch ALL matching CellGrading records at once
-    - All mutations happen in Python (in-memory)
-    - 1 bulk INSERT for new Cell records
-    - 1 bulk INSERT for new CellGrading records
+    - State transitions computed on whole columns (grading_engine), no row loop
+    - Batch COPY'd into a temp staging table (cell_persistence)
+    - 1 locking SELECT for the summary counters, 1 SELECT of the stored brand / lot
+    - 1 INSERT … ON CONFLICT for cells (pass-lock + ng_count rules in SQL)
+    - 1 INSERT … ON CONFLICT for cell_gradings
+    - 1 upsert of the cell counters (production_counters)
+    - 1 upsert of the brand / lot catalog (cell_catalog)
     - 1 final commit
-    Total: 3-5 DB round-trips regardless of file size.
+    Total: ~8 DB round-trips regardless of file size, no per-row UPDATEs.
+
+    Re-uploads (upload_fingerprint):
+    - Byte-identical file already applied → stored response, "cached": true
+    - Rows applied by an earlier upload (or repeated within this file) are
+      not re-applied, so ng_count never counts the same test twice;
+      they are reported as summary.duplicate_rows
+
+    Memory:
+    - The upload is spooled to a temp file, never held in RAM as bytes, and
+      waits for its share of the upload memory budget (app/core/upload_spool.py)
+
+    Streaming mode (?streaming=true):
+    - File is read from the spooled upload in GRADING_CHUNK_ROWS-row chunks
+      (CSV via pandas chunksize, .xlsx via openpyxl read-only mode)
+    - Lookup + upsert + flush per chunk; session cleared between chunks
+    - Memory stays bounded by the chunk size, and each IN (...) query holds
+      at most GRADING_CHUNK_ROWS ids
+    - Still 1 final commit — the upload is all-or-nothing in both modes
+
+    Background mode (?background=true):
+    - Returns 202 + job_id immediately; the upload runs on the ingestion
+      pool (app/core/jobs.py) in streaming mode with per-chunk progress
+    - Poll GET /jobs/{job_id} or subscribe to /jobs/ws/{job_id}
 
     Business rules:
     - Auto-registers cell if not found in DB
@@ -71,159 +118,147 @@ async def upload_grading(file: UploadFile = File(...), db: Session = Depends(get
     - auto_registered: brand new cell seen for the first time
     - updated:         existing cell whose master record was updated
     - skipped:         existing cell already at "pass" — master locked, detail still updated
-    - errors:          rows that threw an exception
+    - duplicate_rows:  rows already applied by an earlier upload / earlier in this file
+    - errors:          kept for response compatibility (columnar engine has no per-row failures)
     """
-    contents = await file.read()
-
-    if file.filename.endswith(('.xlsx', '.xls')):
-        df = pd.read_excel(io.BytesIO(contents))
-    else:
-        df = pd.read_csv(io.BytesIO(contents))
-
-    df = df.dropna(subset=['Cell ID'])
-
-    import numpy as np
-    df = df.replace({pd.NA: None, np.nan: None})
-
-    # FIX: use _clean_cell_id_series instead of plain astype(str).str.strip()
-    # This converts 101.0 → "101" instead of "101.0"
-    df['Cell ID'] = _clean_cell_id_series(df['Cell ID'])
-    df = df[df['Cell ID'].notna()]   # drop any rows where cell_id became None
-
-    # ── Validate required columns ─────────────────────────────────────────────
-    required = ['Cell ID', 'final Result', 'Discharging Capacity(mAh)', 'Date']
-    missing  = [c for c in required if c not in df.columns]
-    if missing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns in file: {', '.join(missing)}"
+    upload = await spool_upload(file)
+
+    if background:
+        # Job outlives the request → it takes over the spooled file.
+        # Jobs always stream so progress is reported per chunk.
+        job = await jobs.submit(
+            "cells.upload-grading", run_spooled, _process_grading, upload, file.filename, True,
+            filename=file.filename,
         )
-
-    cell_ids = df['Cell ID'].tolist()
-
-    # ── Bulk fetch — 1 query each ─────────────────────────────────────────────
-    existing_cells    = db.query(Cell).filter(Cell.cell_id.in_(cell_ids)).all()
-    existing_gradings = db.query(CellGrading).filter(CellGrading.cell_id.in_(cell_ids)).all()
-
-    cell_map    = {c.cell_id: c for c in existing_cells}
-    grading_map = {g.cell_id: g for g in existing_gradings}
-
-    summary = {"auto_registered": 0, "updated": 0, "skipped": 0, "errors": 0}
-    errors  = []
-
-    new_cells    = []
-    new_gradings = []
-
-    for _, row in df.iterrows():
-        try:
-            cell_id = _clean_str(row['Cell ID'])
-            if not cell_id:
-                continue
-
-            # ── Auto-register if not found ────────────────────────────────────
-            cell        = cell_map.get(cell_id)
-            is_new_cell = (cell is None)
-
-            if is_new_cell:
-                cell = Cell(cell_id=cell_id, is_used=False, status="pending", ng_count=0)
-                new_cells.append(cell)
-                cell_map[cell_id] = cell
-
-            # ── Update master Cell record ─────────────────────────────────────
-            already_passed = (cell.status == "pass")
-
-            if already_passed:
-                summary["skipped"] += 1
-
-            else:
-                is_pass = str(row.get('final Result', '')).strip().upper() == "PASS"
-
-                if is_pass:
-                    cell.status                   = "pass"
-                    cell.discharging_capacity_mah = row.get('Discharging Capacity(mAh)')
-                else:
-                    cell.status    = "ng"
-                    cell.ng_count  = (cell.ng_count or 0) + 1
-                    cell.discharging_capacity_mah = row.get('Discharging Capacity(mAh)')
-
-                cell.last_test_date = row.get('Date')
-
-                if is_new_cell:
-                    summary["auto_registered"] += 1
-                else:
-                    summary["updated"] += 1
-
-            
-            grading_data = {
-                "test_date":                row.get('Date'),
-                "lot":                      _clean_str(row.get('Lot')),
-                "brand":                    _clean_str(row.get('Brand')),
-                "specification":            _clean_str(row.get('Specification')),
-                "ocv_voltage_mv":           row.get('OCV Voltage(mV)', 0),
-                "upper_cutoff_mv":          row.get('Upper cut off(mV)', 0),
-                "lower_cutoff_mv":          row.get('Lower cut off(mV)', 0),
-                "discharging_capacity_mah": row.get('Discharging Capacity(mAh)', 0),
-                "result":                   _clean_str(row.get('Result', '')),
-                "final_soc_mah":            row.get('Final SOC(mAh)', 0),
-                "soc_result":               _clean_str(row.get('SOC Result', '')), # FIXED PARENTHESES
-                "final_cv_capacity":        row.get('Final CV Capacity', 0),
-                "final_result":             _clean_str(row.get('final Result', '')),
-            }
-
-            existing_grading = grading_map.get(cell_id)
-            if existing_grading:
-                for k, v in grading_data.items():
-                    setattr(existing_grading, k, v)
-            else:
-                new_grading = CellGrading(cell_id=cell_id, **grading_data)
-                new_gradings.append(new_grading)
-                grading_map[cell_id] = new_grading
-
-        except Exception as e:
-            summary["errors"] += 1
-            errors.append({"cell_id": str(row.get('Cell ID', '?')), "reason": str(e)})
-
-    # ── Bulk insert all new records — 1 operation each ────────────────────────
-    if new_cells:
-        db.bulk_save_objects(new_cells)
-        db.flush()   # flush so new cell PKs exist before grading foreign keys insert
-
-    if new_gradings:
-        db.bulk_save_objects(new_gradings)
-
+        return JSONResponse(status_code=202, content=accepted(job))
+
+    async with uploads_held([upload]):
+        with upload.open() as handle:
+            result = _process_grading(db, handle, file.filename, streaming)
+    return result
+
+
+def _process_grading(
+    db:        Session,
+    handle:    BinaryIO,
+    filename:  str,
+    streaming: bool,
+    progress:  Optional[Callable] = None,
+) -> dict:
+    """Parse + persist + commit a grading upload. Shared by request and job paths."""
+    digest = content_digest(handle)
+    cached = cached_result(db, "grading", digest)
+    if cached:
+        return {**cached, "cached": True}
+
+    summary  = {"auto_registered": 0, "updated": 0, "skipped": 0, "duplicate_rows": 0, "errors": 0}
+    errors   = []
+    counters = Counter()         # production counter deltas, bumped with the commit
+    catalog  = CatalogDeltas()   # brand / lot catalog deltas, applied with the commit
+    lots     = Counter()         # graded cells per lot, for the change event
+
+    # Whole file as one chunk unless streaming; only GRADING_EXPORT columns are read
+    chunks = iter_upload_chunks(
+        handle, filename, GRADING_CHUNK_ROWS if streaming else None, GRADING_EXPORT
+    )
+
+    rows_done = 0
     try:
+        for i, chunk in enumerate(chunks):
+            # ── Validate required columns (header is identical on every chunk) ─
+            if i == 0:
+                required = ['Cell ID', 'final Result', 'Discharging Capacity(mAh)', 'Date']
+                missing  = [c for c in required if c not in chunk.columns]
+                if missing:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Missing required columns in file: {', '.join(missing)}"
+                    )
+
+            _apply_grading_chunk(db, chunk, summary, counters, catalog, lots)
+
+            if streaming:
+                db.expunge_all()   # release this chunk's ORM objects
+
+            rows_done += len(chunk)
+            if progress:
+                progress(rows_done, None if streaming else len(chunk))
+
+        result = {"status": "Complete", "summary": summary, "errors": errors}
+        record_upload(db, "grading", digest, filename, result)
+        bump(db, counters)
+        bump_catalog(db, catalog)
+        event_bus.publish(
+            db, "cells.graded",
+            n=summary["auto_registered"] + summary["updated"] + summary["skipped"], lots=dict(lots),
+        )
         db.commit()
-        await trigger_dashboard_update()
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    return {"status": "Complete", "summary": summary, "errors": errors}
+    return {**result, "cached": False}
 
 
 # ── Page 2: Cell Sorting Upload ───────────────────────────────────────────────
 
 @router.post("/upload-sorting")
-async def upload_sorting(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_sorting(
+    file:       UploadFile = File(...),
+    background: bool       = Query(False),
+    db:         Session    = Depends(get_db)
+):
     """
     Upload sorting report (Excel) — optimised for 40,000+ rows/day.
 
     Performance strategy:
-    - 1 query to fetch ALL matching Cell records at once
-    - All mutations happen in Python (in-memory)
+    - 1 query to fetch ALL matching Cell statuses at once
+    - Eligibility checks computed on whole columns (grading_engine)
+    - Sorted cells COPY'd to staging + 1 UPDATE … FROM (last row per cell wins)
     - 1 final commit
-    Total: 2 DB round-trips regardless of file size.
+    Total: constant DB round-trips regardless of file size.
 
     Business rules:
     - Cell must have status "pass" before sorting data is written
     - Always overwrites with latest IR and voltage (re-sorting allowed)
+    - Rows already sorted by an earlier upload are not re-applied
+      (summary.duplicate_rows); a byte-identical file whose rows all sorted
+      returns the stored response ("cached": true). Rejected rows are not
+      remembered, so they are retried once the cell has passed grading.
+
+    ?background=true → 202 + job_id; see GET /jobs/{job_id}.
     """
-    contents = await file.read()
-    df = pd.read_excel(io.BytesIO(contents))
+    upload = await spool_upload(file)
+
+    if background:
+        job = await jobs.submit(
+            "cells.upload-sorting", run_spooled, _process_sorting, upload, file.filename,
+            filename=file.filename,
+        )
+        return JSONResponse(status_code=202, content=accepted(job))
+
+    async with uploads_held([upload]):
+        with upload.open() as handle:
+            result = _process_sorting(db, handle, file.filename)
+    return result
+
 
-    # FIX: same clean conversion for sorting file Cell IDs
-    df['Cell ID'] = _clean_cell_id_series(df['Cell ID'])
-    df = df[df['Cell ID'].notna()]
+def _process_sorting(
+    db:       Session,
+    handle:   BinaryIO,
+    filename: Optional[str] = None,
+    progress: Optional[Callable] = None,
+) -> dict:
+    """Parse + persist + commit a sorting upload. Shared by request and job paths."""
+    digest = content_digest(handle)
+    cached = cached_result(db, "sorting", digest)
+    if cached:
+        return {**cached, "cached": True}
+
+    df = read_export(handle, SORTING_EXPORT, filename)
 
     # ── Validate required columns ─────────────────────────────────────────────
     required_columns = ['Cell ID', 'IR VALUE', 'VOLTAGE']
@@ -234,64 +269,35 @@ async def upload_sorting(file: UploadFile = File(...), db: Session = Depends(get
             detail=f"Missing required columns in file: {', '.join(missing_cols)}"
         )
 
-    cell_ids = df['Cell ID'].tolist()
-
-    # ── Bulk fetch — 1 query ──────────────────────────────────────────────────
-    existing_cells = db.query(Cell).filter(Cell.cell_id.in_(cell_ids)).all()
-    cell_map       = {c.cell_id: c for c in existing_cells}
-
-    summary = {"sorted": 0, "not_graded": 0, "not_found": 0, "missing_data": 0, "errors": 0}
-    errors  = []
+    total_rows = len(df)
+    hashes     = row_hashes(df)
+    fresh      = new_row_mask(db, "sorting", hashes)
+    df         = df[fresh]
 
-    for _, row in df.iterrows():
-        try:
-            cell_id = _clean_str(row['Cell ID'])
-            if not cell_id:
-                continue
+    cell_ids = clean_str_series(df['Cell ID']).dropna().unique().tolist()
 
-            cell = cell_map.get(cell_id)
-
-            if not cell:
-                summary["not_found"] += 1
-                errors.append({"cell_id": cell_id, "reason": "Not found in database"})
-                continue
-
-            if cell.status != "pass":
-                summary["not_graded"] += 1
-                errors.append({
-                    "cell_id": cell_id,
-                    "reason": f"Cell has not passed grading (status: {cell.status.upper()})"
-                })
-                continue
-
-            ir   = row.get('IR VALUE')
-            volt = row.get('VOLTAGE')
-
-            if ir is None or volt is None or (isinstance(ir, float) and pd.isna(ir)) or (isinstance(volt, float) and pd.isna(volt)):
-                summary["missing_data"] += 1
-                errors.append({
-                    "cell_id": cell_id,
-                    "reason": "IR VALUE or VOLTAGE is missing or empty in this row"
-                })
-                continue
-
-            cell.ir_value_m_ohm  = float(ir)
-            cell.sorting_voltage = float(volt)
-
-            if row.get('Date') and not (isinstance(row.get('Date'), float) and pd.isna(row.get('Date'))):
-                cell.sorting_date = row.get('Date')
-
-            summary["sorted"] += 1
+    # ── Bulk fetch — 1 query ──────────────────────────────────────────────────
+    status_map = dict(
+        db.query(Cell.cell_id, Cell.status).filter(Cell.cell_id.in_(cell_ids)).all()
+    )
 
-        except Exception as e:
-            summary["errors"] += 1
-            errors.append({"cell_id": str(row.get('Cell ID', '?')), "reason": str(e)})
+    changes = evaluate_sorting(df, status_map)
+    summary = {**changes.summary, "duplicate_rows": int((~fresh).sum())}
+    errors  = changes.errors
+    result  = {"status": "Sorting Updated", "summary": summary, "errors": errors}
 
     try:
+        persist_sorting_updates(db, changes.updates)
+        record_row_hashes(db, "sorting", hashes.loc[changes.applied])
+        if not errors:
+            record_upload(db, "sorting", digest, filename, result)
+        event_bus.publish(db, "cells.sorted", n=len(changes.updates))
         db.commit()
-        await trigger_dashboard_update()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    return {"status": "Sorting Updated", "summary": summary, "errors": errors}
\ No newline at end of file
+    if progress:
+        progress(total_rows, total_rows)
+
+    return {**result, "cached": False}
@@ -6,7 +6,8 @@ from app.database import get_db
 from app.models.dispatch import Dispatch
 from app.models.battery_pack import Battery
 from app.models.pdi import PDIReport
-from app.core.signals import trigger_dashboard_update
+from app.core.pubsub import event_bus
+from app.services.production_counters import battery_status_key, bump, dispatch_day, dispatch_day_key
 
 router = APIRouter(prefix="/dispatch", tags=["Dispatch & Sales"])
 
@@ -93,15 +94,24 @@ async def register_dispatch(data: DispatchRequest, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="Battery has already been dispatched/invoiced")
 
     try:
-        db.add(Dispatch(
+        dispatch = Dispatch(
             battery_id=data.battery_id,
             customer_name=data.customer_name,
             invoice_id=data.invoice_id,
             invoice_date=data.invoice_date,
-        ))
+        )
+        db.add(dispatch)
         battery.overall_status = "DISPATCHED"
+        db.flush()   # dispatch_timestamp is the database's now()
+        bump(db, {
+            "dispatch.total":                             +1,
+            dispatch_day_key(dispatch_day(db, dispatch)): +1,
+            battery_status_key("READY TO DISPATCH"):      -1,
+            battery_status_key("DISPATCHED"):             +1,
+        })
+        event_bus.publish(db, "dispatch", ids=[data.battery_id])
+        event_bus.publish(db, "battery.status", ids={data.battery_id: battery.overall_status})
         db.commit()
-        await trigger_dashboard_update()
         return {
             "status":  "Success",
             "message": f"Battery {data.battery_id} dispatched to {data.customer_name}",
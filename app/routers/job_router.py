@@ -0,0 +1,60 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.jobs import jobs, JOB_HEARTBEAT_S, TERMINAL
+
+router = APIRouter(prefix="/jobs", tags=["Ingestion Jobs"])
+
+
+@router.get("/{job_id}")
+def get_job_status(job_id: str):
+    """Status, progress counters and (when complete) the upload summary."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return job.snapshot()
+
+
+@router.websocket("/ws/{job_id}")
+async def websocket_job(websocket: WebSocket, job_id: str):
+    """
+    Push the job snapshot on every progress update.
+    Sends the current state on connect and closes once the job finishes.
+    A job running on another worker is re-read from ingest_jobs on each of
+    its events, and at least every JOB_HEARTBEAT_S (so a job whose worker
+    died is reported failed).
+    """
+    await websocket.accept()
+
+    queue = jobs.subscribe(job_id)
+    try:
+        job = await run_in_threadpool(jobs.get, job_id)
+        if not job:
+            await websocket.send_json({"job_id": job_id, "status": "unknown"})
+            await websocket.close()
+            return
+
+        snapshot = job.snapshot()
+        await websocket.send_json(snapshot)
+        while snapshot["status"] not in TERMINAL:
+            try:
+                update = await asyncio.wait_for(queue.get(), JOB_HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                update = None
+            if update is None:
+                if jobs.is_local(job_id):
+                    continue
+                job = await run_in_threadpool(jobs.get, job_id)
+                if not job:
+                    break
+                update = job.snapshot()
+            if update != snapshot:
+                snapshot = update
+                await websocket.send_json(snapshot)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        jobs.unsubscribe(job_id, queue)
@@ -1,67 +1,142 @@
 import asyncio
-import io
 import numpy as np
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from collections import Counter
+from itertools import repeat
+from typing import Callable, Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.pdi import PDIReport
 from app.models.battery_pack import Battery
-from app.core.signals import trigger_dashboard_update
+from app.core.jobs import jobs, accepted
+from app.core.pubsub import event_bus
+from app.core.parse_pool import parse_pool
+from app.core.upload_spool import SpooledUpload, spool_upload, uploads_held, uploads_held_blocking
+from app.services.upload_reader import PDI_EXPORT, parse_export_columns
+from app.services.production_counters import PDI_PASS, battery_deltas, battery_snapshot, bump, status_changes
+from app.services.upload_fingerprint import (
+    content_digest, known_uploads, new_row_mask, record_row_hashes, record_upload, row_hashes,
+)
 
 router = APIRouter(prefix="/pdi", tags=["Pre-Delivery Inspection"])
 
-# Thread pool for CPU-bound pandas work — won't block the async event loop.
-# max_workers=4 means up to 4 files parsed simultaneously.
-# On t3.small (2 vCPUs), 4 workers is a safe ceiling.
-_executor = ThreadPoolExecutor(max_workers=4)
-
 # Max upload size guard — 200 files × ~25KB = ~5MB raw.
 # Set generously to handle larger PDI reports without crashing.
 MAX_TOTAL_SIZE_MB = 100
 MAX_FILES         = 250
 
+# Pipeline (_run_pdi_pipeline): parsed files per lookup/flush micro-batch,
+# and how many parsed files may wait ahead of the DB stage.
+PIPELINE_FILES       = 25
+PIPELINE_QUEUE_FILES = 50
+
 
-def _parse_one_file(filename: str, contents: bytes) -> tuple[str, pd.DataFrame | None, str | None]:
+def _parse_files(uploads: List[SpooledUpload]) -> Iterator[tuple[str, pd.DataFrame | None, str | None]]:
     """
-    Parse a single PDI Excel file into a DataFrame.
-    Runs in a thread pool — does NOT block the async event loop.
+    Parse PDI Excel files on the parse pool (app/core/parse_pool.py) —
+    worker processes by default, so files parse in parallel across cores.
+    Workers open the spooled file by path and return plain column arrays;
+    the DataFrame is rebuilt here.
 
-    Returns: (filename, dataframe_or_None, error_message_or_None)
+    Yields, in upload order: (filename, dataframe_or_None, error_message_or_None)
     """
-    try:
-        df = pd.read_excel(io.BytesIO(contents))
-        df = df.replace({np.nan: None})
-        df.columns = df.columns.str.strip()
-        return filename, df, None
-    except Exception as e:
-        return filename, None, str(e)
+    filenames = [upload.filename for upload in uploads]
+    results   = parse_pool.map(
+        parse_export_columns, [upload.path for upload in uploads], repeat(PDI_EXPORT), filenames
+    )
+
+    for filename, (columns, error) in zip(filenames, results):
+        if error is not None:
+            yield filename, None, error
+        else:
+            yield filename, pd.DataFrame(columns).replace({np.nan: None}), None
+
+
+def _skip_cached_files(db: Session, uploads: List[SpooledUpload]) -> tuple[list, list, int]:
+    """
+    Drop files already applied byte-for-byte by an earlier upload.
+    Returns (uploads_to_parse, their sha256 digests, cached_file_count).
+    """
+    digests = []
+    for upload in uploads:
+        with upload.open() as handle:
+            digests.append(content_digest(handle))
+    known   = known_uploads(db, "pdi", digests)
+
+    pending = [(u, d) for u, d in zip(uploads, digests) if d not in known]
+    return [u for u, _ in pending], [d for _, d in pending], len(uploads) - len(pending)
+
+
+def _collect_rows(parse_results) -> tuple[list, list]:
+    """Flatten parsed files into (filename, battery_id, row_dict, row_hash) + file-level errors."""
+    parsed_rows = []   # (filename, battery_id, row_dict, row_hash)
+    file_errors = []   # file-level errors (unreadable files)
+
+    for filename, df, error in parse_results:
+        if error or df is None:
+            file_errors.append({"file": filename, "reason": error or "Failed to parse"})
+            continue
+
+        if 'Internal SN' not in df.columns:
+            file_errors.append({
+                "file":   filename,
+                "reason": "Missing required column: 'Internal SN'"
+            })
+            continue
+
+        if 'Test Result' not in df.columns:
+            file_errors.append({
+                "file":   filename,
+                "reason": "Missing required column: 'Test Result'"
+            })
+            continue
+
+        hashes = row_hashes(df)
+        for idx, row in df.iterrows():
+            raw_id = row.get('Internal SN')
+            if raw_id is None or str(raw_id).strip() in ('', 'None', 'nan'):
+                continue
+            parsed_rows.append((filename, str(raw_id).strip(), row.to_dict(), hashes[idx]))
+
+    return parsed_rows, file_errors
 
 
 @router.post("/upload-batch")
 async def upload_batch_pdi(
-    files: List[UploadFile] = File(...),
-    db:    Session          = Depends(get_db)
+    files:      List[UploadFile] = File(...),
+    background: bool             = Query(False),
+    db:         Session          = Depends(get_db)
 ):
     """
     Upload 1–250 PDI Excel files in one request.
 
     Performance strategy:
-    - Read all file bytes async (non-blocking, fast)
-    - Parse all Excel files IN PARALLEL via thread pool (non-blocking)
-    - ONE bulk query for all Battery records
-    - ONE bulk query for all existing PDIReport records
-    - All mutations in-memory
-    - ONE bulk insert + ONE commit
+    - Spool each file to a temp file (never held in RAM as bytes) and wait for
+      the batch's share of the upload memory budget (app/core/upload_spool.py)
+    - Parse all Excel files IN PARALLEL on the parse pool (worker processes,
+      one per core; openpyxl holds the GIL, so threads would parse serially)
+    - Pipelined: parsed files flow through a bounded queue into micro-batches
+      of PIPELINE_FILES, so DB work starts while later files still parse
+    - Per micro-batch: ONE Battery query, ONE PDIReport query, mutations
+      in-memory, ONE bulk insert + flush
+    - ONE commit at the end — the batch is all-or-nothing
 
     This means:
     - Other API requests (barcode scans etc) are NOT blocked during upload
-    - 200 files parsed in ~0.8s instead of ~3s sequential
-    - Total DB round-trips: 3 regardless of file count
+    - DB round-trips grow with files / PIPELINE_FILES, not with row count
+    - Peak memory is one micro-batch of rows, not the whole batch
+
+    Re-uploads (upload_fingerprint):
+    - Files already applied byte-for-byte are not parsed (stats.cached_files)
+    - Rows applied by an earlier upload are skipped (stats.duplicate_rows)
+    - Rows for unregistered batteries are not remembered → retried next time
+
+    ?background=true → 202 + job_id; parsing and persistence run on the
+    ingestion pool with progress per micro-batch (GET /jobs/{job_id}).
 
     Business rules:
     - Battery must already exist (registered via bulk-link)
@@ -77,89 +152,178 @@ async def upload_batch_pdi(
             detail=f"Too many files. Maximum is {MAX_FILES} per upload. Got {len(files)}."
         )
 
-    # ── Step 1: Read all file bytes (async — fast, non-blocking) ─────────────
-    file_contents = []
-    total_size    = 0
+    # ── Step 1: Spool every file to disk (app/core/upload_spool.py) ──────────
+    uploads    = []
+    total_size = 0
 
-    for file in files:
-        contents    = await file.read()
-        total_size += len(contents)
+    try:
+        for file in files:
+            upload      = await spool_upload(file)
+            total_size += upload.size
+            uploads.append(upload)
+
+            # Guard: total size limit
+            if total_size > MAX_TOTAL_SIZE_MB * 1024 * 1024:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Total upload size exceeds {MAX_TOTAL_SIZE_MB}MB limit. "
+                           f"Split into smaller batches."
+                )
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        raise
+
+    if background:
+        job = await jobs.submit(
+            "pdi.upload-batch", _process_pdi_batch, uploads,
+            filename=f"{len(uploads)} files",
+        )
+        return JSONResponse(status_code=202, content=accepted(job))
 
-        # Guard: total size limit
-        if total_size > MAX_TOTAL_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Total upload size exceeds {MAX_TOTAL_SIZE_MB}MB limit. "
-                       f"Split into smaller batches."
-            )
+    # ── Step 2: Parse → lookups → flush, pipelined; one commit ────────────────
+    async with uploads_held(uploads):
+        pending, digests, cached_files = _skip_cached_files(db, uploads)
+        result = await _run_pdi_pipeline(db, pending, digests, len(files), cached_files)
+    return result
 
-        file_contents.append((file.filename, contents))
 
-    # ── Step 2: Parse all Excel files IN PARALLEL via thread pool ─────────────
-    # asyncio.gather runs all parse tasks concurrently.
-    # Each runs in _executor so pandas never blocks the event loop.
-    # 200 files: sequential ~3s → parallel ~0.8s
-    loop = asyncio.get_event_loop()
+def _process_pdi_batch(db: Session, uploads: List[SpooledUpload], progress: Optional[Callable] = None) -> dict:
+    """
+    Job body for ?background=true. Runs on an ingestion worker thread, so
+    the pipeline gets its own event loop here.
+    """
+    total = len(uploads)
 
-    parse_tasks = [
-        loop.run_in_executor(_executor, _parse_one_file, filename, contents)
-        for filename, contents in file_contents
-    ]
+    with uploads_held_blocking(uploads):
+        pending, digests, cached_files = _skip_cached_files(db, uploads)
+        if progress:
+            progress(cached_files, total)
 
-    parse_results = await asyncio.gather(*parse_tasks)
+        return asyncio.run(_run_pdi_pipeline(db, pending, digests, total, cached_files, progress))
 
-    # ── Step 3: Collect rows from all successfully parsed files ───────────────
-    parsed_rows = []   # (filename, battery_id, row_dict)
-    file_errors = []   # file-level errors (unreadable files)
 
-    for filename, df, error in parse_results:
-        if error or df is None:
-            file_errors.append({"file": filename, "reason": error or "Failed to parse"})
-            continue
+# ── Pipeline: parse → micro-batch apply → one commit ──────────────────────────
 
-        if 'Internal SN' not in df.columns:
-            file_errors.append({
-                "file":   filename,
-                "reason": "Missing required column: 'Internal SN'"
-            })
-            continue
+async def _run_pdi_pipeline(
+    db:            Session,
+    uploads:       List[SpooledUpload],
+    digests:       list,
+    total_files:   int,
+    cached_files:  int,
+    progress:      Optional[Callable] = None,
+) -> dict:
+    """
+    Two stages joined by a bounded asyncio queue:
 
-        if 'Test Result' not in df.columns:
-            file_errors.append({
-                "file":   filename,
-                "reason": "Missing required column: 'Test Result'"
-            })
-            continue
+      parse  files come off the parse pool in upload order
+      apply  every PIPELINE_FILES parsed files → lookups + mutations + flush
+             (_apply_pdi_chunk), on a worker thread
 
-        for _, row in df.iterrows():
-            raw_id = row.get('Internal SN')
-            if raw_id is None or str(raw_id).strip() in ('', 'None', 'nan'):
-                continue
-            parsed_rows.append((filename, str(raw_id).strip(), row.to_dict()))
+    Lookups for the first files run while later files are still parsing,
+    and only PIPELINE_QUEUE_FILES parsed files plus one micro-batch of ORM
+    objects are held at a time. The upload still commits once
+    (_finish_pdi_batch), so it stays all-or-nothing.
+    """
+    loop  = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_FILES)
+    state = {
+        "summary":        {"created": [], "updated": [], "errors": []},
+        "file_errors":    [],
+        "rows_parsed":    0,
+        "rows_processed": 0,
+        "duplicate_rows": 0,
+        "seen":           set(),   # row hashes met earlier in this upload
+        "counters":       Counter(),   # production counter deltas, bumped with the commit
+        "results":        {},          # battery id → PDI test result
+        "status_changed": {},          # battery id → new status, for the change event
+    }
+
+    async def parse_stage():
+        results = _parse_files(uploads)
+        try:
+            while (item := await loop.run_in_executor(None, next, results, None)) is not None:
+                await queue.put(item)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)   # hand the failure to the apply stage
+
+    async def apply_stage():
+        pending = []
+        done    = cached_files
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is not None:
+                pending.append(item)
+
+            if pending and (item is None or len(pending) >= PIPELINE_FILES):
+                await loop.run_in_executor(None, _apply_pdi_chunk, db, pending, state)
+                done   += len(pending)
+                pending = []
+                if progress:
+                    progress(done, total_files)
+
+            if item is None:
+                return
+
+    parser = asyncio.ensure_future(parse_stage())
+    try:
+        await apply_stage()
+        return _finish_pdi_batch(db, uploads, digests, state, total_files, cached_files)
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        parser.cancel()   # no-op once parsing finished
 
-    # Early exit if all files failed to parse
-    if not parsed_rows and file_errors:
-        raise HTTPException(status_code=400, detail={
-            "message": "All uploaded files failed to parse.",
-            "errors":  file_errors
-        })
 
-    # ── Step 4: Collect unique battery IDs across all files ───────────────────
-    all_battery_ids = list({bid for _, bid, _ in parsed_rows})
+def _apply_pdi_chunk(db: Session, parse_results: list, state: dict) -> None:
+    """
+    Apply one micro-batch of parsed files: drop rows applied before, ONE
+    Battery query + ONE PDIReport query for its ids, in-memory mutation,
+    then bulk insert + flush and release the ORM objects.
 
-    # ── Step 5: ONE bulk query for batteries ──────────────────────────────────
-    batteries   = db.query(Battery).filter(Battery.battery_id.in_(all_battery_ids)).all()
+    Each micro-batch is flushed before the next one is looked up, so a
+    battery appearing in several files is created once and then updated,
+    exactly as if the whole upload were processed in one go.
+    """
+    parsed_rows, file_errors = _collect_rows(parse_results)
+    state["file_errors"].extend(file_errors)
+    state["rows_parsed"] += len(parsed_rows)
+    if not parsed_rows:
+        return
+
+    # Rows applied by an earlier upload (or repeated in this batch) → skip
+    hashes = pd.Series([h for *_, h in parsed_rows], dtype=np.int64)
+    fresh  = new_row_mask(db, "pdi", hashes) & ~hashes.isin(state["seen"]).to_numpy()
+    state["seen"].update(hashes.tolist())
+    state["duplicate_rows"] += int((~fresh).sum())
+    parsed_rows              = [r for r, keep in zip(parsed_rows, fresh) if keep]
+    state["rows_processed"] += len(parsed_rows)
+
+    # ── Bulk lookups for this micro-batch's battery IDs ───────────────────────
+    battery_ids = list({bid for _, bid, _, _ in parsed_rows})
+
+    batteries   = db.query(Battery).filter(Battery.battery_id.in_(battery_ids)).all()
     battery_map = {b.battery_id: b for b in batteries}
 
-    # ── Step 6: ONE bulk query for existing PDI reports ───────────────────────
-    pdi_reports = db.query(PDIReport).filter(PDIReport.battery_id.in_(all_battery_ids)).all()
+    pdi_reports = db.query(PDIReport).filter(PDIReport.battery_id.in_(battery_ids)).all()
     pdi_map     = {p.battery_id: p for p in pdi_reports}
 
-    # ── Step 7: Process all rows in-memory — zero DB queries ─────────────────
-    summary     = {"created": [], "updated": [], "errors": []}
+    batteries_before = battery_snapshot(batteries)
+    passed_before    = sum(p.test_result == PDI_PASS for p in pdi_reports)
+
+    # ── Process rows in-memory — zero DB queries ──────────────────────────────
+    summary     = state["summary"]
     new_reports = []
+    applied     = []   # row hashes written this upload
 
-    for filename, bid, row in parsed_rows:
+    for filename, bid, row, row_hash in parsed_rows:
 
         battery = battery_map.get(bid)
         if not battery:
@@ -173,7 +337,7 @@ async def upload_batch_pdi(
         result_text = str(row.get('Test Result', '') or '').strip()
 
         # Update battery status
-        if result_text == "Finished PASS":
+        if result_text == PDI_PASS:
             battery.overall_status = "FG PENDING"
         else:
             battery.overall_status = "FAILED"
@@ -201,27 +365,65 @@ async def upload_batch_pdi(
             new_reports.append(new_report)
             pdi_map[bid] = new_report   # prevent duplicate if bid in multiple files
             summary["created"].append(bid)
+        state["results"][bid] = pdi_fields["test_result"]
+        applied.append(row_hash)
+
+    counters = state["counters"]
+    counters.update(battery_deltas(batteries_before, batteries))
+    state["status_changed"].update(status_changes(batteries_before, batteries))
+    counters["pdi.total"]     += len(new_reports)
+    counters["pdi.batteries"] += len(new_reports)
+    counters["pdi.passed"]    += sum(p.test_result == PDI_PASS for p in pdi_map.values()) - passed_before
+
+    # ── Bulk insert + flush (commit happens once, in _finish_pdi_batch) ───────
+    if new_reports:
+        db.bulk_save_objects(new_reports)
+    record_row_hashes(db, "pdi", pd.Series(applied, dtype=np.int64))
+    db.flush()
+    db.expunge_all()   # release this micro-batch's ORM objects
+
+
+def _finish_pdi_batch(
+    db:            Session,
+    uploads:       List[SpooledUpload],
+    digests:       list,
+    state:         dict,
+    total_files:   int,
+    cached_files:  int,
+) -> dict:
+    """Fingerprint fully-applied files, commit once, build the response."""
+    summary     = state["summary"]
+    file_errors = state["file_errors"]
 
-    # ── Step 8: Bulk insert + single commit ───────────────────────────────────
-    try:
-        if new_reports:
-            db.bulk_save_objects(new_reports)
-        db.commit()
-        await trigger_dashboard_update()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    # Early exit if all files failed to parse
+    if not state["rows_parsed"] and file_errors:
+        raise HTTPException(status_code=400, detail={
+            "message": "All uploaded files failed to parse.",
+            "errors":  file_errors
+        })
+
+    # Fingerprint files whose rows all went through
+    failed_files = {e["file"] for e in file_errors} | {e["file"] for e in summary["errors"]}
+    for upload, digest in zip(uploads, digests):
+        if upload.filename not in failed_files:
+            record_upload(db, "pdi", digest, upload.filename, None)
+    bump(db, state["counters"])
+    event_bus.publish(db, "pdi.results", ids=state["results"])
+    event_bus.publish(db, "battery.status", ids=state["status_changed"])
+    db.commit()
 
     return {
         "status": "Process Complete",
         "stats": {
-            "total_files":          len(files),
-            "files_parsed":         len(files) - len(file_errors),
-            "total_rows_processed": len(parsed_rows),
+            "total_files":          total_files,
+            "files_parsed":         total_files - len(file_errors) - cached_files,
+            "cached_files":         cached_files,
+            "total_rows_processed": state["rows_processed"],
+            "duplicate_rows":       state["duplicate_rows"],
             "new_entries":          len(summary["created"]),
             "overwritten_entries":  len(summary["updated"]),
             "failed":               len(summary["errors"]) + len(file_errors),
         },
         "row_errors":  summary["errors"],
         "file_errors": file_errors,
-    }
\ No newline at end of file
+    }
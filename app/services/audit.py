@@ -0,0 +1,172 @@
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.disk_cache import DiskCache
+from app.models.battery import BatteryModel, WeldingType
+from app.models.battery_pack import Battery, BatteryCellMapping
+from app.models.bms import BMS
+from app.models.cell import Cell, CellGrading
+from app.models.dispatch import Dispatch
+from app.models.pack_test import PackTest
+from app.models.pdi import PDIReport
+from app.models.welding import LaserWelding, SpotWelding
+from app.services.audit_workbook import AuditData, Row
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Battery audit workbook (GET /reports/generate-full-audit/{battery_id}):
+# the rows it is built from, and the on-disk cache of generated workbooks.
+#
+# Rendering the 8-sheet workbook and its charts costs far more than reading
+# its rows, and a dispatched battery's audit never changes again — yet QA
+# and customers download the same audits over and over. So:
+#
+#   load_audits()     reads every row the workbooks of a set of batteries
+#                     show: one query per table for the whole set, copied
+#                     into plain Rows (app/services/audit_workbook.py)
+#                     that render in worker processes too
+#   audit_version()   sha256 of those rows' column values — battery, model,
+#                     mapped cells and their gradings, pack test, PDI, BMS,
+#                     welding, dispatch — plus AUDIT_LAYOUT_VERSION
+#   audit_cache       DiskCache of rendered .xlsx files keyed by
+#                     (battery_id, version); hits are served from disk
+#   read_cached_audit()
+#                     the cached workbook's bytes, or None. Another worker
+#                     may replace or evict the file between lookup and
+#                     open; that is a miss and the caller renders again
+#
+# The version is a digest of the row CONTENT rather than of last-modified
+# timestamps: most of these tables have none, and status changes, cell
+# replacements (deleted mapping rows) and raw-SQL re-grades would slip past
+# them. Any write to any row the workbook shows yields a new version, so a
+# stale workbook is never served and there is nothing to invalidate.
+#
+# Bump AUDIT_LAYOUT_VERSION whenever the workbook layout changes, so files
+# cached by the previous release are not served.
+#
+#   AUDIT_CACHE_DIR      default: <system temp dir>/maxvolt-audit-cache
+#   AUDIT_CACHE_MAX_MB   default 512   (0 disables the cache)
+# ─────────────────────────────────────────────────────────────────────────────
+
+AUDIT_CACHE_DIR      = os.getenv("AUDIT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "maxvolt-audit-cache")
+AUDIT_CACHE_MAX_MB   = int(os.getenv("AUDIT_CACHE_MAX_MB", "512"))
+AUDIT_LAYOUT_VERSION = "1"
+
+audit_cache = DiskCache(AUDIT_CACHE_DIR, AUDIT_CACHE_MAX_MB * 2**20, suffix=".xlsx")
+
+
+def _snapshot(obj) -> Optional[Row]:
+    if obj is None:
+        return None
+    return Row(obj.__tablename__, {c.name: getattr(obj, c.name) for c in obj.__table__.columns})
+
+
+def _first_per_battery(db: Session, model, battery_ids: List[str]) -> Dict[str, Row]:
+    """One row of model per battery (the lowest primary key), in one query."""
+    if not battery_ids:
+        return {}
+    rows = (
+        db.query(model)
+        .filter(model.battery_id.in_(battery_ids))
+        .order_by(*model.__mapper__.primary_key)
+        .all()
+    )
+    out: Dict[str, Row] = {}
+    for row in rows:
+        if row.battery_id not in out:
+            out[row.battery_id] = _snapshot(row)
+    return out
+
+
+def load_audits(db: Session, battery_ids: Sequence[str]) -> Dict[str, AuditData]:
+    """
+    Audit rows of many batteries in a fixed number of queries (one per
+    table), keyed by battery_id. Unknown ids are left out.
+    """
+    ids       = list(dict.fromkeys(battery_ids))
+    batteries = db.query(Battery).filter(Battery.battery_id.in_(ids)).all() if ids else []
+    if not batteries:
+        return {}
+    ids = [b.battery_id for b in batteries]
+
+    models = {
+        m.model_id: m
+        for m in db.query(BatteryModel).filter(BatteryModel.model_id.in_({b.model_id for b in batteries}))
+    }
+    laser = {b.battery_id for b in batteries
+             if b.model_id in models and models[b.model_id].welding_type == WeldingType.LASER}
+
+    pack_tests = _first_per_battery(db, PackTest, ids)
+    bms_units  = _first_per_battery(db, BMS, ids)
+    pdis       = _first_per_battery(db, PDIReport, ids)
+    dispatches = _first_per_battery(db, Dispatch, ids)
+    welds      = {**_first_per_battery(db, LaserWelding, [b for b in ids if b in laser]),
+                  **_first_per_battery(db, SpotWelding,  [b for b in ids if b not in laser])}
+
+    # The bulk of the rows: plain column tuples, no ORM instances
+    cell_cols     = list(Cell.__table__.columns)
+    grading_cols  = list(CellGrading.__table__.columns)
+    cell_names    = [c.name for c in cell_cols]
+    grading_names = [c.name for c in grading_cols]
+    cells: Dict[str, list] = {b: [] for b in ids}
+    for battery_id, *values in db.execute(
+        select(BatteryCellMapping.battery_id, *cell_cols, *grading_cols)
+        .join(Cell, Cell.cell_id == BatteryCellMapping.cell_id)
+        .outerjoin(CellGrading, Cell.cell_id == CellGrading.cell_id)
+        .where(BatteryCellMapping.battery_id.in_(ids))
+    ):
+        cell    = Row(Cell.__tablename__, dict(zip(cell_names, values[:len(cell_names)])))
+        grading = values[len(cell_names):]
+        grading = Row(CellGrading.__tablename__, dict(zip(grading_names, grading))) if grading[0] is not None else None  # id: NULL = no grading
+        cells[battery_id].append((cell, grading))
+
+    model_rows = {model_id: _snapshot(m) for model_id, m in models.items()}
+    return {
+        b.battery_id: AuditData(
+            battery   = _snapshot(b),
+            model     = model_rows.get(b.model_id),
+            pack_test = pack_tests.get(b.battery_id),
+            bms       = bms_units.get(b.battery_id),
+            pdi       = pdis.get(b.battery_id),
+            dispatch  = dispatches.get(b.battery_id),
+            weld      = welds.get(b.battery_id),
+            cells     = cells[b.battery_id],
+        )
+        for b in batteries
+    }
+
+
+def load_audit(db: Session, battery_id: str) -> Optional[AuditData]:
+    """Every row the audit workbook shows, or None if the battery does not exist."""
+    return load_audits(db, [battery_id]).get(battery_id)
+
+
+def read_cached_audit(battery_id: str, version: str) -> Optional[bytes]:
+    """Cached workbook of battery_id@version, or None (not cached, or removed meanwhile)."""
+    path = audit_cache.lookup(battery_id, version)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        # Replaced or evicted by another worker between lookup and open
+        return None
+
+
+def _row_values(row: Optional[Row]) -> tuple:
+    return (row.table, row.values) if row is not None else None
+
+
+def audit_version(data: AuditData) -> str:
+    """Digest of every row in data (cell order does not matter)."""
+    parts = [AUDIT_LAYOUT_VERSION]
+    for obj in (data.battery, data.model, data.pack_test, data.bms, data.pdi, data.dispatch, data.weld):
+        parts.append(_row_values(obj))
+    for cell, grading in sorted(data.cells, key=lambda cg: cg[0].cell_id):
+        parts.append((_row_values(cell), _row_values(grading)))
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
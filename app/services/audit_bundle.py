@@ -0,0 +1,194 @@
+import os
+import re
+import threading
+import weakref
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.report_pool import bundle_pool
+from app.database import SessionLocal
+from app.models.dispatch import Dispatch
+from app.services.audit import audit_cache, audit_version, load_audits, read_cached_audit
+from app.services.audit_workbook import render_workbook
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Audit bundles (GET /reports/audit-bundle): the audit workbooks of every
+# battery dispatched under an invoice, to a customer and/or in a dispatch
+# date range, as ONE ZIP download instead of one request per battery.
+#
+#   set-based reads      batteries are loaded AUDIT_BUNDLE_CHUNK at a time
+#                        with load_audits (one query per table per chunk),
+#                        not one query set per battery
+#   audit cache first    workbooks whose rows did not change since they
+#                        were last rendered come from the disk cache
+#                        (app/services/audit.py); new renders are added to it
+#   worker processes     the rest render in parallel on bundle_pool
+#                        (app/core/report_pool.py)
+#   streamed ZIP         each workbook is written to the archive and sent as
+#                        soon as it is ready (stored, not deflated — .xlsx is
+#                        already compressed), so the server holds one chunk
+#                        of workbooks, never the archive
+#
+# Like the bulk exports, the body is a plain generator iterated on
+# Starlette's thread pool, with its own sessions (one per chunk, closed
+# before rendering). AUDIT_BUNDLE_MAX_CONCURRENT bundles run per worker —
+# past it a 503. A battery whose workbook fails to render is listed in
+# ERRORS.txt at the end of the archive instead of aborting the download.
+#
+#   AUDIT_BUNDLE_MAX_BATTERIES    default 1000  (more → 400, narrow the filter)
+#   AUDIT_BUNDLE_CHUNK            default 50
+#   AUDIT_BUNDLE_MAX_CONCURRENT   default 1     (per uvicorn worker)
+# ─────────────────────────────────────────────────────────────────────────────
+
+AUDIT_BUNDLE_MAX_BATTERIES  = int(os.getenv("AUDIT_BUNDLE_MAX_BATTERIES", "1000"))
+AUDIT_BUNDLE_CHUNK          = int(os.getenv("AUDIT_BUNDLE_CHUNK", "50"))
+AUDIT_BUNDLE_MAX_CONCURRENT = int(os.getenv("AUDIT_BUNDLE_MAX_CONCURRENT", "1"))
+
+_bundle_slots = threading.BoundedSemaphore(AUDIT_BUNDLE_MAX_CONCURRENT)
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _safe_name(value: str) -> str:
+    return _UNSAFE_NAME.sub("_", value).strip("_") or "battery"
+
+
+# ── Selection ─────────────────────────────────────────────────────────────────
+
+def bundle_battery_ids(
+    db:         Session,
+    invoice_id: Optional[str],
+    customer:   Optional[str],
+    date_from:  Optional[date],
+    date_to:    Optional[date],
+    limit:      int,
+) -> List[str]:
+    """
+    Dispatched batteries matching every given filter, in dispatch order (at
+    most limit). invoice_id matches exactly, customer case-insensitively,
+    the dates on the dispatch timestamp, both ends inclusive.
+    """
+    query = db.query(Dispatch.battery_id).filter(Dispatch.battery_id.isnot(None))
+    if invoice_id:
+        query = query.filter(Dispatch.invoice_id == invoice_id)
+    if customer:
+        query = query.filter(func.lower(Dispatch.customer_name) == customer.lower())
+    if date_from:
+        query = query.filter(Dispatch.dispatch_timestamp >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(Dispatch.dispatch_timestamp < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    rows = query.order_by(Dispatch.dispatch_timestamp, Dispatch.battery_id).limit(limit).all()
+    return [battery_id for (battery_id,) in rows]
+
+
+# ── Workbooks ─────────────────────────────────────────────────────────────────
+
+def _workbooks(battery_ids: Sequence[str]) -> Iterator[tuple]:
+    """(battery_id, xlsx bytes or None, error or None) per battery, chunk by chunk."""
+    for start in range(0, len(battery_ids), AUDIT_BUNDLE_CHUNK):
+        chunk = battery_ids[start:start + AUDIT_BUNDLE_CHUNK]
+        with SessionLocal() as db:
+            audits = load_audits(db, chunk)
+
+        to_render = []
+        for battery_id in chunk:
+            data = audits.get(battery_id)
+            if data is None:
+                continue   # deleted since the bundle was requested
+            version = audit_version(data)
+            body    = read_cached_audit(battery_id, version)
+            if body is not None:
+                yield battery_id, body, None
+            else:
+                to_render.append((battery_id, data, version))
+
+        rendered = bundle_pool.map(
+            render_workbook, [b for b, _, _ in to_render], [d for _, d, _ in to_render]
+        )
+        for (battery_id, _, version), (body, error) in zip(to_render, rendered):
+            if body is not None:
+                audit_cache.store(battery_id, version, body)
+            yield battery_id, body, error
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+
+class _ZipStream:
+    """Write-only sink for ZipFile: collects what it writes until drained."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class _Slot:
+    """One of the AUDIT_BUNDLE_MAX_CONCURRENT slots, released exactly once."""
+
+    def __init__(self):
+        self.release = weakref.finalize(self, _bundle_slots.release)
+
+
+def _entry(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _chunks(battery_ids: Sequence[str], slot: _Slot) -> Iterator[bytes]:
+    """Runs on Starlette's thread pool, one workbook per next()."""
+    stream = _ZipStream()
+    errors = []
+    try:
+        with zipfile.ZipFile(stream, "w") as archive:
+            for battery_id, body, error in _workbooks(battery_ids):
+                if body is None:
+                    errors.append(f"{battery_id}: {error}")
+                    continue
+                archive.writestr(_entry(f"Maxvolt_Audit_{_safe_name(battery_id)}.xlsx"), body)
+                yield stream.drain()
+            if errors:
+                archive.writestr(_entry("ERRORS.txt"), "\n".join(errors) + "\n")
+        yield stream.drain()
+    finally:
+        slot.release()
+
+
+def stream_audit_bundle(battery_ids: Sequence[str], name: str) -> StreamingResponse:
+    """
+    StreamingResponse of the batteries' audit workbooks as one ZIP,
+    downloaded as Maxvolt_Audits_<name>_<timestamp>.zip. 503 when
+    AUDIT_BUNDLE_MAX_CONCURRENT bundles are already running in this worker.
+    """
+    if not _bundle_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="An audit bundle is already being generated. Retry shortly."
+        )
+
+    chunks = _chunks(list(battery_ids), _Slot())
+
+    filename = f"Maxvolt_Audits_{_safe_name(name)}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    return StreamingResponse(
+        chunks,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        media_type="application/zip",
+    )
@@ -0,0 +1,291 @@
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.pubsub import event_bus
+from app.models.catalog import CellCatalogEntry
+from app.models.cell import CellGrading
+from app.services.grading_engine import GradingBatch
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Cell brand / lot catalog (cell_catalog table) behind the inventory filter
+# dropdowns (GET /admin/cells/brands, /admin/cells/lots).
+#
+# The brand dropdown used to run SELECT DISTINCT brand FROM cell_gradings on
+# every page load — a full scan of a table growing by ~40k rows a day.
+# Instead grading ingestion maintains one row per (brand, lot) pair, the
+# same way it bumps the production counters:
+#
+#   CatalogDeltas.add()   per grading batch: +1 cell under the pair it is
+#                         graded with, −1 under the pair its previous
+#                         grading carried (the detail row is overwritten on
+#                         every re-grade, locked cells included), plus the
+#                         batch's test-date range per pair
+#   bump_catalog()        ONE INSERT … ON CONFLICT DO UPDATE with the
+#                         upload's deltas, as the last statements before
+#                         commit, keys in sorted order (no deadlocks)
+#   rebuild_catalog()     recomputes every pair from cell_gradings under an
+#                         EXCLUSIVE lock on PostgreSQL — exact, like
+#                         production_counters.reconcile
+#
+# Reads go through an in-process cache (CATALOG_CACHE_TTL_S). It is
+# cleared explicitly on every change event that can touch the catalog
+# (cells.graded, catalog.rebuilt) and after a listener reconnect, in every
+# worker (app/core/pubsub.py); the TTL only bounds staleness where no
+# events are delivered (scripts, one-off sessions).
+#
+# first_seen / last_seen are the pair's grading test-date range as uploads
+# saw it: a cell re-graded into another lot does not un-see the old one.
+# A rebuild only has the current gradings to go by, so it may narrow them.
+# Pairs whose cells all moved to another pair keep a row with cells = 0
+# (and their seen dates) until the next rebuild; reads skip them.
+# ─────────────────────────────────────────────────────────────────────────────
+
+CATALOG_CACHE_TTL_S = float(os.getenv("CATALOG_CACHE_TTL_S", "300"))
+
+_catalog_cache = TTLCache(CATALOG_CACHE_TTL_S)
+
+_INVALIDATING_TOPICS = {"cells.graded", "catalog.rebuilt", "resync"}
+
+Pair = Tuple[str, str]
+
+
+def _names(series: pd.Series) -> pd.Series:
+    """Brand / lot values as catalog keys: missing → ""."""
+    return series.astype(object).where(series.notna(), "").astype(str)
+
+
+# ── Deltas from grading ───────────────────────────────────────────────────────
+
+class CatalogDeltas:
+    """Catalog changes of one upload: cells delta and test-date range per (brand, lot)."""
+
+    def __init__(self):
+        self.cells: Counter              = Counter()
+        self.first: Dict[Pair, datetime] = {}
+        self.last:  Dict[Pair, datetime] = {}
+
+    def add(self, batch: GradingBatch, previous: pd.DataFrame) -> None:
+        """
+        previous: DataFrame indexed by cell_id with brand, lot columns — the
+                  stored gradings of cells in the batch (only those that
+                  have one), read before the batch is written.
+        """
+        cells = batch.cells
+        if cells.empty:
+            return
+
+        graded = pd.DataFrame({
+            "brand": _names(cells["brand"]),
+            "lot":   _names(cells["lot"]),
+            "seen":  pd.to_datetime(cells["test_date"], errors="coerce"),
+        })
+        for pair, seen in graded.groupby(["brand", "lot"])["seen"]:
+            self.cells[pair] += len(seen)
+            first, last = seen.min(), seen.max()
+            if pd.notna(first):
+                first, last = first.to_pydatetime(), last.to_pydatetime()
+                self.first[pair] = min(first, self.first.get(pair, first))
+                self.last[pair]  = max(last,  self.last.get(pair, last))
+
+        if not previous.empty:
+            stored = pd.DataFrame({"brand": _names(previous["brand"]), "lot": _names(previous["lot"])})
+            for pair, n in stored.groupby(["brand", "lot"]).size().items():
+                self.cells[pair] -= int(n)
+
+    def rows(self) -> List[dict]:
+        pairs = sorted(p for p in set(self.cells) | set(self.first) if self.cells[p] or p in self.first)
+        return [
+            {
+                "brand":      brand,
+                "lot":        lot,
+                "cells":      int(self.cells[(brand, lot)]),
+                "first_seen": self.first.get((brand, lot)),
+                "last_seen":  self.last.get((brand, lot)),
+            }
+            for brand, lot in pairs
+        ]
+
+
+def bump_catalog(db: Session, deltas: CatalogDeltas) -> None:
+    """
+    Apply an upload's deltas in ONE statement (missing pairs start at 0).
+    Caller owns the transaction — call right before commit.
+    """
+    rows = deltas.rows()
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert  = (postgresql if dialect == "postgresql" else sqlite).insert(CellCatalogEntry)
+        current = CellCatalogEntry
+        if dialect == "postgresql":
+            # LEAST / GREATEST ignore NULLs
+            first_seen = func.least(current.first_seen, insert.excluded.first_seen)
+            last_seen  = func.greatest(current.last_seen, insert.excluded.last_seen)
+        else:
+            # SQLite's multi-argument min / max return NULL if any argument is NULL
+            first_seen = func.coalesce(func.min(current.first_seen, insert.excluded.first_seen),
+                                       current.first_seen, insert.excluded.first_seen)
+            last_seen  = func.coalesce(func.max(current.last_seen, insert.excluded.last_seen),
+                                       current.last_seen, insert.excluded.last_seen)
+        db.execute(insert.on_conflict_do_update(
+            index_elements=[CellCatalogEntry.brand, CellCatalogEntry.lot],
+            set_={
+                "cells":      current.cells + insert.excluded.cells,
+                "first_seen": first_seen,
+                "last_seen":  last_seen,
+                "updated_at": func.now(),
+            },
+        ), rows)
+        return
+
+    for row in rows:
+        entry = db.get(CellCatalogEntry, (row["brand"], row["lot"]), with_for_update=True)
+        if entry is None:
+            db.add(CellCatalogEntry(**row))
+            continue
+        entry.cells += row["cells"]
+        seen = [d for d in (entry.first_seen, row["first_seen"]) if d is not None]
+        entry.first_seen = min(seen) if seen else None
+        seen = [d for d in (entry.last_seen, row["last_seen"]) if d is not None]
+        entry.last_seen  = max(seen) if seen else None
+
+
+# ── Reads (cached) ────────────────────────────────────────────────────────────
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def catalog_brands(db: Session) -> List[dict]:
+    """Brands with graded cells: cell and lot counts, first / last seen. By name."""
+    def compute():
+        rows = (
+            db.query(
+                CellCatalogEntry.brand,
+                func.sum(CellCatalogEntry.cells),
+                func.count().filter(CellCatalogEntry.lot != ""),
+                func.min(CellCatalogEntry.first_seen),
+                func.max(CellCatalogEntry.last_seen),
+            )
+            .filter(CellCatalogEntry.cells > 0, CellCatalogEntry.brand != "")
+            .group_by(CellCatalogEntry.brand)
+            .order_by(CellCatalogEntry.brand)
+            .all()
+        )
+        return [
+            {"brand": brand, "cells": int(cells), "lots": lots,
+             "first_seen": _iso(first), "last_seen": _iso(last)}
+            for brand, cells, lots, first, last in rows
+        ]
+
+    return _catalog_cache.get_or_compute(("brands",), compute)
+
+
+def catalog_lots(db: Session, brand: Optional[str] = None) -> List[dict]:
+    """Lots with graded cells (of one brand, if given), most recently seen first."""
+    def compute():
+        query = db.query(CellCatalogEntry).filter(CellCatalogEntry.cells > 0, CellCatalogEntry.lot != "")
+        if brand is not None:
+            query = query.filter(CellCatalogEntry.brand == brand)
+        rows = query.order_by(
+            CellCatalogEntry.last_seen.desc().nulls_last(), CellCatalogEntry.lot, CellCatalogEntry.brand
+        ).all()
+        return [
+            {"lot": e.lot, "brand": e.brand or None, "cells": e.cells,
+             "first_seen": _iso(e.first_seen), "last_seen": _iso(e.last_seen)}
+            for e in rows
+        ]
+
+    return _catalog_cache.get_or_compute(("lots", brand), compute)
+
+
+def invalidate_catalog_cache() -> None:
+    _catalog_cache.clear()
+
+
+def _on_event(event: dict) -> None:
+    if event.get("topic") in _INVALIDATING_TOPICS:
+        invalidate_catalog_cache()
+
+
+event_bus.subscribe(_on_event)
+
+
+# ── Rebuild ───────────────────────────────────────────────────────────────────
+
+def catalog_from_source(db: Session) -> Dict[Pair, tuple]:
+    """(cells, first_seen, last_seen) per pair, from cell_gradings (full scan)."""
+    brand = func.coalesce(CellGrading.brand, "")
+    lot   = func.coalesce(CellGrading.lot, "")
+    rows  = (
+        db.query(brand, lot, func.count(), func.min(CellGrading.test_date), func.max(CellGrading.test_date))
+          .group_by(brand, lot)
+          .all()
+    )
+    return {(b, l): (int(n), first, last) for b, l, n, first, last in rows}
+
+
+def _lock_catalog(db: Session) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE cell_catalog IN EXCLUSIVE MODE"))
+
+
+def rebuild_catalog(db: Session, progress=None) -> dict:
+    """
+    Rebuild the catalog from cell_gradings and commit. Returns the pairs
+    whose stored cell count was off (stored vs actual).
+    """
+    _lock_catalog(db)
+
+    stored = dict(
+        ((b, l), n) for b, l, n in
+        db.query(CellCatalogEntry.brand, CellCatalogEntry.lot, CellCatalogEntry.cells).all()
+    )
+    actual = catalog_from_source(db)
+
+    db.query(CellCatalogEntry).delete(synchronize_session=False)
+    if actual:
+        db.bulk_insert_mappings(CellCatalogEntry, [
+            {"brand": b, "lot": l, "cells": n, "first_seen": first, "last_seen": last}
+            for (b, l), (n, first, last) in sorted(actual.items())
+        ])
+    event_bus.publish(db, "catalog.rebuilt")
+    db.commit()
+    invalidate_catalog_cache()
+
+    drift = [
+        {"brand": b, "lot": l, "stored": int(stored.get((b, l)) or 0), "actual": actual.get((b, l), (0,))[0]}
+        for b, l in sorted(set(stored) | set(actual))
+        if int(stored.get((b, l)) or 0) != actual.get((b, l), (0,))[0]
+    ]
+    if progress:
+        progress(1, 1)
+    return {
+        "status":     "Complete",
+        "entries":    len(actual),
+        "drift":      drift,
+        "rebuilt_at": datetime.now().isoformat(),
+    }
+
+
+def ensure_catalog(db: Session) -> bool:
+    """
+    Startup bootstrap: build the catalog from cell_gradings if the table
+    is still empty (first deploy). Returns True when it rebuilt.
+    """
+    _lock_catalog(db)
+    if db.query(CellCatalogEntry.brand).first() is not None:
+        db.rollback()
+        return False
+    rebuild_catalog(db)
+    return True
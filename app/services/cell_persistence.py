@@ -0,0 +1,255 @@
+import io
+from collections import Counter
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.cell import Cell, CellGrading
+from app.services.grading_engine import (
+    GRADING_FIELDS, GradingBatch, apply_grading_state, grading_detail_records, grading_summary,
+)
+from app.services.cell_catalog import CatalogDeltas
+from app.services.production_counters import grading_deltas
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bulk persistence for cells / cell_gradings.
+#
+# PostgreSQL path (production):
+#   1. COPY the normalised batch into a session-local staging table
+#   2. SELECT … FOR UPDATE the existing cells → summary counters
+#   3. ONE  INSERT INTO cells … ON CONFLICT (cell_id) DO UPDATE
+#           … WHERE cells.status IS DISTINCT FROM 'pass'      ← pass-lock rule
+#   4. ONE  INSERT INTO cell_gradings … ON CONFLICT (cell_id) DO UPDATE
+#           (identical re-uploaded rows are not rewritten)
+#   Round-trips are constant; no per-row UPDATE statements and no ORM objects.
+#
+# Any other dialect (local SQLite etc.) falls back to bulk ORM mappings with
+# identical results.
+#
+# ng_count rule in SQL: the batch carries ng_increment = NG rows up to the
+# cell's first PASS in the file, so a new cell inserts with ng_count =
+# ng_increment and an unlocked existing cell adds it to its stored count.
+#
+# Both paths read the existing cells' status before writing, so the cell
+# counter deltas (production_counters) come from the same locked state as
+# the summary — and the cells' stored brand / lot, for the catalog deltas
+# (cell_catalog).
+# ─────────────────────────────────────────────────────────────────────────────
+
+_GRADING_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS grading_staging (
+        cell_id                  VARCHAR(100),
+        passed                   BOOLEAN,
+        ng_increment             INTEGER,
+        capacity                 DOUBLE PRECISION,
+        last_test_date           TIMESTAMP,
+        test_date                TIMESTAMP,
+        lot                      VARCHAR(100),
+        brand                    VARCHAR(100),
+        specification            VARCHAR(255),
+        result                   VARCHAR(50),
+        soc_result               VARCHAR(50),
+        final_result             VARCHAR(50),
+        ocv_voltage_mv           DOUBLE PRECISION,
+        upper_cutoff_mv          DOUBLE PRECISION,
+        lower_cutoff_mv          DOUBLE PRECISION,
+        discharging_capacity_mah DOUBLE PRECISION,
+        final_soc_mah            DOUBLE PRECISION,
+        final_cv_capacity        DOUBLE PRECISION
+    ) ON COMMIT DROP
+"""
+
+_GRADING_STAGING_COLUMNS = [
+    "cell_id", "passed", "ng_increment", "capacity", "last_test_date", *GRADING_FIELDS,
+]
+
+_UPSERT_CELLS = """
+    INSERT INTO cells (cell_id, is_used, status, ng_count, discharging_capacity_mah, last_test_date)
+    SELECT cell_id, FALSE,
+           CASE WHEN passed THEN 'pass' ELSE 'ng' END,
+           ng_increment, capacity, last_test_date
+    FROM grading_staging
+    ON CONFLICT (cell_id) DO UPDATE SET
+        status                   = EXCLUDED.status,
+        ng_count                 = COALESCE(cells.ng_count, 0) + EXCLUDED.ng_count,
+        discharging_capacity_mah = EXCLUDED.discharging_capacity_mah,
+        last_test_date           = EXCLUDED.last_test_date
+    WHERE cells.status IS DISTINCT FROM 'pass'
+"""
+
+_UPSERT_GRADINGS = f"""
+    INSERT INTO cell_gradings (cell_id, {", ".join(GRADING_FIELDS)})
+    SELECT cell_id, {", ".join(GRADING_FIELDS)}
+    FROM grading_staging
+    ON CONFLICT (cell_id) DO UPDATE SET
+        {", ".join(f"{f} = EXCLUDED.{f}" for f in GRADING_FIELDS)}
+    WHERE ({", ".join(f"cell_gradings.{f}" for f in GRADING_FIELDS)})
+          IS DISTINCT FROM ({", ".join(f"EXCLUDED.{f}" for f in GRADING_FIELDS)})
+"""
+
+_SORTING_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS sorting_staging (
+        cell_id         VARCHAR(100),
+        ir_value_m_ohm  DOUBLE PRECISION,
+        sorting_voltage DOUBLE PRECISION,
+        sorting_date    TIMESTAMP
+    ) ON COMMIT DROP
+"""
+
+_APPLY_SORTING = """
+    UPDATE cells
+    SET ir_value_m_ohm  = s.ir_value_m_ohm,
+        sorting_voltage = s.sorting_voltage,
+        sorting_date    = COALESCE(s.sorting_date, cells.sorting_date)
+    FROM sorting_staging s
+    WHERE cells.cell_id = s.cell_id
+"""
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _copy_frame(db: Session, staging_ddl: str, table: str, frame: pd.DataFrame) -> None:
+    """(Re)create the temp staging table and COPY the frame into it."""
+    db.execute(text(staging_ddl))
+    db.execute(text(f"TRUNCATE {table}"))   # streaming mode reuses it per chunk
+
+    buf = io.StringIO()
+    frame.to_csv(buf, index=False, header=False, na_rep="")
+    buf.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+
+# ── Grading ───────────────────────────────────────────────────────────────────
+
+def persist_grading_batch(
+    db:       Session,
+    batch:    GradingBatch,
+    counters: Optional[Counter] = None,
+    catalog:  Optional[CatalogDeltas] = None,
+) -> Dict[str, int]:
+    """
+    Write a reduced grading batch (cells + cell_gradings) and return the
+    summary counters. Caller owns the transaction (no commit here).
+
+    counters: production counter deltas of this batch are added to it;
+              the caller bumps them before committing.
+    catalog:  likewise for the brand / lot catalog deltas.
+    """
+    if batch.cells.empty:
+        return grading_summary(batch, pd.DataFrame(columns=["status"]))
+
+    if counters is None:
+        counters = Counter()
+    if catalog is None:
+        catalog = CatalogDeltas()
+    if _is_postgres(db):
+        return _persist_grading_copy(db, batch, counters, catalog)
+    return _persist_grading_orm(db, batch, counters, catalog)
+
+
+def _persist_grading_copy(
+    db: Session, batch: GradingBatch, counters: Counter, catalog: CatalogDeltas,
+) -> Dict[str, int]:
+    frame = batch.cells.reset_index()[_GRADING_STAGING_COLUMNS]
+    _copy_frame(db, _GRADING_STAGING_DDL, "grading_staging", frame)
+
+    # Lock the existing rows so the summary reflects exactly what the upsert
+    # below sees, even with a concurrent upload of the same cells.
+    existing = pd.DataFrame(
+        db.execute(text("""
+            SELECT c.cell_id, c.status
+            FROM cells c JOIN grading_staging s ON s.cell_id = c.cell_id
+            FOR UPDATE OF c
+        """)).all(),
+        columns=["cell_id", "status"],
+    ).set_index("cell_id")
+    previous = pd.DataFrame(
+        db.execute(text("""
+            SELECT g.cell_id, g.brand, g.lot
+            FROM cell_gradings g JOIN grading_staging s ON s.cell_id = g.cell_id
+        """)).all(),
+        columns=["cell_id", "brand", "lot"],
+    ).set_index("cell_id")
+
+    db.execute(text(_UPSERT_CELLS))
+    db.execute(text(_UPSERT_GRADINGS))
+
+    counters.update(grading_deltas(batch, existing))
+    catalog.add(batch, previous)
+    return grading_summary(batch, existing)
+
+
+def _persist_grading_orm(
+    db: Session, batch: GradingBatch, counters: Counter, catalog: CatalogDeltas,
+) -> Dict[str, int]:
+    cell_ids = batch.cells.index.tolist()
+
+    existing = pd.DataFrame(
+        db.query(Cell.cell_id, Cell.status, Cell.ng_count)
+          .filter(Cell.cell_id.in_(cell_ids)).all(),
+        columns=["cell_id", "status", "ng_count"],
+    ).set_index("cell_id")
+
+    previous = pd.DataFrame(
+        db.query(CellGrading.cell_id, CellGrading.id, CellGrading.brand, CellGrading.lot)
+          .filter(CellGrading.cell_id.in_(cell_ids)).all(),
+        columns=["cell_id", "id", "brand", "lot"],
+    ).set_index("cell_id")
+    grading_ids = previous["id"].to_dict()
+
+    changes = apply_grading_state(batch, existing)
+
+    if changes.new_cells:
+        db.bulk_insert_mappings(Cell, changes.new_cells)
+        db.flush()   # flush so new cell PKs exist before grading foreign keys insert
+    if changes.cell_updates:
+        db.bulk_update_mappings(Cell, changes.cell_updates)
+
+    new_gradings, grading_updates = [], []
+    for rec in grading_detail_records(batch):
+        grading_id = grading_ids.get(rec["cell_id"])
+        if grading_id is None:
+            new_gradings.append(rec)
+        else:
+            grading_updates.append({**rec, "id": grading_id})
+
+    if new_gradings:
+        db.bulk_insert_mappings(CellGrading, new_gradings)
+    if grading_updates:
+        db.bulk_update_mappings(CellGrading, grading_updates)
+
+    counters.update(grading_deltas(batch, existing))
+    catalog.add(batch, previous)
+    return changes.summary
+
+
+# ── Sorting ───────────────────────────────────────────────────────────────────
+
+def persist_sorting_updates(db: Session, updates: List[dict]) -> None:
+    """
+    Apply sorting results (cell_id, ir_value_m_ohm, sorting_voltage
+    [, sorting_date]). A missing sorting_date keeps the stored one.
+    """
+    if not updates:
+        return
+
+    if not _is_postgres(db):
+        db.bulk_update_mappings(Cell, updates)
+        return
+
+    frame = pd.DataFrame(updates).reindex(
+        columns=["cell_id", "ir_value_m_ohm", "sorting_voltage", "sorting_date"]
+    )
+    _copy_frame(db, _SORTING_STAGING_DDL, "sorting_staging", frame)
+    db.execute(text(_APPLY_SORTING))
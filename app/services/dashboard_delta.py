@@ -0,0 +1,79 @@
+from typing import List, Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Dashboard deltas for websocket pushes.
+#
+# The full dashboard payload carries every battery built today
+# (today_output), so it grows all shift while a typical refresh changes a KPI
+# or two and adds a row. dashboard_delta(old, new) returns only what changed:
+#
+#   kpis             {name: kpi}  changed or new KPIs only
+#   stage_breakdown  whole list, when it changed (three rows)
+#   recent_activity  list patch, see below
+#   today_output     list patch
+#
+# List patch (lists are newest first, rows keyed by battery id):
+#
+#   {"prepend": [rows], "update": [rows], "remove": [keys]}
+#       remove the keys, replace updated rows in place, then put the
+#       prepended rows (in order) at the head
+#   {"replace": [rows]}
+#       anything that is not "new rows at the head" (reordering, duplicate
+#       keys, a new row below an existing one) — the whole list, once
+#
+# Sections that did not change are omitted; an empty dict means nothing to
+# send. Clients apply deltas to the last full snapshot they received.
+# ─────────────────────────────────────────────────────────────────────────────
+
+_LIST_KEYS = {
+    "recent_activity": "id",
+    "today_output":    "battery_id",
+}
+
+
+def list_patch(old: List[dict], new: List[dict], key: str) -> Optional[dict]:
+    """Patch turning `old` into `new`, or None when they are equal."""
+    if old == new:
+        return None
+
+    old_keys = [row[key] for row in old]
+    new_keys = [row[key] for row in new]
+    if len(set(old_keys)) != len(old_keys) or len(set(new_keys)) != len(new_keys):
+        return {"replace": new}
+
+    old_by_key = dict(zip(old_keys, old))
+    kept       = set(new_keys) & set(old_keys)
+    known      = [k for k in new_keys if k in kept]
+    head       = len(new_keys) - len(known)
+
+    # New rows must all sit at the head, existing rows keep their order
+    if new_keys[head:] != known or known != [k for k in old_keys if k in kept]:
+        return {"replace": new}
+
+    return {
+        "prepend": new[:head],
+        "update":  [row for row in new[head:] if row != old_by_key[row[key]]],
+        "remove":  [k for k in old_keys if k not in kept],
+    }
+
+
+def dashboard_delta(old: dict, new: dict) -> dict:
+    """Changed sections of a fetch_dashboard_stats payload (see header)."""
+    delta = {}
+
+    kpis = {
+        name: kpi for name, kpi in new.get("kpis", {}).items()
+        if old.get("kpis", {}).get(name) != kpi
+    }
+    if kpis:
+        delta["kpis"] = kpis
+
+    if old.get("stage_breakdown") != new.get("stage_breakdown"):
+        delta["stage_breakdown"] = new.get("stage_breakdown")
+
+    for section, key in _LIST_KEYS.items():
+        patch = list_patch(old.get(section, []), new.get(section, []), key)
+        if patch:
+            delta[section] = patch
+
+    return delta
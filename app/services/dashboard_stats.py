@@ -0,0 +1,150 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.models.battery_pack import Battery
+from app.models.pdi import PDIReport
+from app.services.production_counters import dispatch_day_key, read_counters
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Admin dashboard aggregates.
+#
+# The KPI figures are read from production_counters (maintained by the write
+# paths, app/services/production_counters.py) — a handful of primary-key
+# lookups instead of count(*) over cells / batteries / pdi_reports, so the
+# cost no longer grows with the history:
+#
+#   total_cells       cells.total
+#   batteries         batteries.total
+#   failed_packs      batteries.had_ng
+#   pending_pdi       batteries.total − pdi.batteries (batteries with a report)
+#   pdi_total/passed  pdi.total, pdi.passed
+#   dispatched_today  dispatch.day.<today>
+#
+# PostgreSQL path (production): ONE statement. The counters come back as a
+# json_object_agg column next to the two lists (recent PDI, today's output),
+# so the dashboard costs a single round-trip however often it is refreshed.
+#
+#   - today's output is a half-open range on the raw column
+#     (created_at >= day_start AND created_at < day_end), not date(col) = …,
+#     so ix_batteries_created_at can be used
+#   - recent PDI reads the newest rows off ix_pdi_reports_created_at
+#   - today_output is capped at TODAY_OUTPUT_LIMIT rows, newest first
+#
+# Any other dialect (local SQLite etc.) runs the same queries one by one
+# through the ORM with identical results.
+# ─────────────────────────────────────────────────────────────────────────────
+
+TODAY_OUTPUT_LIMIT = 200
+RECENT_PDI_LIMIT   = 5
+
+_COUNTER_NAMES = [
+    "cells.total", "batteries.total", "batteries.had_ng",
+    "pdi.total", "pdi.passed", "pdi.batteries",
+]
+
+_DASHBOARD_SQL = text("""
+    WITH
+    recent AS (
+        SELECT battery_id, test_result, created_at
+        FROM pdi_reports
+        ORDER BY created_at DESC
+        LIMIT :recent_limit
+    ),
+    today AS (
+        SELECT battery_id, model_id, had_ng_status, created_at
+        FROM batteries
+        WHERE created_at >= :day_start AND created_at < :day_end
+        ORDER BY created_at DESC
+        LIMIT :today_limit
+    )
+    SELECT (SELECT coalesce(json_object_agg(name, value), '{}'::json)
+            FROM production_counters
+            WHERE name IN :names)                          AS counters,
+           (SELECT coalesce(json_agg(json_build_array(
+                        battery_id, to_char(created_at, 'HH24:MI'), test_result
+                    ) ORDER BY created_at DESC), '[]'::json)
+            FROM recent)                                   AS recent_pdi,
+           (SELECT coalesce(json_agg(json_build_array(
+                        battery_id, model_id, coalesce(had_ng_status, false),
+                        to_char(created_at, 'HH24:MI')
+                    ) ORDER BY created_at DESC), '[]'::json)
+            FROM today)                                    AS today_output
+""").bindparams(bindparam("names", expanding=True))
+
+
+def _day_range(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _hhmm(value) -> str:
+    return value.strftime("%H:%M") if value else None
+
+
+def _kpis(counters: Dict[str, int], today_key: str) -> Dict[str, int]:
+    value = lambda name: int(counters.get(name) or 0)
+    return {
+        "total_cells":      value("cells.total"),
+        "batteries":        value("batteries.total"),
+        "failed_packs":     value("batteries.had_ng"),
+        "pending_pdi":      max(value("batteries.total") - value("pdi.batteries"), 0),
+        "pdi_total":        value("pdi.total"),
+        "pdi_passed":       value("pdi.passed"),
+        "dispatched_today": value(today_key),
+    }
+
+
+def dashboard_snapshot(db: Session, day: date) -> dict:
+    """
+    Raw dashboard figures for `day`:
+      counts       total_cells, batteries, failed_packs, pending_pdi,
+                   pdi_total, pdi_passed, dispatched_today
+      recent_pdi   [(battery_id, "HH:MM" | None, test_result)]   newest first
+      today_output [(battery_id, model_id, had_ng, "HH:MM" | None)] newest first
+    """
+    day_start, day_end = _day_range(day)
+    today_key          = dispatch_day_key(day)
+
+    if db.get_bind().dialect.name == "postgresql":
+        row = db.execute(_DASHBOARD_SQL, {
+            "names":        [*_COUNTER_NAMES, today_key],
+            "day_start":    day_start,
+            "day_end":      day_end,
+            "recent_limit": RECENT_PDI_LIMIT,
+            "today_limit":  TODAY_OUTPUT_LIMIT,
+        }).mappings().one()
+        return {
+            **_kpis(row["counters"], today_key),
+            "recent_pdi":   [tuple(r) for r in row["recent_pdi"]],
+            "today_output": [tuple(r) for r in row["today_output"]],
+        }
+
+    return _orm_snapshot(db, day_start, day_end, today_key)
+
+
+def _orm_snapshot(db: Session, day_start: datetime, day_end: datetime, today_key: str) -> dict:
+    """Same figures, one ORM query each (non-PostgreSQL)."""
+    recent_pdi: List[tuple] = [
+        (bid, _hhmm(created_at), result)
+        for bid, created_at, result in db.query(
+            PDIReport.battery_id, PDIReport.created_at, PDIReport.test_result
+        ).order_by(PDIReport.created_at.desc()).limit(RECENT_PDI_LIMIT)
+    ]
+
+    today_output: List[tuple] = [
+        (bid, model_id, bool(had_ng), _hhmm(created_at))
+        for bid, model_id, had_ng, created_at in db.query(
+            Battery.battery_id, Battery.model_id, Battery.had_ng_status, Battery.created_at
+        ).filter(
+            Battery.created_at >= day_start, Battery.created_at < day_end
+        ).order_by(Battery.created_at.desc()).limit(TODAY_OUTPUT_LIMIT)
+    ]
+
+    return {
+        **_kpis(read_counters(db, [*_COUNTER_NAMES, today_key]), today_key),
+        "recent_pdi":   recent_pdi,
+        "today_output": today_output,
+    }
@@ -0,0 +1,59 @@
+from typing import List, Optional, Tuple
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Station event topics.
+#
+# Maps a change event from the bus (app/core/pubsub.py) to the topics
+# station screens subscribe to on /admin/ws/events, so a screen is pushed
+# only what it shows instead of polling REST endpoints:
+#
+#   battery.{id}.status   {"battery_id", "status"}      pack test, PDI,
+#                                                       mark-ready, dispatch,
+#                                                       bulk-link, replace-cell
+#   battery.{id}.bms      {"battery_id", "bms_id"}      BMS mapped
+#   pdi.results           {"n", "results": {id: result}}
+#   cells.lot.{lot}       {"lot", "n"}                  cells graded in a lot
+#   <event topic>         the event minus "topic"       cells.graded,
+#                                                       cells.sorted, dispatch,
+#                                                       pack_tests.uploaded, …
+#
+# A payload of None means "re-read": the event was too large to carry its
+# ids (see EVENT_MAX_IDS) or events may have been missed ("resync"). A
+# topic containing "*" is a pattern (fnmatch) over the subscribed topics.
+# ─────────────────────────────────────────────────────────────────────────────
+
+Routed = List[Tuple[str, Optional[dict]]]
+
+
+def _per_id(prefix: str, suffix: str, ids, field: str) -> Routed:
+    if ids is None:
+        return [(f"{prefix}.*.{suffix}", None)]
+    return [
+        (f"{prefix}.{id_}.{suffix}", {f"{prefix}_id": id_, field: value})
+        for id_, value in ids.items()
+    ]
+
+
+def route_event(event: dict) -> Routed:
+    """(topic, payload) pairs to push for one bus event (see header)."""
+    topic = event.get("topic")
+    body  = {k: v for k, v in event.items() if k != "topic"}
+
+    if topic == "resync":
+        return [("*", None)]
+    if topic == "battery.status":
+        return [(topic, body)] + _per_id("battery", "status", event.get("ids"), "status")
+    if topic == "bms.mapped":
+        return [(topic, body)] + _per_id("battery", "bms", event.get("ids"), "bms_id")
+    if topic == "pdi.results":
+        if event.get("ids") is None:
+            return [(topic, None)]
+        return [(topic, {"n": event.get("n"), "results": event.get("ids")})]
+    if topic == "cells.graded":
+        lots = event.get("lots")
+        if lots is None:
+            return [(topic, body), ("cells.lot.*", None)]
+        return [(topic, body)] + [
+            (f"cells.lot.{lot}", {"lot": lot, "n": n}) for lot, n in lots.items()
+        ]
+    return [(topic, body)]
@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import os
+import threading
+import weakref
+from datetime import datetime
+from typing import Callable, Iterator, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+
+from app.database import SessionLocal
+from app.models.cell import Cell, CellGrading
+from app.services.inventory import cell_display_status
+from app.services.traceability import traceability_select
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bulk exports (GET /admin/cells/export, /admin/traceability/export).
+#
+# The whole filtered set as CSV or NDJSON, in constant memory however many
+# rows match:
+#
+#   server-side cursor   the statement runs with stream_results + yield_per
+#                        (a named cursor on psycopg2), so rows arrive
+#                        EXPORT_CHUNK_ROWS at a time instead of all at once
+#   one chunk at a time  each batch is encoded and handed to the
+#                        StreamingResponse, then dropped; nothing
+#                        accumulates on the server
+#   off the event loop   the body is a plain generator, which Starlette
+#                        iterates on its thread pool one chunk per call,
+#                        so a million-row export never stalls other
+#                        requests
+#
+# Rows come in index order (the lists' keyset order), so the database
+# never sorts. Each export opens its own session and connection for the
+# duration of the download (the request's get_db session ends when the
+# endpoint returns); EXPORT_MAX_CONCURRENT caps how many run per worker so
+# exports cannot drain the connection pool — past it a 503.
+#
+#   EXPORT_CHUNK_ROWS       default 5000
+#   EXPORT_MAX_CONCURRENT   default 2     (per uvicorn worker)
+# ─────────────────────────────────────────────────────────────────────────────
+
+EXPORT_CHUNK_ROWS     = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+
+EXPORT_FORMATS = {
+    "csv":    "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_FORMAT_PATTERN = f"^({'|'.join(EXPORT_FORMATS)})$"
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+# Statement, column names, and a function mapping a result row (unpacked by
+# position — attribute access per field is the slowest part of a big export)
+# to the exported values
+Export = Tuple[Select, Sequence[str], Callable[[tuple], tuple]]
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+# ── Exports ───────────────────────────────────────────────────────────────────
+
+INVENTORY_COLUMNS = (
+    "cell_id", "brand", "status", "grading_status", "ng_count",
+    "registered_at", "last_test_date", "sorting_date",
+    "ir", "voltage", "capacity",
+    "lot", "specification", "ocv_voltage_mv", "final_result",
+)
+
+
+def inventory_export(filters: list) -> Export:
+    """The inventory list's cells and fields (one grading per cell: uq_cell_grading_cell_id)."""
+    query = (
+        select(
+            Cell.cell_id, CellGrading.brand, Cell.is_used, Cell.status, Cell.ng_count,
+            Cell.registration_date, Cell.last_test_date, Cell.sorting_date,
+            Cell.ir_value_m_ohm, Cell.sorting_voltage, Cell.discharging_capacity_mah,
+            CellGrading.lot, CellGrading.specification, CellGrading.ocv_voltage_mv,
+            CellGrading.final_result,
+        )
+        .select_from(Cell)
+        .outerjoin(CellGrading, CellGrading.cell_id == Cell.cell_id)
+        .where(*filters)
+        .order_by(Cell.registration_date.desc(), Cell.cell_id.desc())
+    )
+
+    def row(r) -> tuple:
+        (cell_id, brand, is_used, status, ng_count, registered, tested, sorted_at,
+         ir, voltage, capacity, lot, specification, ocv, final_result) = r
+        return (
+            cell_id, brand, cell_display_status(is_used, status, sorted_at), status, ng_count,
+            _iso(registered), _iso(tested), _iso(sorted_at),
+            ir, voltage, capacity, lot, specification, ocv, final_result,
+        )
+
+    return query, INVENTORY_COLUMNS, row
+
+
+TRACEABILITY_COLUMNS = (
+    "battery_id", "model", "bms_id", "pack_test_result", "pdi_result",
+    "status", "created_at", "dispatch_destination",
+)
+
+
+def traceability_export(dialect: str, filters: list) -> Export:
+    """The traceability list's statement without a limit; same fallbacks as the list."""
+
+    def row(r) -> tuple:
+        battery_id, model_id, status, created_at, pack_test, destination, bms_id, pdi = r
+        return (
+            battery_id, model_id, bms_id or "Not Assigned",
+            pack_test or "PENDING", pdi or "PENDING",
+            status, _iso(created_at), destination,
+        )
+
+    return traceability_select(dialect, filters), TRACEABILITY_COLUMNS, row
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+
+def _encode(fmt: str, columns: Sequence[str], rows: list) -> bytes:
+    buf = io.StringIO()
+    if fmt == "csv":
+        csv.writer(buf).writerows(rows)
+    else:
+        for values in rows:
+            buf.write(json.dumps(dict(zip(columns, values)), default=str))
+            buf.write("\n")
+    return buf.getvalue().encode("utf-8")
+
+
+class _Slot:
+    """
+    One of the EXPORT_MAX_CONCURRENT slots, released exactly once: when
+    the stream ends, or when it is collected without having run to the end
+    (client disconnected, or the response was never sent).
+    """
+
+    def __init__(self):
+        self.release = weakref.finalize(self, _export_slots.release)
+
+
+def _chunks(export: Export, fmt: str, slot: _Slot) -> Iterator[bytes]:
+    """Runs on Starlette's thread pool, one chunk per next()."""
+    query, columns, row = export
+    try:
+        if fmt == "csv":
+            yield _encode(fmt, columns, [columns])
+
+        # Plain column rows: run on the session's Connection, skipping ORM row processing
+        with SessionLocal() as db:
+            result = db.connection().execute(
+                query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS)
+            )
+            for partition in result.partitions():
+                yield _encode(fmt, columns, [row(r) for r in partition])
+    finally:
+        slot.release()
+
+
+def stream_export(export: Export, fmt: str, name: str) -> StreamingResponse:
+    """
+    StreamingResponse of `export` as `fmt` (csv | ndjson), downloaded as
+    <name>_<timestamp>.<fmt>. 503 when EXPORT_MAX_CONCURRENT exports are
+    already running in this worker.
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exports running. Retry shortly."
+        )
+
+    chunks = _chunks(export, fmt, _Slot())
+
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+    return StreamingResponse(
+        chunks,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        media_type=EXPORT_FORMATS[fmt],
+    )
@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Columnar grading / sorting engine.
+#
+# Replaces the per-row df.iterrows() loops in cell_router.py. All state
+# transitions are computed on whole columns, then only rows that actually
+# change something are emitted for persistence.
+#
+# Grading is split in two steps so the DB-independent part can be reused by
+# any persistence backend:
+#
+#   reduce_grading_rows()  file rows → one row per cell, no DB state needed.
+#                          Within a file, rows after a cell's first PASS are
+#                          dead (the cell is locked from then on), so
+#                          "effective" rows are those up to and including the
+#                          first PASS.
+#   apply_grading_state()  per-cell rows + current DB status → summary and
+#                          the master-record changes. A cell that is already
+#                          "pass" in the DB ignores every row in the file.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Grading report column → CellGrading attribute
+GRADING_TEXT_COLUMNS = {
+    "Lot":           "lot",
+    "Brand":         "brand",
+    "Specification": "specification",
+    "Result":        "result",
+    "SOC Result":    "soc_result",
+    "final Result":  "final_result",
+}
+
+# Numeric columns default to 0 when the column is absent from the file
+GRADING_NUMERIC_COLUMNS = {
+    "OCV Voltage(mV)":           "ocv_voltage_mv",
+    "Upper cut off(mV)":         "upper_cutoff_mv",
+    "Lower cut off(mV)":         "lower_cutoff_mv",
+    "Discharging Capacity(mAh)": "discharging_capacity_mah",
+    "Final SOC(mAh)":            "final_soc_mah",
+    "Final CV Capacity":         "final_cv_capacity",
+}
+
+GRADING_FIELDS = ["test_date"] + list(GRADING_TEXT_COLUMNS.values()) + list(GRADING_NUMERIC_COLUMNS.values())
+
+
+# ── Cleaning ──────────────────────────────────────────────────────────────────
+
+def clean_str(val) -> str | None:
+    """
+    Convert a value to a clean string, handling pandas float reads of
+    integer Excel cells:
+
+        101.0       → "101"
+        4842231.0   → "4842231"
+        "TEN POWER" → "TEN POWER"   (strings unchanged)
+        NaN / None  → None
+
+    Root cause: Excel stores Cell ID and Lot as numbers. pandas reads
+    numeric columns as float64 by default, turning 101 into 101.0.
+    astype(str) then gives "101.0" instead of "101".
+    """
+    if val is None:
+        return None
+    if isinstance(val, float):
+        if pd.isna(val):
+            return None
+        # Whole-number float → strip decimal: 101.0 → "101"
+        return str(int(val)) if val == int(val) else str(val)
+    s = str(val).strip()
+    return s if s and s.lower() != 'nan' else None
+
+
+def _clean_float_array(values: np.ndarray) -> np.ndarray:
+    out   = np.full(len(values), None, dtype=object)
+    valid = np.isfinite(values)
+    whole = valid & (values == np.floor(values))
+    out[whole]          = values[whole].astype(np.int64).astype(str)
+    out[valid & ~whole] = values[valid & ~whole].astype(str)
+    return out
+
+
+def clean_str_series(series: pd.Series) -> pd.Series:
+    """
+    Vectorised clean_str for a whole column. Float columns take a pure NumPy
+    path; anything else is factorised so clean_str runs once per DISTINCT
+    value (Brand / Lot / Result columns have a handful), not once per row.
+    """
+    if series.dtype.kind == 'f':
+        return pd.Series(_clean_float_array(series.to_numpy(dtype=float)), index=series.index, dtype=object)
+
+    if series.dtype.kind in 'iub':
+        return series.astype(str).astype(object)
+
+    codes, uniques = pd.factorize(series)
+    cleaned = np.array([clean_str(v) for v in uniques] + [None], dtype=object)
+    return pd.Series(cleaned[codes], index=series.index, dtype=object)   # code -1 (NaN) → None
+
+
+def _records(frame: pd.DataFrame) -> List[dict]:
+    """Faster frame.to_dict("records") with NaN / NaT normalised to None."""
+    columns = [
+        [None if v is pd.NaT or (isinstance(v, float) and v != v) else v for v in frame[c].tolist()]
+        if frame[c].dtype.kind in 'fOMm' else frame[c].tolist()
+        for c in frame.columns
+    ]
+    keys = list(frame.columns)
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def _nullable(series: pd.Series) -> pd.Series:
+    """Object column with NaN / NaT replaced by None (ORM- and driver-safe)."""
+    out = series.astype(object)
+    return out.where(series.notna(), None)
+
+
+# ── Grading ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class GradingBatch:
+    """
+    One row per distinct cell in the batch (index = cell_id):
+
+      total_rows      rows for this cell in the file
+      effective_rows  rows up to and including the first PASS
+      passed          any PASS in the file
+      ng_increment    NG rows among the effective rows
+      capacity        Discharging Capacity of the last effective row
+      last_test_date  Date of the last effective row
+      <GRADING_FIELDS> detail values from the LAST row (detail is always
+                       overwritten, even after the master is locked)
+    """
+    cells: pd.DataFrame
+
+
+def reduce_grading_rows(df: pd.DataFrame) -> GradingBatch:
+    """Collapse a grading file (or chunk) to one row per cell. No DB access."""
+    ids  = clean_str_series(df['Cell ID'])
+    keep = ids.notna().to_numpy()
+    df   = df.loc[keep]
+    ids  = ids[keep].to_numpy(dtype=object)
+
+    n = len(df)
+    if n == 0:
+        return GradingBatch(pd.DataFrame(columns=[
+            "total_rows", "effective_rows", "passed", "ng_increment",
+            "capacity", "last_test_date", *GRADING_FIELDS,
+        ]))
+
+    result  = df['final Result'].fillna('').astype(str).str.strip().str.upper().to_numpy()
+    is_pass = result == "PASS"
+
+    codes, uniques = pd.factorize(ids)
+
+    # First PASS position per cell (n = never passed in this file)
+    pos        = np.arange(n)
+    first_pass = np.full(len(uniques), n)
+    np.minimum.at(first_pass, codes[is_pass], pos[is_pass])
+    effective  = pos <= first_pass[codes]
+
+    total_rows     = np.bincount(codes, minlength=len(uniques))
+    effective_rows = np.bincount(codes, weights=effective, minlength=len(uniques)).astype(int)
+    ng_increment   = np.bincount(codes, weights=effective & ~is_pass, minlength=len(uniques)).astype(int)
+    passed         = first_pass < n
+
+    # Last effective row / last row per cell (rows are in file order)
+    last_effective = np.full(len(uniques), -1)
+    np.maximum.at(last_effective, codes[effective], pos[effective])
+    last_row = np.full(len(uniques), -1)
+    np.maximum.at(last_row, codes, pos)
+
+    # Native dtypes are kept (NaN / NaT for blanks) — _records() and the
+    # COPY writer both map them to NULL, and float columns serialise fast.
+    capacity = df['Discharging Capacity(mAh)'].to_numpy()
+    dates    = df['Date'].to_numpy()
+
+    cells = pd.DataFrame({
+        "total_rows":     total_rows,
+        "effective_rows": effective_rows,
+        "passed":         passed,
+        "ng_increment":   ng_increment,
+        "capacity":       capacity[last_effective],
+        "last_test_date": dates[last_effective],
+    }, index=pd.Index(uniques, name="cell_id"))
+
+    detail = df.iloc[last_row]
+    cells["test_date"] = dates[last_row]
+    for col, attr in GRADING_TEXT_COLUMNS.items():
+        cells[attr] = clean_str_series(detail[col]).to_numpy() if col in detail.columns else None
+    for col, attr in GRADING_NUMERIC_COLUMNS.items():
+        cells[attr] = detail[col].to_numpy() if col in detail.columns else 0
+
+    return GradingBatch(cells)
+
+
+@dataclass
+class GradingChanges:
+    summary:      Dict[str, int]
+    new_cells:    List[dict] = field(default_factory=list)   # Cell rows to INSERT
+    cell_updates: List[dict] = field(default_factory=list)   # Cell rows to UPDATE (unlocked only)
+
+
+def grading_summary(batch: GradingBatch, existing: pd.DataFrame) -> Dict[str, int]:
+    """
+    Per-ROW summary counters, mutually exclusive and identical to the
+    previous row loop.
+
+    existing: DataFrame indexed by cell_id with a status column — only cells
+              that already exist.
+
+      skipped         rows for cells already "pass" in the DB, plus rows after
+                      the first PASS within the file
+      auto_registered first row of a cell not yet in the DB
+      updated         every other effective row
+    """
+    cells = batch.cells
+    if cells.empty:
+        return {"auto_registered": 0, "updated": 0, "skipped": 0, "errors": 0}
+
+    is_new = ~cells.index.isin(existing.index)
+    locked = (existing["status"].reindex(cells.index) == "pass").to_numpy()
+    live   = ~locked
+
+    total     = cells["total_rows"].to_numpy()
+    effective = cells["effective_rows"].to_numpy()
+
+    return {
+        "auto_registered": int(is_new.sum()),
+        "updated":         int(effective[live].sum() - is_new.sum()),
+        "skipped":         int(total[locked].sum() + (total[live] - effective[live]).sum()),
+        "errors":          0,
+    }
+
+
+def apply_grading_state(batch: GradingBatch, existing: pd.DataFrame) -> GradingChanges:
+    """
+    Combine a reduced batch with the current DB state.
+
+    existing: DataFrame indexed by cell_id with columns status, ng_count —
+              only cells that already exist.
+
+    Returns the summary plus master-record rows to insert / update. Cells
+    already "pass" in the DB are locked and never emitted.
+    """
+    cells   = batch.cells
+    summary = grading_summary(batch, existing)
+    if cells.empty:
+        return GradingChanges(summary)
+
+    state  = existing.reindex(cells.index)
+    is_new = ~cells.index.isin(existing.index)
+    live   = (state["status"] != "pass").to_numpy()
+
+    prior_ng = state["ng_count"].fillna(0).to_numpy(dtype=int)
+    changed  = pd.DataFrame({
+        "cell_id":                  cells.index.to_numpy(dtype=object),
+        "status":                   np.where(cells["passed"].to_numpy(dtype=bool), "pass", "ng"),
+        "ng_count":                 prior_ng + cells["ng_increment"].to_numpy(dtype=int),
+        "discharging_capacity_mah": cells["capacity"].to_numpy(dtype=object),
+        "last_test_date":           cells["last_test_date"].to_numpy(dtype=object),
+    })[live]
+
+    new_mask  = is_new[live]
+    new_cells = _records(changed[new_mask].assign(is_used=False))
+    updates   = _records(changed[~new_mask])
+
+    return GradingChanges(summary, new_cells, updates)
+
+
+def grading_detail_records(batch: GradingBatch) -> List[dict]:
+    """CellGrading rows (cell_id + GRADING_FIELDS) for every cell in the batch."""
+    return _records(batch.cells[GRADING_FIELDS].reset_index())
+
+
+# ── Sorting ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class SortingChanges:
+    summary: Dict[str, int]
+    errors:  List[dict]
+    updates: List[dict]   # cell_id, ir_value_m_ohm, sorting_voltage[, sorting_date]
+    applied: pd.Index     # input index labels of the rows counted as "sorted"
+
+
+def _to_float(series: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(values, unparseable_mask) — unparseable = present but not numeric."""
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+    bad    = series.notna().to_numpy() & np.isnan(values)
+    return values, bad
+
+
+def evaluate_sorting(df: pd.DataFrame, status_map: Dict[str, Optional[str]]) -> SortingChanges:
+    """
+    Sorting eligibility on whole columns.
+
+    Checks, in priority order per row:
+      not_found     cell not in DB
+      not_graded    cell status != "pass"
+      missing_data  IR VALUE or VOLTAGE empty
+      errors        IR VALUE or VOLTAGE not numeric
+    Remaining rows are sorted; the last row per cell wins (re-sorting allowed),
+    and sorting_date only moves when the row carries a Date.
+    """
+    ids  = clean_str_series(df['Cell ID'])
+    keep = ids.notna().to_numpy()
+    df   = df.loc[keep]
+    ids  = ids[keep]
+
+    status    = ids.map(status_map)
+    not_found = ~ids.isin(status_map.keys()).to_numpy()
+    not_pass  = ~not_found & (status != "pass").to_numpy()
+
+    ir, ir_bad     = _to_float(df['IR VALUE'])
+    volt, volt_bad = _to_float(df['VOLTAGE'])
+    missing = ~not_found & ~not_pass & (df['IR VALUE'].isna().to_numpy() | df['VOLTAGE'].isna().to_numpy())
+    bad     = ~not_found & ~not_pass & ~missing & (ir_bad | volt_bad)
+    ok      = ~(not_found | not_pass | missing | bad)
+
+    reason = np.full(len(df), None, dtype=object)
+    reason[not_found] = "Not found in database"
+    if not_pass.any():
+        reason[not_pass] = (
+            "Cell has not passed grading (status: "
+            + status[not_pass].fillna("none").str.upper()
+            + ")"
+        ).to_numpy()
+    reason[missing] = "IR VALUE or VOLTAGE is missing or empty in this row"
+    if bad.any():
+        raw_bad = np.where(ir_bad[bad], df['IR VALUE'].to_numpy()[bad], df['VOLTAGE'].to_numpy()[bad])
+        reason[bad] = [f"could not convert string to float: {v!r}" for v in raw_bad]
+
+    flagged = reason != None   # noqa: E711 — element-wise comparison
+    errors  = [
+        {"cell_id": cid, "reason": why}
+        for cid, why in zip(ids.to_numpy(dtype=object)[flagged], reason[flagged])
+    ]
+
+    summary = {
+        "sorted":       int(ok.sum()),
+        "not_graded":   int(not_pass.sum()),
+        "not_found":    int(not_found.sum()),
+        "missing_data": int(missing.sum()),
+        "errors":       int(bad.sum()),
+    }
+
+    valid = pd.DataFrame({
+        "cell_id":         ids.to_numpy(dtype=object)[ok],
+        "ir_value_m_ohm":  ir[ok],
+        "sorting_voltage": volt[ok],
+    })
+    updates = valid.drop_duplicates("cell_id", keep="last").set_index("cell_id")
+
+    if 'Date' in df.columns:
+        dates = df['Date'][ok]
+        dated = pd.DataFrame({"cell_id": valid["cell_id"], "sorting_date": _nullable(dates).to_numpy(dtype=object)})
+        dated = dated[dates.notna().to_numpy()].drop_duplicates("cell_id", keep="last").set_index("cell_id")
+        updates = updates.join(dated)
+
+    records = _records(updates.reset_index())
+    for rec in records:
+        if "sorting_date" in rec and rec["sorting_date"] is None:
+            del rec["sorting_date"]   # no Date on any row → keep the stored one
+
+    return SortingChanges(summary, errors, records, df.index[ok])
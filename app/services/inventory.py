@@ -0,0 +1,178 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.pubsub import event_bus
+from app.models.cell import Cell, CellGrading
+from app.services.search import text_search
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Cell inventory (GET /admin/cells/inventory, /admin/cells/export and
+# /admin/cells/facets): the shared WHERE clauses and the display status, so
+# the paged list, the bulk export and the facet counts always agree on
+# which cells match and how they are labelled.
+#
+# Facets: the inventory page shows a count per status bucket and per brand.
+# It used to get them with one list call per status, each a full count().
+# inventory_facets() returns all of them from ONE statement:
+#
+#   SELECT brand, count(*), count(*) FILTER (WHERE <ASSIGNED>), …
+#   FROM cells LEFT JOIN cell_gradings … WHERE <the other filters>
+#   GROUP BY brand
+#
+# one row per brand; the status buckets are the column sums. The status
+# conditions are the list's status filter (status_conditions), so each
+# bucket equals the list's total_items for that status. The status filter
+# itself is not applied — the buckets are the alternatives to it — it picks
+# which bucket the brand counts are for.
+#
+# Results are cached per filter combination for FACETS_TTL_S, and cleared in
+# every worker by the change events of grading, sorting, assignment and
+# replacement (app/core/pubsub.py).
+#
+#   FACETS_TTL_S   default 15
+# ─────────────────────────────────────────────────────────────────────────────
+
+FACETS_TTL_S = float(os.getenv("FACETS_TTL_S", "15"))
+
+_facets_cache = TTLCache(FACETS_TTL_S)
+
+_INVALIDATING_TOPICS = {"cells.graded", "cells.sorted", "cells.assigned", "cells.replaced", "resync"}
+
+
+# Inventory status buckets, in display precedence (cell_display_status)
+STATUS_BUCKETS = ("ASSIGNED", "SORTED", "GRADED", "FAILED", "REGISTERED")
+
+
+def status_conditions(status: str) -> list:
+    """
+    WHERE conditions of one status filter / facet bucket (unknown → none).
+    Unlike the display status, buckets can overlap — an assigned, sorted
+    cell is in ASSIGNED and SORTED — as the list filter always did.
+    """
+    s = status.upper()
+    if s == "ASSIGNED":
+        return [Cell.is_used == True]
+    if s == "GRADED":
+        # graded = passed grading, not yet assigned
+        return [Cell.status == "pass", Cell.is_used == False]
+    if s == "FAILED":
+        return [Cell.status == "ng"]
+    if s == "REGISTERED":
+        # registered but no grading data yet
+        return [Cell.status == "pending"]
+    if s == "SORTED":
+        # passed grading AND has sorting data
+        return [Cell.status == "pass", Cell.sorting_date.isnot(None)]
+    return []
+
+
+def inventory_filters(
+    cell_id:   Optional[str],
+    status:    Optional[str],
+    brand:     Optional[str],
+    lot:       Optional[str],
+    date_from: Optional[date],
+    date_to:   Optional[date],
+) -> list:
+    """WHERE clauses of the inventory list (all sargable)."""
+    filters = []
+
+    # Filter by cell_id (substring, or prefix with a trailing * — app/services/search.py)
+    if cell_id:
+        filters.append(text_search(Cell.cell_id, cell_id))
+
+    # Filter by registration date — half-open range, so the index is usable
+    if date_from:
+        filters.append(Cell.registration_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(Cell.registration_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    # FIX — status filter uses Cell.status (set by grading upload) not CellGrading.final_result
+    if status:
+        filters += status_conditions(status)
+
+    # Brand / lot live on CellGrading: EXISTS, so no join fan-out and no DISTINCT
+    if brand:
+        filters.append(Cell.gradings.has(text_search(CellGrading.brand, brand)))
+    if lot:
+        filters.append(Cell.gradings.has(text_search(CellGrading.lot, lot)))
+
+    return filters
+
+
+def cell_display_status(is_used, status, sorting_date) -> str:
+    """Display status from Cell.is_used + Cell.status (the status filter's inverse)."""
+    if is_used:
+        return "ASSIGNED"
+    if status == "pass" and sorting_date:
+        return "SORTED"
+    if status == "pass":
+        return "GRADED"
+    if status == "ng":
+        return "FAILED"
+    return "REGISTERED"
+
+
+# ── Facets ────────────────────────────────────────────────────────────────────
+
+def inventory_facets(
+    db:        Session,
+    cell_id:   Optional[str],
+    status:    Optional[str],
+    brand:     Optional[str],
+    lot:       Optional[str],
+    date_from: Optional[date],
+    date_to:   Optional[date],
+) -> dict:
+    """
+    Status bucket and brand counts of the cells matching the inventory
+    filters (see header). Cached.
+    """
+    status = status.upper() if status else None
+    key    = (cell_id, status, brand, lot, date_from, date_to)
+
+    def compute():
+        filters = inventory_filters(cell_id, None, brand, lot, date_from, date_to)
+        rows = (
+            db.query(
+                CellGrading.brand,
+                func.count(),
+                *[func.count().filter(and_(*status_conditions(b))) for b in STATUS_BUCKETS],
+            )
+            .select_from(Cell)
+            .outerjoin(CellGrading, CellGrading.cell_id == Cell.cell_id)
+            .filter(*filters)
+            .group_by(CellGrading.brand)
+            .all()
+        )
+
+        buckets = {b: sum(row[2 + i] for row in rows) for i, b in enumerate(STATUS_BUCKETS)}
+        column  = 2 + STATUS_BUCKETS.index(status) if status in STATUS_BUCKETS else 1
+        brands  = sorted(
+            ({"brand": row[0], "cells": row[column]} for row in rows if row[column]),
+            key=lambda b: (-b["cells"], b["brand"] or ""),
+        )
+        return {
+            "total":  sum(row[1] for row in rows),
+            "status": buckets,
+            "brands": brands,
+        }
+
+    return _facets_cache.get_or_compute(key, compute)
+
+
+def invalidate_facets_cache() -> None:
+    _facets_cache.clear()
+
+
+def _on_event(event: dict) -> None:
+    if event.get("topic") in _INVALIDATING_TOPICS:
+        invalidate_facets_cache()
+
+
+event_bus.subscribe(_on_event)
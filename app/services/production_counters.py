@@ -0,0 +1,277 @@
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import distinct, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.pubsub import event_bus
+from app.models.battery_pack import Battery
+from app.models.cell import Cell
+from app.models.counters import ProductionCounter
+from app.models.dispatch import Dispatch
+from app.models.pack_test import PackTest
+from app.models.pdi import PDIReport
+from app.services.grading_engine import GradingBatch
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Incrementally maintained production counters (production_counters table).
+#
+# The dashboard KPIs used to be count(*) over cells / batteries / pdi_reports
+# on every refresh, growing with the history. Instead every write path that
+# changes a counted fact builds a Counter of deltas and calls bump() in the
+# SAME transaction, so a counter can never disagree with committed data:
+#
+#   grading        cells.total, cells.status.*        (cell_persistence)
+#   assign/replace cells.used, cells.status.*, batteries.had_ng
+#   pack test      pack_tests.*, batteries.status.*, batteries.had_ng
+#   PDI            pdi.*, batteries.status.*, batteries.had_ng
+#   mark-ready     batteries.status.*
+#   bulk-link      batteries.total, batteries.status.PROD
+#   dispatch       dispatch.total, dispatch.day.<date>, batteries.status.*
+#
+# bump() is ONE multi-row INSERT … ON CONFLICT DO UPDATE SET value = value +
+# excluded.value. Counter rows are hot — every upload touches the same few —
+# so callers bump as the LAST statement before commit (row locks held only
+# for the commit itself) and keys are written in sorted order, so two
+# concurrent uploads lock them in the same order and cannot deadlock.
+#
+# reconcile() rebuilds every counter from the source tables. On PostgreSQL
+# it first takes an EXCLUSIVE lock on production_counters: writers that
+# already bumped have committed by the time it is granted, writers that have
+# not yet bumped block until the rebuild commits and then add their delta on
+# top — so the rebuilt values are exact under READ COMMITTED.
+#
+# Statuses missing on a row count under the column default
+# (cells → pending, batteries → PROD). A dispatch counts under the
+# DATABASE's date of its dispatch_timestamp (DISPATCH_DAY) in the live bump
+# and in reconcile() alike, so a reconcile never moves it to another day.
+# The dashboard's "today" is the app server's date: keep both servers in
+# one timezone.
+# ─────────────────────────────────────────────────────────────────────────────
+
+PDI_PASS       = "Finished PASS"
+PACK_TEST_PASS = "PASS"
+
+_CELL_DEFAULT_STATUS    = "pending"
+_BATTERY_DEFAULT_STATUS = "PROD"
+
+
+# ── Counter names ─────────────────────────────────────────────────────────────
+
+def cell_status_key(status: Optional[str]) -> str:
+    return f"cells.status.{status or _CELL_DEFAULT_STATUS}"
+
+
+def battery_status_key(status: Optional[str]) -> str:
+    return f"batteries.status.{status or _BATTERY_DEFAULT_STATUS}"
+
+
+def dispatch_day_key(day) -> str:
+    return f"dispatch.day.{day.isoformat() if isinstance(day, date) else str(day)[:10]}"
+
+
+DISPATCH_DAY = func.date(Dispatch.dispatch_timestamp)
+
+
+def dispatch_day(db: Session, dispatch: Dispatch):
+    """The day a flushed Dispatch row counts under, computed as reconcile() does."""
+    return db.query(DISPATCH_DAY).filter(Dispatch.id == dispatch.id).scalar()
+
+
+# ── Deltas from write paths ───────────────────────────────────────────────────
+
+BatterySnapshot = Dict[str, Tuple[Optional[str], bool]]
+
+
+def battery_snapshot(batteries: Iterable[Battery]) -> BatterySnapshot:
+    """(overall_status, had_ng_status) per battery, taken before mutating them."""
+    return {b.battery_id: (b.overall_status, bool(b.had_ng_status)) for b in batteries}
+
+
+def battery_deltas(before: BatterySnapshot, batteries: Iterable[Battery]) -> Counter:
+    """
+    Counter deltas between a battery_snapshot() and the batteries' current
+    in-memory state. Batteries missing from `before` are new rows.
+    """
+    deltas = Counter()
+    for b in batteries:
+        status, had_ng = b.overall_status, bool(b.had_ng_status)
+        if b.battery_id not in before:
+            deltas["batteries.total"]          += 1
+            deltas[battery_status_key(status)] += 1
+            deltas["batteries.had_ng"]         += had_ng
+            continue
+
+        old_status, old_had_ng = before[b.battery_id]
+        if (old_status or _BATTERY_DEFAULT_STATUS) != (status or _BATTERY_DEFAULT_STATUS):
+            deltas[battery_status_key(old_status)] -= 1
+            deltas[battery_status_key(status)]     += 1
+        deltas["batteries.had_ng"] += int(had_ng) - int(old_had_ng)
+    return deltas
+
+
+def status_changes(before: BatterySnapshot, batteries: Iterable[Battery]) -> Dict[str, str]:
+    """{battery_id: new status} for batteries that are new or changed status (change events)."""
+    return {
+        b.battery_id: b.overall_status or _BATTERY_DEFAULT_STATUS for b in batteries
+        if b.battery_id not in before
+        or (before[b.battery_id][0] or _BATTERY_DEFAULT_STATUS) != (b.overall_status or _BATTERY_DEFAULT_STATUS)
+    }
+
+
+def grading_deltas(batch: GradingBatch, existing: pd.DataFrame) -> Counter:
+    """
+    Cell counter deltas of persisting a reduced grading batch.
+
+    existing: DataFrame indexed by cell_id with a status column — only cells
+              that already exist (same frame as grading_summary). Cells
+              already "pass" are locked and do not change.
+    """
+    cells = batch.cells
+    if cells.empty:
+        return Counter()
+
+    before = existing["status"].reindex(cells.index).fillna(_CELL_DEFAULT_STATUS)
+    is_new = ~cells.index.isin(existing.index)
+    live   = (before != "pass").to_numpy() | is_new
+    after  = pd.Series(np.where(cells["passed"].to_numpy(dtype=bool), "pass", "ng"), index=cells.index)
+
+    deltas = Counter({"cells.total": int(is_new.sum())})
+    for status, n in after[live].value_counts().items():
+        deltas[cell_status_key(status)] += int(n)
+    for status, n in before[live & ~is_new].value_counts().items():
+        deltas[cell_status_key(status)] -= int(n)
+    return deltas
+
+
+# ── Read / write ──────────────────────────────────────────────────────────────
+
+def bump(db: Session, deltas: Mapping[str, int]) -> None:
+    """
+    Add deltas to their counters (missing counters start at 0) in ONE
+    statement. Caller owns the transaction — call right before commit.
+    """
+    rows = [{"name": k, "value": int(v)} for k, v in sorted(deltas.items()) if v]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = (postgresql if dialect == "postgresql" else sqlite).insert(ProductionCounter)
+        db.execute(insert.on_conflict_do_update(
+            index_elements=[ProductionCounter.name],
+            set_={
+                "value":      ProductionCounter.value + insert.excluded.value,
+                "updated_at": func.now(),
+            },
+        ), rows)
+        return
+
+    for row in rows:
+        counter = db.get(ProductionCounter, row["name"], with_for_update=True)
+        if counter is None:
+            db.add(ProductionCounter(**row))
+        else:
+            counter.value += row["value"]
+
+
+def read_counters(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Current value of each named counter (0 when it has no row yet)."""
+    names  = list(names)
+    stored = dict(
+        db.query(ProductionCounter.name, ProductionCounter.value)
+          .filter(ProductionCounter.name.in_(names)).all()
+    )
+    return {n: int(stored.get(n) or 0) for n in names}
+
+
+# ── Reconciliation ────────────────────────────────────────────────────────────
+
+def count_from_source(db: Session) -> Dict[str, int]:
+    """Every counter recomputed from the source tables (full scans)."""
+    counts = Counter()
+
+    for status, n in db.query(Cell.status, func.count()).group_by(Cell.status):
+        counts["cells.total"]           += n
+        counts[cell_status_key(status)] += n
+    counts["cells.used"] = db.query(func.count()).select_from(Cell) \
+                             .filter(Cell.is_used == True).scalar()
+
+    for status, had_ng, n in db.query(
+        Battery.overall_status, Battery.had_ng_status, func.count()
+    ).group_by(Battery.overall_status, Battery.had_ng_status):
+        counts["batteries.total"]          += n
+        counts[battery_status_key(status)] += n
+        counts["batteries.had_ng"]         += n if had_ng else 0
+
+    counts["pdi.total"], counts["pdi.passed"], counts["pdi.batteries"] = db.query(
+        func.count(PDIReport.id),
+        func.count(PDIReport.id).filter(PDIReport.test_result == PDI_PASS),
+        func.count(distinct(PDIReport.battery_id)),
+    ).one()
+
+    counts["pack_tests.total"], counts["pack_tests.passed"] = db.query(
+        func.count(PackTest.id),
+        func.count(PackTest.id).filter(PackTest.final_result == PACK_TEST_PASS),
+    ).one()
+
+    for dispatched_on, n in db.query(DISPATCH_DAY, func.count()).group_by(DISPATCH_DAY):
+        counts["dispatch.total"]                += n
+        counts[dispatch_day_key(dispatched_on)] += n
+
+    return {k: int(v or 0) for k, v in counts.items()}
+
+
+def _lock_counters(db: Session) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE production_counters IN EXCLUSIVE MODE"))
+
+
+def reconcile(db: Session, progress=None) -> dict:
+    """
+    Rebuild every counter from the source tables and commit. Returns the
+    drift found (stored − actual) for counters that were off.
+    """
+    _lock_counters(db)
+
+    stored = dict(db.query(ProductionCounter.name, ProductionCounter.value).all())
+    actual = count_from_source(db)
+
+    db.query(ProductionCounter).delete(synchronize_session=False)
+    if actual:
+        db.bulk_insert_mappings(ProductionCounter, [
+            {"name": k, "value": v} for k, v in sorted(actual.items())
+        ])
+    event_bus.publish(db, "counters.reconciled")
+    db.commit()
+
+    drift = {
+        name: int(stored.get(name) or 0) - actual.get(name, 0)
+        for name in sorted(set(stored) | set(actual))
+        if int(stored.get(name) or 0) != actual.get(name, 0)
+    }
+    if progress:
+        progress(1, 1)
+    return {
+        "status":        "Complete",
+        "counters":      len(actual),
+        "drift":         drift,
+        "reconciled_at": datetime.now().isoformat(),
+    }
+
+
+def ensure_counters(db: Session) -> bool:
+    """
+    Startup bootstrap: build the counters from the source tables if the
+    table is still empty (first deploy). Returns True when it rebuilt.
+    """
+    _lock_counters(db)
+    if db.query(ProductionCounter.name).first() is not None:
+        db.rollback()
+        return False
+    reconcile(db)
+    return True
@@ -0,0 +1,42 @@
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ID / text search for the admin list filters (cell_id, battery_id, bms_id,
+# invoice_id, brand, lot).
+#
+#   "MX12"    case-insensitive substring:  col ILIKE '%MX12%'
+#             served on PostgreSQL by a pg_trgm GIN index (ix_trgm_*), so
+#             a search-box keystroke is an index lookup, not a sequential
+#             scan. Needs 3+ characters to narrow anything down; shorter
+#             terms still work, just without much help from the index.
+#   "MX12*"   case-insensitive prefix:     upper(col) LIKE 'MX12%'
+#             served by a btree on upper(col) text_pattern_ops
+#             (ix_prefix_*) — a plain range scan, the cheapest lookup
+#             there is; what scanner / type-ahead UIs should send.
+#
+# LIKE wildcards in the term are escaped: "%" and "_" match themselves.
+# The indexes are created at startup by ensure_search_indexes
+# (app/core/schema_upgrades.py). Other dialects run the same predicates
+# without them.
+# ─────────────────────────────────────────────────────────────────────────────
+
+PREFIX_MARK = "*"
+_ESCAPE     = "\\"
+
+
+def _escape_like(term: str) -> str:
+    return (
+        term.replace(_ESCAPE, _ESCAPE * 2)
+            .replace("%", _ESCAPE + "%")
+            .replace("_", _ESCAPE + "_")
+    )
+
+
+def text_search(column, term: str) -> ColumnElement:
+    """WHERE clause for a search-box term on `column` (see header)."""
+    term = term.strip()
+    if term.endswith(PREFIX_MARK) and term.rstrip(PREFIX_MARK):
+        prefix = _escape_like(term.rstrip(PREFIX_MARK).upper())
+        return func.upper(column).like(f"{prefix}%", escape=_ESCAPE)
+    return column.ilike(f"%{_escape_like(term)}%", escape=_ESCAPE)
@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import Select, select, true, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.battery_pack import Battery
+from app.models.bms import BMS
+from app.models.dispatch import Dispatch
+from app.models.pack_test import PackTest
+from app.models.pdi import PDIReport
+from app.services.search import text_search
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Admin traceability list (GET /admin/traceability).
+#
+# Each page used to load whole Battery rows with joinedload on pdi_reports (a
+# collection: the join multiplies rows), bms_record and dispatch_record,
+# page them with OFFSET, count(*) the whole filtered set, then run a second
+# query for the pack-test results. Now ONE statement returns exactly the
+# displayed columns, one row per battery:
+#
+#   batteries   keyset range on ix_battery_created_keyset
+#               (created_at, battery_id) DESC, after the cursor
+#   latest PDI  LEFT JOIN LATERAL (… ORDER BY created_at DESC LIMIT 1),
+#               one probe of ix_pdi_battery_latest per battery
+#   BMS         LEFT JOIN LATERAL (… LIMIT 1) on ix_bms_battery_id
+#   pack test,  plain LEFT JOINs (unique battery_id: at most one row each)
+#   dispatch
+#
+# so a page costs page_size index probes however large batteries grows.
+# Other dialects (local SQLite, no LATERAL) select the latest PDI and the
+# BMS with correlated scalar subqueries instead — same rows.
+#
+# GET /admin/traceability/export streams the same statement without a
+# limit (app/services/exports.py).
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def traceability_filters(
+    battery_id: Optional[str],
+    status:     Optional[str],
+    date_from:  Optional[date],
+    date_to:    Optional[date],
+    bms_id:     Optional[str] = None,
+    invoice_id: Optional[str] = None,
+) -> list:
+    """
+    WHERE clauses on batteries (dates as half-open ranges on created_at).
+    ID terms go through text_search; BMS / invoice as EXISTS.
+    """
+    filters = []
+    if battery_id:
+        filters.append(text_search(Battery.battery_id, battery_id))
+    if bms_id:
+        filters.append(Battery.bms_record.has(text_search(BMS.bms_id, bms_id)))
+    if invoice_id:
+        filters.append(Battery.dispatch_record.has(text_search(Dispatch.invoice_id, invoice_id)))
+    if date_from:
+        filters.append(Battery.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(Battery.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if status:
+        if status == "failed":
+            filters.append(Battery.had_ng_status == True)
+        else:
+            filters.append(Battery.overall_status == status.upper())
+    return filters
+
+
+def traceability_select(
+    dialect: str,
+    filters: list,
+    limit:   Optional[int] = None,
+    after:   Optional[Tuple[datetime, str]] = None,
+    offset:  int = 0,
+) -> Select:
+    """
+    The traceability statement for `dialect`, newest first: up to `limit`
+    rows (all when None) after the (created_at, battery_id) key `after`
+    (keyset) or skipping `offset` rows (legacy paging).
+
+    Row fields: battery_id, model_id, overall_status, created_at, bms_id,
+    pack_test_result, pdi_result, dispatch_destination.
+    """
+    lateral = dialect == "postgresql"
+
+    latest_pdi = (
+        select(PDIReport.test_result.label("pdi_result"))
+        .where(PDIReport.battery_id == Battery.battery_id)
+        .order_by(PDIReport.created_at.desc(), PDIReport.id.desc())
+        .limit(1)
+    )
+    bms = (
+        select(BMS.bms_id.label("bms_id"))
+        .where(BMS.battery_id == Battery.battery_id)
+        .order_by(BMS.bms_id)
+        .limit(1)
+    )
+    if lateral:
+        latest_pdi, bms = latest_pdi.lateral("latest_pdi"), bms.lateral("bms")
+        extra = [bms.c.bms_id, latest_pdi.c.pdi_result]
+    else:
+        extra = [bms.scalar_subquery().label("bms_id"), latest_pdi.scalar_subquery().label("pdi_result")]
+
+    query = (
+        select(
+            Battery.battery_id, Battery.model_id, Battery.overall_status, Battery.created_at,
+            PackTest.final_result.label("pack_test_result"),
+            Dispatch.customer_name.label("dispatch_destination"),
+            *extra,
+        )
+        .select_from(Battery)
+        .outerjoin(PackTest, PackTest.battery_id == Battery.battery_id)
+        .outerjoin(Dispatch, Dispatch.battery_id == Battery.battery_id)
+    )
+    if lateral:
+        query = query.outerjoin(bms, true()).outerjoin(latest_pdi, true())
+
+    query = query.where(*filters)
+    if after is not None:
+        query = query.where(tuple_(Battery.created_at, Battery.battery_id) < tuple_(*after))
+
+    query = query.order_by(Battery.created_at.desc(), Battery.battery_id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    if offset:
+        query = query.offset(offset)
+    return query
+
+
+def traceability_page(
+    db:      Session,
+    filters: list,
+    limit:   int,
+    after:   Optional[Tuple[datetime, str]] = None,
+    offset:  int = 0,
+) -> list:
+    """One page of traceability_select rows."""
+    query = traceability_select(db.get_bind().dialect.name, filters, limit, after, offset)
+    return db.execute(query).all()
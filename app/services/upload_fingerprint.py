@@ -0,0 +1,182 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.upload import UploadFingerprint, UploadRowHash
+from app.services.grading_engine import clean_str_series
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Re-upload detection for machine exports.
+#
+# Operators regularly upload the same export twice. Two levels:
+#
+#   file  sha256 of the raw bytes. A byte-identical, fully-applied file
+#         returns the stored response — no parse, no lookups, no writes.
+#   row   64-bit hash per normalised row. A partially overlapping file only
+#         processes rows never applied before; an exact duplicate row inside
+#         one file is the same test and is applied once.
+#
+# Only APPLIED rows are recorded. Rows rejected for a reason that can change
+# later (cell not graded yet, battery not registered) are retried on the
+# next upload, and a file is only fingerprinted once every row went through.
+#
+# Callers own the transaction: hashes are written in the same commit as the
+# data they describe, so a rolled-back upload leaves no fingerprints.
+#
+# Retention: one row hash per applied row is tens of millions of rows a
+# year, so prune_upload_hashes() deletes file fingerprints and row hashes
+# older than UPLOAD_HASH_RETENTION_DAYS — at startup (app/main.py) and on
+# demand (POST /admin/uploads/prune-hashes). A row or file first applied
+# before the window is no longer recognised: uploading it again re-applies
+# it, overwriting the stored values with the same ones.
+#
+#   UPLOAD_HASH_RETENTION_DAYS   default 180   (0 keeps them forever)
+# ─────────────────────────────────────────────────────────────────────────────
+
+UPLOAD_HASH_RETENTION_DAYS = int(os.getenv("UPLOAD_HASH_RETENTION_DAYS", "180"))
+
+LOOKUP_CHUNK = 5000    # ids per IN (...) when checking known row hashes
+PRUNE_BATCH  = 50000   # rows deleted per transaction when pruning
+_READ_BLOCK  = 1 << 20
+_PRUNE_LOCK  = 0x75706c68   # pg advisory lock id: one pruner at a time across workers
+
+
+def content_digest(data) -> str:
+    """sha256 hex of an upload — raw bytes or a seekable handle (rewound after)."""
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+
+    digest = hashlib.sha256()
+    data.seek(0)
+    for block in iter(lambda: data.read(_READ_BLOCK), b""):
+        digest.update(block)
+    data.seek(0)
+    return digest.hexdigest()
+
+
+def cached_result(db: Session, kind: str, digest: str) -> Optional[dict]:
+    """Stored response for a byte-identical upload that was fully applied, else None."""
+    return (
+        db.query(UploadFingerprint.result)
+          .filter(UploadFingerprint.kind == kind, UploadFingerprint.content_hash == digest)
+          .scalar()
+    )
+
+
+def known_uploads(db: Session, kind: str, digests: List[str]) -> Set[str]:
+    """Subset of digests already fingerprinted (batch form of cached_result)."""
+    if not digests:
+        return set()
+    return {
+        h for (h,) in db.query(UploadFingerprint.content_hash)
+                        .filter(UploadFingerprint.kind == kind, UploadFingerprint.content_hash.in_(digests))
+    }
+
+
+def record_upload(db: Session, kind: str, digest: str, filename: Optional[str], result: Optional[dict]) -> None:
+    _insert_ignore(db, UploadFingerprint, [{
+        "kind": kind, "content_hash": digest, "filename": filename, "result": result,
+    }])
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """
+    int64 hash per row, indexed like df.
+
+    Every column is normalised with clean_str_series first, so the same row
+    hashes identically whether it came from CSV or Excel, a whole-file read
+    or a streaming chunk (101 / 101.0 / "101" all become "101"). Column
+    order does not matter.
+    """
+    normalised = pd.DataFrame(
+        {str(col): clean_str_series(df[col]).fillna("") for col in sorted(df.columns, key=str)},
+        index=df.index,
+    )
+    return pd.util.hash_pandas_object(normalised, index=False).astype(np.int64)
+
+
+def new_row_mask(db: Session, kind: str, hashes: pd.Series) -> np.ndarray:
+    """True for rows never applied before and not repeating an earlier row of this batch."""
+    known = set()
+    unique = hashes.unique().tolist()
+    for start in range(0, len(unique), LOOKUP_CHUNK):
+        chunk = unique[start:start + LOOKUP_CHUNK]
+        known.update(
+            h for (h,) in db.query(UploadRowHash.row_hash)
+                            .filter(UploadRowHash.kind == kind, UploadRowHash.row_hash.in_(chunk))
+        )
+
+    return (~hashes.isin(known) & ~hashes.duplicated()).to_numpy()
+
+
+def record_row_hashes(db: Session, kind: str, hashes: pd.Series) -> None:
+    _insert_ignore(db, UploadRowHash, [
+        {"kind": kind, "row_hash": int(h)} for h in hashes.unique()
+    ])
+
+
+def _prune_batch(db: Session, model, cutoff: datetime) -> int:
+    """Delete up to PRUNE_BATCH rows of model created before cutoff and commit."""
+    pk      = list(model.__mapper__.primary_key)
+    expired = select(*pk).where(model.created_at < cutoff).limit(PRUNE_BATCH)
+    deleted = (
+        db.query(model)
+          .filter(tuple_(*pk).in_(expired))
+          .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def prune_upload_hashes(db: Session, progress=None) -> dict:
+    """
+    Delete upload fingerprints and row hashes older than
+    UPLOAD_HASH_RETENTION_DAYS, PRUNE_BATCH rows per commit so uploads are
+    never blocked for long. Skipped while another worker is pruning.
+    """
+    if UPLOAD_HASH_RETENTION_DAYS <= 0:
+        return {"status": "Disabled", "retention_days": UPLOAD_HASH_RETENTION_DAYS}
+
+    cutoff   = datetime.now(timezone.utc) - timedelta(days=UPLOAD_HASH_RETENTION_DAYS)
+    deleted  = {UploadFingerprint.__tablename__: 0, UploadRowHash.__tablename__: 0}
+    postgres = db.get_bind().dialect.name == "postgresql"
+
+    for model in (UploadFingerprint, UploadRowHash):
+        while True:
+            if postgres and not db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _PRUNE_LOCK}).scalar():
+                db.rollback()
+                return {"status": "Skipped", "reason": "another worker is pruning", "deleted": deleted}
+            count = _prune_batch(db, model, cutoff)
+            deleted[model.__tablename__] += count
+            if progress:
+                progress(sum(deleted.values()))
+            if count < PRUNE_BATCH:
+                break
+
+    return {
+        "status":         "Complete",
+        "retention_days": UPLOAD_HASH_RETENTION_DAYS,
+        "cutoff":         cutoff.isoformat(),
+        "deleted":        deleted,
+    }
+
+
+def _insert_ignore(db: Session, model, rows: list) -> None:
+    """Multi-row INSERT that tolerates a concurrent upload of the same file."""
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(model).on_conflict_do_nothing(), rows)
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(model).on_conflict_do_nothing(), rows)
+    else:
+        db.bulk_insert_mappings(model, rows)
@@ -0,0 +1,331 @@
+import io
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from openpyxl import load_workbook
+
+from app.services.grading_engine import GRADING_NUMERIC_COLUMNS, GRADING_TEXT_COLUMNS, clean_str_series
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Readers for machine exports.
+#
+# pd.read_excel / pd.read_csv on the full upload hold the raw bytes AND the
+# whole DataFrame in memory at once, infer a type for every column in the
+# sheet, and read integer Excel ids back as floats (101 → 101.0) that then
+# have to be repaired. These helpers:
+#
+#   - read the upload handle directly (openpyxl read-only mode for .xlsx)
+#   - keep only the columns the export's ExportSchema lists
+#   - type them once at read time:
+#       text     clean strings, ids never pass through float ("101", not 101.0)
+#       numeric  float64
+#       dates    datetime64 when every cell is a date (as pd.read_excel)
+#     CSV columns are read as str (dtype=str) and typed here, so a CSV id
+#     keeps its leading zeros and every digit ("00123", 17-digit barcodes)
+#     A numeric column holding a value that does not convert is left as
+#     read, so the caller's per-row error reporting still sees it
+#   - optionally yield fixed-size chunks, so the caller's peak memory is
+#     bounded by chunk_rows, not by file size
+# ─────────────────────────────────────────────────────────────────────────────
+
+DEFAULT_CHUNK_ROWS = 5000
+
+# Cell text pandas' readers treat as missing (pandas' default na_values)
+_NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+@dataclass(frozen=True)
+class ExportSchema:
+    """Columns read from one machine export. Anything else in the sheet is skipped."""
+    name:    str
+    text:    Tuple[str, ...] = ()
+    numeric: Tuple[str, ...] = ()
+    dates:   Tuple[str, ...] = ()
+    header:  Callable[[str], str] = str.strip   # header cell → column name
+
+    def kind(self, column: str) -> Optional[str]:
+        if column in self.text:
+            return "text"
+        if column in self.numeric:
+            return "numeric"
+        if column in self.dates:
+            return "date"
+        return None
+
+
+def _lower_header(name: str) -> str:
+    return name.strip().lower()
+
+
+# ── Export schemas ────────────────────────────────────────────────────────────
+
+GRADING_EXPORT = ExportSchema(
+    "grading",
+    text    = ("Cell ID", *GRADING_TEXT_COLUMNS),
+    numeric = tuple(GRADING_NUMERIC_COLUMNS),
+    dates   = ("Date",),
+)
+
+SORTING_EXPORT = ExportSchema(
+    "sorting",
+    text    = ("Cell ID",),
+    numeric = ("IR VALUE", "VOLTAGE"),
+    dates   = ("Date",),
+)
+
+PACK_TEST_EXPORT = ExportSchema(
+    "pack_test",
+    text    = ("Barcode", "Specification", "Cell type", "Result", "idle diff. Result", "final Result"),
+    numeric = (
+        "Actual Capacity(Ah)", "OCV Voltage(V)", "Upper cut off(V)", "Lower cut off(V)",
+        "Discharging Capacity(Ah)", "Final idle Different", "Final Voltage",
+    ),
+    dates   = ("Date",),
+)
+
+PDI_EXPORT = ExportSchema(
+    "pdi",
+    text    = ("Internal SN", "Test Result"),
+    numeric = (
+        "Voltage(V)", "Resistance(m¦¸)",
+        "Continuous Charging Current(A)", "Continuous Charging Voltage(V)",
+        "Continuous Discharging Current(A)", "Continuous Discharging Voltage(V)",
+        "Short circuit protection time (uS)",
+    ),
+    dates   = ("Time",),
+)
+
+BULK_LINK_EXPORT = ExportSchema(
+    "bulk_link",
+    text    = ("battery_id", "model_name"),
+    header  = _lower_header,
+)
+
+
+# ── Column typing ─────────────────────────────────────────────────────────────
+
+def _typed(series: pd.Series, kind: Optional[str]) -> pd.Series:
+    """Type a column pandas already parsed (CSV / .xls path)."""
+    if kind == "text":
+        return clean_str_series(series)
+
+    if kind == "numeric":
+        try:
+            return series.astype(float)
+        except (TypeError, ValueError):
+            return series
+
+    return series   # dates: pandas' own inference, as pd.read_excel does
+
+
+def _typed_values(values: tuple, kind: Optional[str]):
+    """
+    Type one column of raw openpyxl cell values (.xlsx path). Works on the
+    plain tuple — one DataFrame is built per chunk, not one Series per column.
+    """
+    values = [None if type(v) is str and v in _NA_STRINGS else v for v in values]
+
+    if kind == "text":
+        # Let pandas infer: int / float id columns take clean_str_series'
+        # vectorised paths, repeated text (Brand, Result) is factorised
+        return clean_str_series(pd.Series(values)).to_numpy(dtype=object)
+
+    if kind == "numeric":
+        try:
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            return values
+
+    return values   # dates: datetime cells become datetime64 in the constructor
+
+
+def _project(df: pd.DataFrame, schema: Optional[ExportSchema]) -> pd.DataFrame:
+    """Rename headers, keep the schema's columns (file order), type them."""
+    if schema is None:
+        return df
+
+    source = [schema.header(str(c)) for c in df.columns]
+    df.columns = source
+
+    keep = [c for c in dict.fromkeys(source) if schema.kind(c)]
+    out  = pd.DataFrame(
+        {c: _typed(df[c] if df[c].ndim == 1 else df[c].iloc[:, 0], schema.kind(c)) for c in keep},
+        index=df.index,
+    )
+    out.attrs["source_columns"] = source
+    return out
+
+
+def _header_names(raw: tuple) -> List[str]:
+    """
+    Mirror pandas' header handling for blank header cells so downstream
+    column lookups behave the same as with pd.read_excel.
+    """
+    return [
+        str(h) if h is not None else f"Unnamed: {i}"
+        for i, h in enumerate(raw)
+    ]
+
+
+# ── Readers ───────────────────────────────────────────────────────────────────
+
+def iter_csv_chunks(
+    handle:     BinaryIO,
+    chunk_rows: Optional[int]          = DEFAULT_CHUNK_ROWS,
+    schema:     Optional[ExportSchema] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield DataFrames of at most chunk_rows rows (None = whole file) from a CSV handle."""
+    handle.seek(0)
+    options = {}
+    if schema is not None:
+        # Every column as text; _typed converts the numeric ones
+        options = dict(
+            usecols         = lambda c: schema.kind(schema.header(str(c))) is not None,
+            dtype           = str,
+            keep_default_na = True,
+        )
+
+    if chunk_rows is None:
+        yield _project(pd.read_csv(handle, **options), schema)
+        return
+
+    for chunk in pd.read_csv(handle, chunksize=chunk_rows, **options):
+        yield _project(chunk, schema)
+
+
+def iter_xlsx_chunks(
+    handle:     BinaryIO,
+    chunk_rows: Optional[int]          = DEFAULT_CHUNK_ROWS,
+    schema:     Optional[ExportSchema] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrames of at most chunk_rows rows (None = whole sheet) from the
+    first sheet of an .xlsx handle using openpyxl's read-only (streaming) mode.
+    Fully empty rows are dropped, matching pd.read_excel. A sheet with a
+    header but no data yields one empty frame so column checks still run.
+    """
+    handle.seek(0)
+    wb = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        source = _header_names(header)
+        width  = len(source)
+
+        if schema is None:
+            names, picks = source, list(range(width))
+        else:
+            source = [schema.header(h) for h in source]
+            first  = {}
+            for i, name in enumerate(source):
+                if schema.kind(name) and name not in first:
+                    first[name] = i
+            names, picks = list(first), list(first.values())
+
+        def frame(buffer: list) -> pd.DataFrame:
+            if schema is None:
+                return pd.DataFrame(buffer, columns=names)
+
+            columns = list(zip(*buffer)) if buffer else [()] * len(names)
+            df = pd.DataFrame(
+                {name: _typed_values(col, schema.kind(name)) for name, col in zip(names, columns)},
+                columns=names,
+            )
+            df.attrs["source_columns"] = source
+            return df
+
+        buffer  = []
+        yielded = False
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            values = values[:width] + (None,) * (width - len(values))
+            buffer.append(tuple(values[i] for i in picks))
+            if chunk_rows and len(buffer) >= chunk_rows:
+                yield frame(buffer)
+                yielded = True
+                buffer  = []
+
+        if buffer or not yielded:
+            yield frame(buffer)
+    finally:
+        wb.close()
+
+
+def _sniff(handle: BinaryIO, filename: Optional[str]) -> str:
+    """File format from the leading bytes, falling back to the extension."""
+    handle.seek(0)
+    head = handle.read(8)
+    handle.seek(0)
+
+    if head.startswith(b"PK"):
+        return "xlsx"                 # zip container
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"                  # legacy OLE2 workbook
+    name = (filename or "").lower()
+    if name.endswith(('.xlsx', '.xls')):
+        return "xlsx"                 # let openpyxl report what is wrong with it
+    return "csv"
+
+
+def iter_upload_chunks(
+    handle:     BinaryIO,
+    filename:   Optional[str],
+    chunk_rows: Optional[int]          = DEFAULT_CHUNK_ROWS,
+    schema:     Optional[ExportSchema] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Dispatch on file format:
+      .xlsx → openpyxl read-only streaming
+      .xls  → legacy format has no streaming reader; parsed once, then sliced
+      other → CSV via pandas' chunked reader
+    chunk_rows=None yields the whole file as one frame.
+    """
+    fmt = _sniff(handle, filename)
+    if fmt == "xlsx":
+        yield from iter_xlsx_chunks(handle, chunk_rows, schema)
+    elif fmt == "xls":
+        df = _project(pd.read_excel(handle), schema)
+        step = chunk_rows or max(len(df), 1)
+        for start in range(0, max(len(df), 1), step):
+            yield df.iloc[start:start + step]
+    else:
+        yield from iter_csv_chunks(handle, chunk_rows, schema)
+
+
+def read_export(handle: BinaryIO, schema: ExportSchema, filename: Optional[str] = None) -> pd.DataFrame:
+    """Whole-file read of one machine export through its schema."""
+    return next(iter_upload_chunks(handle, filename, None, schema), pd.DataFrame())
+
+
+def parse_export_columns(
+    source:   Union[bytes, str],
+    schema:   ExportSchema,
+    filename: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, np.ndarray]], Optional[str]]:
+    """
+    Parse-pool worker (app/core/parse_pool.py): read_export flattened to
+    {column: ndarray}, which pickles far smaller and faster than a
+    DataFrame. source is the raw bytes or the path of a spooled upload
+    (app/core/upload_spool.py) — a path is opened in the worker, so the
+    file never travels through the pool.
+
+    Returns (columns, None) or (None, error) — never raises, so one
+    unreadable file does not abort the batch.
+    """
+    try:
+        if isinstance(source, str):
+            with open(source, "rb") as handle:
+                df = read_export(handle, schema, filename)
+        else:
+            df = read_export(io.BytesIO(source), schema, filename)
+        return {col: df[col].to_numpy() for col in df.columns}, None
+    except Exception as e:
+        return None, str(e)
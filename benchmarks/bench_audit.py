@@ -0,0 +1,150 @@
+"""
+Battery audit download (GET /reports/generate-full-audit/{battery_id}):
+rendering the workbook on every request vs the disk cache
+(app/services/audit.py). PostgreSQL only.
+
+Seeds a throwaway schema (bench_audit) in the app's database — BURST
+batteries of a 20S × 13P model (260 graded cells each) with pack test and
+dispatch — and a throwaway cache directory, then times, best of 5:
+
+  render     load_audit + render_audit (what every download used to cost)
+  version    load_audit + audit_version (the part a cache hit still pays)
+  hit        a full request served from the cache
+
+and the latency of a trivial request (GET /, standing in for a barcode
+scan) while BURST different audits are downloaded at once — rendered on
+the event loop, as the endpoint used to, vs on the report pool
+(app/core/report_pool.py).
+
+    python -m benchmarks.bench_audit [cells_per_pack]
+"""
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.database import Base, SessionLocal, engine
+from app.services import audit
+from app.services.audit_workbook import render_audit
+
+SCHEMA = "bench_audit"
+CELLS  = 260
+BURST  = 8
+
+_SEED = [
+    """INSERT INTO battery_models (model_id, category, series_count, parallel_count, cell_type, welding_type)
+       VALUES ('MX-72V', 'e-Rickshaw', 20, 13, 'NMC', 'SPOT')""",
+    """INSERT INTO batteries (battery_id, model_id, overall_status)
+       SELECT 'B' || b, 'MX-72V', 'DISPATCHED' FROM generate_series(1, :burst) b""",
+    """INSERT INTO cells (cell_id, status, ng_count, is_used, ir_value_m_ohm, sorting_voltage, discharging_capacity_mah)
+       SELECT 'C' || g, 'pass', 0, true, 10 + g % 50 / 10.0, 3.6 + g % 10 / 100.0, 6000 + g % 200
+       FROM generate_series(1, :cells * :burst) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot, specification, final_result)
+       SELECT 'C' || g, 'EVE', 'L1', '3.2V 6Ah', 'PASS' FROM generate_series(1, :cells * :burst) g""",
+    """INSERT INTO battery_cell_mapping (battery_id, cell_id)
+       SELECT 'B' || (1 + g % :burst), 'C' || g FROM generate_series(1, :cells * :burst) g""",
+    """INSERT INTO pack_testing_reports (battery_id, specification, final_result)
+       SELECT 'B' || b, '72V 78Ah', 'PASS' FROM generate_series(1, :burst) b""",
+    """INSERT INTO dispatch_records (battery_id, customer_name, invoice_id, invoice_date)
+       SELECT 'B' || b, 'Customer', 'INV-' || b, '2026-01-01' FROM generate_series(1, :burst) b""",
+]
+
+
+def _best(fn, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+async def inline_audit(battery_id: str):
+    """The endpoint before the report pool: everything on the event loop."""
+    with SessionLocal() as db:
+        return len(render_audit(battery_id, audit.load_audit(db, battery_id)))
+
+
+async def _scan_latency_during_burst(app, path: str) -> tuple:
+    """(max, median) latency of GET / while BURST audits of path are fetched."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        done      = asyncio.Event()
+        latencies = []
+
+        async def scans():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        scanner = asyncio.create_task(scans())
+        await asyncio.gather(*[client.get(path.format(b)) for b in range(1, BURST + 1)])
+        done.set()
+        await scanner
+    latencies.sort()
+    return latencies[-1], latencies[len(latencies) // 2]
+
+
+def main(cells: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_audit needs PostgreSQL")
+
+    from app.main import app
+
+    # Requests open their own sessions: pin their connections to the schema
+    schema_engine = create_engine(engine.url, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    SessionLocal.configure(bind=schema_engine)
+    audit.audit_cache.directory = tempfile.mkdtemp(prefix="bench_audit")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells, "burst": BURST})
+            conn.commit()
+
+            def render():
+                with SessionLocal() as db:
+                    render_audit("B1", audit.load_audit(db, "B1"))
+
+            def version():
+                with SessionLocal() as db:
+                    audit.audit_version(audit.load_audit(db, "B1"))
+
+            client = TestClient(app)
+            size   = len(client.get("/reports/generate-full-audit/B1").content)
+            hit    = lambda: client.get("/reports/generate-full-audit/B1").content
+
+            print(f"battery with {cells} cells, workbook {size / 1024:.0f}KB")
+            print(f"{'render (every download before)':<34} {_best(render) * 1000:>9.1f}ms")
+            print(f"{'load + version':<34} {_best(version) * 1000:>9.1f}ms")
+            print(f"{'request served from cache':<34} {_best(hit) * 1000:>9.1f}ms")
+
+            audit.audit_cache.max_bytes = 0   # every download renders
+            app.add_api_route("/bench/inline-audit/{battery_id}", inline_audit)
+            print(f"GET / while {BURST} audits render:    {'max':>9} {'median':>9}")
+            for label, path in (("on the event loop (before)", "/bench/inline-audit/B{}"),
+                                ("on the report pool",         "/reports/generate-full-audit/B{}")):
+                worst, median = asyncio.run(_scan_latency_during_burst(app, path))
+                print(f"  {label:<32} {worst * 1000:>7.1f}ms {median * 1000:>7.1f}ms")
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+            SessionLocal.configure(bind=engine)
+            schema_engine.dispose()
+            shutil.rmtree(audit.audit_cache.directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else CELLS)
@@ -0,0 +1,148 @@
+"""
+Audit bundle for one invoice (GET /reports/audit-bundle): one download per
+battery, as QA did before, vs the streamed ZIP bundle
+(app/services/audit_bundle.py) with an empty audit cache and again with a
+warm one. PostgreSQL only.
+
+Seeds a throwaway schema (bench_audit_bundle) in the app's database — one
+invoice of BATTERIES dispatched batteries, 260 graded cells each, with
+pack test, PDI, BMS and welding — and a throwaway cache directory, then
+reports wall time, SQL statements issued and, for the bundle, time to the
+first ZIP chunk. Run from the repository root (bundle worker processes
+import the renderer from there).
+
+    python -m benchmarks.bench_audit_bundle [batteries]
+"""
+import io
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from sqlalchemy import create_engine, event, text
+
+from app.database import Base, SessionLocal, engine
+from app.services import audit, audit_bundle
+from app.services.audit_workbook import render_audit
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.battery_pack, app.models.bms, app.models.dispatch  # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters       # noqa: F401,E401
+import app.models.welding                                                                 # noqa: F401
+
+SCHEMA    = "bench_audit_bundle"
+BATTERIES = 200
+CELLS     = 260
+
+_SEED = [
+    """INSERT INTO battery_models (model_id, category, series_count, parallel_count, cell_type, welding_type)
+       VALUES ('MX-72V', 'e-Rickshaw', 20, 13, 'NMC', 'SPOT')""",
+    """INSERT INTO batteries (battery_id, model_id, overall_status)
+       SELECT 'B' || b, 'MX-72V', 'DISPATCHED' FROM generate_series(1, :batteries) b""",
+    """INSERT INTO cells (cell_id, status, ng_count, is_used, ir_value_m_ohm, sorting_voltage, discharging_capacity_mah)
+       SELECT 'C' || g, 'pass', 0, true, 10 + g % 50 / 10.0, 3.6 + g % 10 / 100.0, 6000 + g % 200
+       FROM generate_series(1, :cells * :batteries) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot, specification, final_result)
+       SELECT 'C' || g, 'EVE', 'L1', '3.2V 6Ah', 'PASS' FROM generate_series(1, :cells * :batteries) g""",
+    """INSERT INTO battery_cell_mapping (battery_id, cell_id)
+       SELECT 'B' || (1 + g % :batteries), 'C' || g FROM generate_series(1, :cells * :batteries) g""",
+    """INSERT INTO pack_testing_reports (battery_id, specification, final_result, ocv_voltage, upper_cutoff,
+                                         lower_cutoff, final_voltage)
+       SELECT 'B' || b, '72V 78Ah', 'PASS', 80.1, 84.0, 60.0, 81.0 FROM generate_series(1, :batteries) b""",
+    """INSERT INTO pdi_reports (battery_id, test_result, voltage_v, resistance_m_ohm)
+       SELECT 'B' || b, 'Finished PASS', 80.0, 25.0 FROM generate_series(1, :batteries) b""",
+    """INSERT INTO bms_inventory (bms_id, battery_id, is_used)
+       SELECT 'BMS' || b, 'B' || b, true FROM generate_series(1, :batteries) b""",
+    """INSERT INTO spot_welding_data (battery_id) SELECT 'B' || b FROM generate_series(1, :batteries) b""",
+    """INSERT INTO dispatch_records (battery_id, customer_name, invoice_id, invoice_date)
+       SELECT 'B' || b, 'Customer', 'INV-1', '2026-01-01' FROM generate_series(1, :batteries) b""",
+]
+
+
+class _StatementCounter:
+    def __init__(self, target):
+        self.count = 0
+        event.listen(target, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def one_by_one(battery_ids: list) -> int:
+    """What QA did: one download — query set + render — per battery."""
+    size = 0
+    for battery_id in battery_ids:
+        with SessionLocal() as db:
+            size += len(render_audit(battery_id, audit.load_audit(db, battery_id)))
+    return size
+
+
+def bundle(battery_ids: list) -> tuple:
+    """(time to first chunk, archive size, workbooks in the archive)"""
+    audit_bundle._bundle_slots.acquire()
+    start = time.perf_counter()
+    first = None
+    body  = io.BytesIO()
+    for chunk in audit_bundle._chunks(battery_ids, audit_bundle._Slot()):
+        if first is None:
+            first = time.perf_counter() - start
+        body.write(chunk)
+    return first, body.tell(), len(zipfile.ZipFile(body).namelist())
+
+
+def main(batteries: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_audit_bundle needs PostgreSQL")
+
+    # Bundles open their own sessions: pin their connections to the schema
+    schema_engine = create_engine(engine.url, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    SessionLocal.configure(bind=schema_engine)
+    statements = _StatementCounter(schema_engine)
+    audit.audit_cache.directory = tempfile.mkdtemp(prefix="bench_audit_bundle")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": CELLS, "batteries": batteries})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+
+            with SessionLocal() as db:
+                battery_ids = audit_bundle.bundle_battery_ids(db, "INV-1", None, None, None, limit=batteries)
+            audit_bundle.bundle_pool.warm()
+            print(f"invoice INV-1: {len(battery_ids)} batteries × {CELLS} cells, "
+                  f"{audit_bundle.bundle_pool.workers} bundle workers")
+
+            print(f"{'':<28} {'first chunk':>12} {'total':>9} {'statements':>11} {'size':>8}")
+            runs = (
+                ("one download per battery", lambda: (None, one_by_one(battery_ids), len(battery_ids))),
+                ("bundle, empty cache",      lambda: bundle(battery_ids)),
+                ("bundle, warm cache",       lambda: bundle(battery_ids)),
+            )
+            for label, run in runs:
+                statements.count = 0
+                start = time.perf_counter()
+                first, size, workbooks = run()
+                total = time.perf_counter() - start
+                assert workbooks == len(battery_ids), (label, workbooks)
+                first = f"{first * 1000:.0f}ms" if first is not None else "—"
+                print(f"{label:<28} {first:>12} {total:>8.1f}s {statements.count:>11} {size / 2**20:>6.1f}MB")
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+            SessionLocal.configure(bind=engine)
+            schema_engine.dispose()
+            audit_bundle.bundle_pool.shutdown()
+            shutil.rmtree(audit.audit_cache.directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else BATTERIES)
@@ -0,0 +1,99 @@
+"""
+Inventory filter dropdowns: the previous SELECT DISTINCT brand over
+cell_gradings vs the brand / lot catalog (app/services/cell_catalog.py),
+read from the table and from the in-process cache. PostgreSQL only.
+
+Seeds a throwaway schema (bench_catalog) in the app's database — 1M graded
+cells over 4 brands and 500 lots — builds the catalog with rebuild_catalog
+(timed: the one-off cost on first deploy), then times each read, best of 5.
+
+    python -m benchmarks.bench_catalog [cells]
+"""
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models.cell import CellGrading
+from app.services.cell_catalog import (
+    catalog_brands, catalog_lots, invalidate_catalog_cache, rebuild_catalog,
+)
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.battery_pack, app.models.bms, app.models.dispatch  # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters       # noqa: F401,E401
+
+SCHEMA = "bench_catalog"
+CELLS  = 1_000_000
+
+_SEED = [
+    """INSERT INTO cells (cell_id, status, ng_count, registration_date)
+       SELECT 'C' || g, 'pass', 0, now() FROM generate_series(1, :cells) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot, test_date)
+       SELECT 'C' || g, (ARRAY['EVE','LISHEN','BAK','TEN POWER'])[1 + g % 4], 'L' || (g % 500),
+              timestamp '2026-01-01' + (g / 10) * interval '1 minute'
+       FROM generate_series(1, :cells) g""",
+]
+
+
+def legacy_brands(db: Session) -> list:
+    """What get_unique_brands used to run on every page load."""
+    return sorted(b for (b,) in db.query(CellGrading.brand).distinct().all() if b)
+
+
+def _best(fn, repeat: int = 5, cold: bool = False) -> tuple:
+    times = []
+    for _ in range(repeat):
+        if cold:
+            invalidate_catalog_cache()
+        start  = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(cells: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_catalog needs PostgreSQL")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {cells} graded cells in {time.perf_counter() - start:.1f}s")
+
+            db = Session(bind=conn)
+            start = time.perf_counter()
+            entries = rebuild_catalog(db)["entries"]
+            print(f"rebuild_catalog: {entries} pairs in {time.perf_counter() - start:.2f}s")
+
+            legacy, t_legacy = _best(lambda: legacy_brands(db))
+            brands, t_table  = _best(lambda: catalog_brands(db), cold=True)
+            _,      t_cached = _best(lambda: catalog_brands(db))
+            assert legacy == [b["brand"] for b in brands], (legacy, brands)
+            lots,   t_lots   = _best(lambda: catalog_lots(db, "EVE"), cold=True)
+
+            print(f"{'brands: DISTINCT over cell_gradings':<40} {t_legacy * 1000:>9.2f}ms")
+            print(f"{'brands: catalog table':<40} {t_table * 1000:>9.2f}ms")
+            print(f"{'brands: cached':<40} {t_cached * 1000:>9.3f}ms")
+            print(f"{'lots of one brand: catalog table':<40} {t_lots * 1000:>9.2f}ms  ({len(lots)} lots)")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else CELLS)
@@ -0,0 +1,152 @@
+"""
+Admin dashboard aggregation: the previous eight-query fetch vs
+dashboard_snapshot (app/services/dashboard_stats.py), which reads its KPIs
+from production_counters. PostgreSQL only.
+
+Seeds a throwaway schema (bench_dashboard) in the app's database — 1M cells,
+50k batteries (2k of them created today), a PDI report for 80% of the
+batteries, 20k dispatches — builds the counters with reconcile() (timed: it
+is the full-scan cost the dashboard no longer pays), times both
+implementations, checks they agree, then drops the schema.
+
+    python -m benchmarks.bench_dashboard [cells] [batteries]
+"""
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import case, event, func, literal_column, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models.battery_pack import Battery
+from app.models.cell import Cell
+from app.models.dispatch import Dispatch
+from app.models.pdi import PDIReport
+from app.services.dashboard_stats import dashboard_snapshot
+from app.services.production_counters import reconcile
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.bms, app.models.pack_test, app.models.upload   # noqa: F401,E401
+
+SCHEMA    = "bench_dashboard"
+CELLS     = 1_000_000
+BATTERIES = 50_000
+
+_SEED = [
+    """INSERT INTO battery_models (model_id, category, series_count, parallel_count, cell_type, welding_type)
+       VALUES ('MV-48V-26AH', 'e-Rickshaw', 13, 10, 'NMC', 'SPOT')""",
+    """INSERT INTO cells (cell_id, status, ng_count, registration_date)
+       SELECT 'C' || g, (ARRAY['pass','ng','pending'])[1 + g % 3], g % 2,
+              now() - (g % 400) * interval '1 day'
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO batteries (battery_id, model_id, had_ng_status, overall_status, created_at)
+       SELECT 'B' || g, 'MV-48V-26AH', g % 17 = 0, 'PROD',
+              CASE WHEN g <= 2000 THEN date_trunc('day', now()) + (g % 600) * interval '1 minute'
+                   ELSE now() - (1 + g % 300) * interval '1 day' END
+       FROM generate_series(1, :batteries) g""",
+    """INSERT INTO pdi_reports (battery_id, test_result, created_at)
+       SELECT 'B' || g, CASE WHEN g % 9 = 0 THEN 'Fail' ELSE 'Finished PASS' END,
+              now() - (g % 5000) * interval '1 minute'
+       FROM generate_series(1, :batteries) g WHERE g % 5 <> 0""",
+    """INSERT INTO dispatch_records (battery_id, customer_name, invoice_id, invoice_date, dispatch_timestamp)
+       SELECT 'B' || g, 'Customer', 'INV' || g, current_date,
+              now() - (g % 20) * interval '1 day'
+       FROM generate_series(1, :batteries) g WHERE g % 5 = 1""",
+]
+
+
+def legacy_dashboard_stats(db: Session, today) -> dict:
+    """The eight queries fetch_dashboard_stats used to run."""
+    pdi_total  = db.query(func.count(PDIReport.id)).scalar() or 0
+    pdi_passed = db.query(func.count(PDIReport.id)).filter(PDIReport.test_result == 'Finished PASS').scalar() or 0
+    return {
+        "total_cells":      db.query(func.count(Cell.cell_id)).scalar() or 0,
+        "batteries":        db.query(func.count(Battery.battery_id)).scalar() or 0,
+        "pdi_total":        pdi_total,
+        "pdi_passed":       pdi_passed,
+        "dispatched_today": db.query(func.count(Dispatch.id)).filter(
+            func.date(Dispatch.dispatch_timestamp) == today).scalar() or 0,
+        "failed_packs":     db.query(func.count(Battery.battery_id)).filter(
+            Battery.had_ng_status == True).scalar() or 0,
+        "pending_pdi":      db.query(func.count(Battery.battery_id)).outerjoin(PDIReport).filter(
+            PDIReport.id == None).scalar() or 0,
+        "recent_pdi":       db.query(
+            PDIReport.battery_id.label("id"), literal_column("'PDI Inspection'").label("action"),
+            PDIReport.created_at.label("time"), PDIReport.test_result.label("status"),
+        ).order_by(PDIReport.created_at.desc()).limit(5).all(),
+        "today_output":     db.query(
+            Battery.battery_id, Battery.model_id.label("model"),
+            literal_column("'Final Assembly'").label("stage"),
+            case((Battery.had_ng_status == True, "REPAIRED"), else_="HEALTHY").label("status"),
+            Battery.created_at.label("updated_at"),
+        ).filter(func.date(Battery.created_at) == today).all(),
+    }
+
+
+def _timed(db: Session, fn, repeat: int = 5):
+    statements = []
+    listener   = lambda *a, **k: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        times = []
+        for _ in range(repeat):
+            statements.clear()
+            start  = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return result, min(times), len(statements)
+
+
+def main(cells: int, batteries: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_dashboard needs PostgreSQL")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells, "batteries": batteries})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {cells} cells / {batteries} batteries in {time.perf_counter() - start:.1f}s")
+
+            db    = Session(bind=conn)
+            today = datetime.now().date()
+
+            start = time.perf_counter()
+            reconcile(db)
+            print(f"reconciled counters in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+            old, t_old, n_old = _timed(db, lambda: legacy_dashboard_stats(db, today))
+            new, t_new, n_new = _timed(db, lambda: dashboard_snapshot(db, today))
+
+            for key in ("total_cells", "batteries", "pdi_total", "pdi_passed",
+                        "dispatched_today", "failed_packs", "pending_pdi"):
+                assert old[key] == new[key], (key, old[key], new[key])
+            assert [r.id for r in old["recent_pdi"]] == [r[0] for r in new["recent_pdi"]]
+            assert {r[0] for r in new["today_output"]} <= {r.battery_id for r in old["today_output"]}
+
+            print(f"{'implementation':<22} {'statements':>10} {'best of 5':>10}")
+            print(f"{'eight queries':<22} {n_old:>10} {t_old * 1000:>8.1f}ms  ({len(old['today_output'])} today_output rows)")
+            print(f"{'dashboard_snapshot':<22} {n_new:>10} {t_new * 1000:>8.1f}ms  ({len(new['today_output'])} today_output rows)")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CELLS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else BATTERIES,
+    )
@@ -0,0 +1,111 @@
+"""
+Bulk cell inventory export (GET /admin/cells/export): the streamed export
+(app/services/exports.py: server-side cursor, EXPORT_CHUNK_ROWS per chunk)
+vs loading the whole result and encoding it in one go, as a plain
+list-to-CSV endpoint would. PostgreSQL only.
+
+Seeds a throwaway schema (bench_export) in the app's database — 1M cells,
+half of them graded — then, per format, reports time to first chunk,
+total time, and how much the process's peak RSS grew. The streamed runs go
+first: peak RSS only ever rises, so each buffered figure includes the
+streamed one below it.
+
+    python -m benchmarks.bench_export [cells]
+"""
+import resource
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.database import Base, SessionLocal, engine
+from app.services import exports
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.battery_pack, app.models.bms, app.models.dispatch  # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters       # noqa: F401,E401
+
+SCHEMA = "bench_export"
+CELLS  = 1_000_000
+
+_SEED = [
+    """INSERT INTO cells (cell_id, status, ng_count, is_used, registration_date, ir_value_m_ohm)
+       SELECT 'C' || g, (ARRAY['pass','ng','pending'])[1 + g % 3], g % 2, g % 7 = 0,
+              timestamp '2026-01-01' + (g / 3) * interval '10 seconds', 10 + g % 50 / 10.0
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot, specification)
+       SELECT 'C' || g, (ARRAY['EVE','LISHEN','BAK'])[1 + g % 3], 'L' || (g / 5000), '3.2V 6Ah'
+       FROM generate_series(1, :cells) g WHERE g % 2 = 0""",
+]
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def streamed(fmt: str):
+    """What the endpoint sends, chunk by chunk."""
+    exports._export_slots.acquire()
+    yield from exports._chunks(exports.inventory_export([]), fmt, exports._Slot())
+
+
+def buffered(fmt: str):
+    """Every row fetched, then encoded as one body."""
+    query, columns, row = exports.inventory_export([])
+    with SessionLocal() as db:
+        rows = [row(r) for r in db.execute(query).all()]
+    body = exports._encode(fmt, columns, ([columns] if fmt == "csv" else []) + rows)
+    yield body
+
+
+def _measure(chunks) -> tuple:
+    rss   = _peak_rss_mb()
+    start = time.perf_counter()
+    first = None
+    size  = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, time.perf_counter() - start, _peak_rss_mb() - rss, size
+
+
+def main(cells: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_export needs PostgreSQL")
+
+    # The export opens its own sessions: pin their connections to the schema
+    schema_engine = create_engine(engine.url, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    SessionLocal.configure(bind=schema_engine)
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {cells} cells in {time.perf_counter() - start:.1f}s")
+
+            print(f"{'':<18} {'first chunk':>12} {'total':>9} {'peak RSS +':>11} {'size':>9}")
+            for label, fn in (("streamed", streamed), ("buffered", buffered)):
+                for fmt in exports.EXPORT_FORMATS:
+                    first, total, rss, size = _measure(fn(fmt))
+                    print(f"{label + ' ' + fmt:<18} {first * 1000:>10.0f}ms {total:>8.1f}s "
+                          f"{rss:>9.0f}MB {size / 2**20:>7.0f}MB")
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+            SessionLocal.configure(bind=engine)
+            schema_engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else CELLS)
@@ -0,0 +1,119 @@
+"""
+Inventory facets (GET /admin/cells/facets): one count() per status bucket
+plus a brand GROUP BY — what the inventory page used to issue, one list
+call per status — vs inventory_facets (app/services/inventory.py): a
+single GROUP BY brand with a FILTER per bucket, and its cached read.
+PostgreSQL only.
+
+Seeds a throwaway schema (bench_facets) in the app's database — 1M cells,
+two thirds of them graded over 4 brands — then times each, best of 5,
+unfiltered and with a brand + date-range filter.
+
+    python -m benchmarks.bench_facets [cells]
+"""
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models.cell import Cell, CellGrading
+from app.services.inventory import (
+    STATUS_BUCKETS, inventory_facets, inventory_filters, invalidate_facets_cache,
+)
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.battery_pack, app.models.bms, app.models.dispatch  # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters       # noqa: F401,E401
+
+SCHEMA = "bench_facets"
+CELLS  = 1_000_000
+
+_SEED = [
+    """INSERT INTO cells (cell_id, status, ng_count, is_used, registration_date, sorting_date)
+       SELECT 'C' || g, (ARRAY['pass','ng','pending'])[1 + g % 3], 0, g % 7 = 0,
+              timestamp '2026-01-01' + (g / 3) * interval '10 seconds',
+              CASE WHEN g % 4 = 0 THEN timestamp '2026-02-01' END
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot)
+       SELECT 'C' || g, (ARRAY['EVE','LISHEN','BAK','TEN POWER'])[1 + g % 4], 'L' || (g / 5000)
+       FROM generate_series(1, :cells) g WHERE g % 3 <> 2""",
+]
+
+_FILTERS = {
+    "unfiltered":         dict(cell_id=None, status=None, brand=None, lot=None, date_from=None, date_to=None),
+    "brand + date range": dict(cell_id=None, status=None, brand="eve", lot=None,
+                               date_from=date(2026, 1, 10), date_to=date(2026, 1, 20)),
+}
+
+
+def legacy_facets(db: Session, **f) -> dict:
+    """A total and one count() per bucket, then the brands — six statements."""
+    def count(status):
+        return db.query(Cell).filter(*inventory_filters(f["cell_id"], status, f["brand"], f["lot"],
+                                                        f["date_from"], f["date_to"])).count()
+    buckets = {b: count(b) for b in STATUS_BUCKETS}
+    brands  = (
+        db.query(CellGrading.brand, func.count())
+          .select_from(Cell)
+          .outerjoin(CellGrading, CellGrading.cell_id == Cell.cell_id)
+          .filter(*inventory_filters(f["cell_id"], None, f["brand"], f["lot"], f["date_from"], f["date_to"]))
+          .group_by(CellGrading.brand)
+          .all()
+    )
+    return {"total": count(None), "status": buckets, "brands": dict(brands)}
+
+
+def _best(fn, repeat: int = 5, cold: bool = False) -> tuple:
+    times = []
+    for _ in range(repeat):
+        if cold:
+            invalidate_facets_cache()
+        start  = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(cells: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_facets needs PostgreSQL")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {cells} cells in {time.perf_counter() - start:.1f}s")
+
+            db = Session(bind=conn)
+            for label, f in _FILTERS.items():
+                legacy, t_legacy = _best(lambda: legacy_facets(db, **f))
+                facets, t_single = _best(lambda: inventory_facets(db, **f), cold=True)
+                _,      t_cached = _best(lambda: inventory_facets(db, **f))
+                assert legacy["total"] == facets["total"] and legacy["status"] == facets["status"], (legacy, facets)
+                assert legacy["brands"] == {b["brand"]: b["cells"] for b in facets["brands"]}, (legacy, facets)
+
+                print(f"{label} ({facets['total']} cells)")
+                print(f"  {'6 statements (count per bucket)':<38} {t_legacy * 1000:>9.2f}ms")
+                print(f"  {'1 GROUP BY … FILTER':<38} {t_single * 1000:>9.2f}ms")
+                print(f"  {'cached':<38} {t_cached * 1000:>9.3f}ms")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else CELLS)
@@ -0,0 +1,156 @@
+"""
+Columnar grading/sorting engine vs the previous df.iterrows() loop.
+
+Pure in-memory comparison — no database. The existing DB state is simulated
+with a dict of ~50% known cells (a third of them already "pass").
+
+    python -m benchmarks.bench_grading_engine [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.grading_engine import (
+    apply_grading_state, clean_str, evaluate_sorting,
+    grading_detail_records, reduce_grading_rows,
+)
+
+SIZES = [10_000, 40_000, 200_000]
+
+
+# ── Synthetic machine exports ─────────────────────────────────────────────────
+
+def make_grading(n: int, seed: int = 0) -> pd.DataFrame:
+    r = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Cell ID":                   r.integers(1, n, n).astype(float),
+        "final Result":              r.choice(["PASS", "NG"], n, p=[0.9, 0.1]),
+        "Discharging Capacity(mAh)": r.normal(2900, 40, n),
+        "Date":                      pd.Timestamp("2026-01-01") + pd.to_timedelta(r.integers(0, 1000, n), unit="min"),
+        "Lot":                       r.choice([101.0, 102.0, 103.0], n),
+        "Brand":                     r.choice(["TEN POWER", "EVE", "LISHEN"], n),
+        "Specification":             "18650 3000mAh",
+        "OCV Voltage(mV)":           r.normal(3600, 5, n),
+        "Upper cut off(mV)":         4200.0,
+        "Lower cut off(mV)":         2750.0,
+        "Result":                    "PASS",
+        "Final SOC(mAh)":            r.normal(1500, 20, n),
+        "SOC Result":                "PASS",
+        "Final CV Capacity":         r.normal(100, 3, n),
+    })
+
+
+def make_sorting(n: int, seed: int = 1) -> pd.DataFrame:
+    r = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Cell ID":  r.integers(1, n, n).astype(float),
+        "IR VALUE": np.where(r.random(n) < 0.02, np.nan, r.normal(18, 0.5, n)),
+        "VOLTAGE":  r.normal(3.6, 0.01, n),
+        "Date":     pd.Timestamp("2026-01-02"),
+    })
+
+
+def make_state(n: int, seed: int = 2) -> dict:
+    r = np.random.default_rng(seed)
+    ids = np.unique(r.integers(1, n, n // 2))
+    return {
+        str(i): {"status": s, "ng_count": 0}
+        for i, s in zip(ids, r.choice(["pass", "ng", "pending"], len(ids)))
+    }
+
+
+# ── Previous implementation (row loop, DB replaced by dicts) ──────────────────
+
+def legacy_grading(df: pd.DataFrame, state: dict):
+    df = df.dropna(subset=["Cell ID"]).replace({np.nan: None})
+    df["Cell ID"] = df["Cell ID"].apply(lambda x: clean_str(x) if pd.notna(x) else None)
+    cells   = {k: dict(v) for k, v in state.items()}
+    details = {}
+    summary = {"auto_registered": 0, "updated": 0, "skipped": 0, "errors": 0}
+    for _, row in df.iterrows():
+        cell_id = clean_str(row["Cell ID"])
+        cell    = cells.get(cell_id)
+        is_new  = cell is None
+        if is_new:
+            cell = cells[cell_id] = {"status": "pending", "ng_count": 0}
+        if cell["status"] == "pass":
+            summary["skipped"] += 1
+        else:
+            if str(row.get("final Result", "")).strip().upper() == "PASS":
+                cell["status"] = "pass"
+            else:
+                cell["status"]    = "ng"
+                cell["ng_count"] += 1
+            cell["capacity"]       = row.get("Discharging Capacity(mAh)")
+            cell["last_test_date"] = row.get("Date")
+            summary["auto_registered" if is_new else "updated"] += 1
+        details[cell_id] = {
+            "test_date":     row.get("Date"),
+            "lot":           clean_str(row.get("Lot")),
+            "brand":         clean_str(row.get("Brand")),
+            "specification": clean_str(row.get("Specification")),
+            "result":        clean_str(row.get("Result", "")),
+            "soc_result":    clean_str(row.get("SOC Result", "")),
+            "final_result":  clean_str(row.get("final Result", "")),
+        }
+    return summary
+
+
+def legacy_sorting(df: pd.DataFrame, state: dict):
+    df = df.copy()
+    df["Cell ID"] = df["Cell ID"].apply(lambda x: clean_str(x) if pd.notna(x) else None)
+    df = df[df["Cell ID"].notna()]
+    summary = {"sorted": 0, "not_graded": 0, "not_found": 0, "missing_data": 0, "errors": 0}
+    for _, row in df.iterrows():
+        cell = state.get(clean_str(row["Cell ID"]))
+        if not cell:
+            summary["not_found"] += 1
+        elif cell["status"] != "pass":
+            summary["not_graded"] += 1
+        elif pd.isna(row.get("IR VALUE")) or pd.isna(row.get("VOLTAGE")):
+            summary["missing_data"] += 1
+        else:
+            float(row["IR VALUE"]), float(row["VOLTAGE"])
+            summary["sorted"] += 1
+    return summary
+
+
+# ── Columnar engine ───────────────────────────────────────────────────────────
+
+def engine_grading(df: pd.DataFrame, state: dict):
+    batch    = reduce_grading_rows(df)
+    existing = pd.DataFrame.from_dict(state, orient="index")
+    changes  = apply_grading_state(batch, existing)
+    grading_detail_records(batch)
+    return changes.summary
+
+
+def engine_sorting(df: pd.DataFrame, state: dict):
+    return evaluate_sorting(df, {k: v["status"] for k, v in state.items()}).summary
+
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print(f"{'rows':>8}  {'export':<8} {'row loop':>10} {'columnar':>10} {'speedup':>8}")
+    for n in sizes:
+        state = make_state(n)
+        for name, make, legacy, engine in (
+            ("grading", make_grading, legacy_grading, engine_grading),
+            ("sorting", make_sorting, legacy_sorting, engine_sorting),
+        ):
+            df = make(n)
+            t_old, s_old = _time(legacy, df.copy(), state)
+            t_new, s_new = _time(engine, df.copy(), state)
+            assert s_old == s_new, (name, s_old, s_new)
+            print(f"{n:>8}  {name:<8} {t_old:>9.3f}s {t_new:>9.3f}s {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,124 @@
+"""
+Admin cell inventory paging: the previous count + OFFSET query vs keyset
+pagination on (registration_date, cell_id) (GET /admin/cells/inventory).
+PostgreSQL only.
+
+Seeds a throwaway schema (bench_inventory) in the app's database — 1M
+cells, three per registration timestamp — then times one page at
+increasing depths both ways. Keyset pages are reached with the cursor of
+the row just before them, as a client following next_cursor would. The cached total is not timed (after
+the first request of a filter it costs nothing); the legacy column includes
+its count(*), which it ran on every page.
+
+    python -m benchmarks.bench_inventory [cells]
+"""
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.pagination import encode_cursor
+from app.database import Base, engine
+from app.models.cell import Cell
+from app.routers.admin_router import get_cell_inventory
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.battery_pack, app.models.bms, app.models.dispatch  # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters       # noqa: F401,E401
+
+SCHEMA    = "bench_inventory"
+CELLS     = 1_000_000
+PAGE_SIZE = 20
+DEPTHS    = (1, 100, 5_000, 25_000)   # page numbers
+
+_SEED = [
+    """INSERT INTO cells (cell_id, status, ng_count, is_used, registration_date)
+       SELECT 'C' || g, (ARRAY['pass','ng','pending'])[1 + g % 3], g % 2, g % 7 = 0,
+              timestamp '2026-01-01' + (g / 3) * interval '10 seconds'
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot)
+       SELECT 'C' || g, (ARRAY['EVE','LISHEN','BAK'])[1 + g % 3], 'L' || (g / 5000)
+       FROM generate_series(1, :cells) g WHERE g % 2 = 0""",
+]
+
+
+def legacy_page(db: Session, page: int) -> list:
+    """What get_cell_inventory used to run per page: count(*) + OFFSET."""
+    query = db.query(Cell)
+    query.count()
+    items = (
+        query.options(joinedload(Cell.gradings))
+        .order_by(Cell.registration_date.desc())
+        .offset((page - 1) * PAGE_SIZE)
+        .limit(PAGE_SIZE)
+        .all()
+    )
+    return [c.cell_id for c in items]
+
+
+def keyset_page(db: Session, cursor) -> list:
+    data = get_cell_inventory(
+        page=1, page_size=PAGE_SIZE, cursor=cursor, include_total=False,
+        cell_id=None, status=None, brand=None, date_from=None, date_to=None, db=db,
+    )["data"]
+    return [item["cell_id"] for item in data["items"]]
+
+
+def _best(fn, repeat: int = 5) -> tuple:
+    times = []
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(cells: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_inventory needs PostgreSQL")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {cells} cells in {time.perf_counter() - start:.1f}s")
+
+            db = Session(bind=conn)
+            print(f"{'page':>8} {'count+OFFSET':>14} {'keyset':>10}")
+            for page in DEPTHS:
+                if (page - 1) * PAGE_SIZE >= cells:
+                    break
+                # Cursor of the last row of the previous page
+                cursor = None
+                if page > 1:
+                    prev = (
+                        db.query(Cell.registration_date, Cell.cell_id)
+                        .order_by(Cell.registration_date.desc(), Cell.cell_id.desc())
+                        .offset((page - 1) * PAGE_SIZE - 1).limit(1).one()
+                    )
+                    cursor = encode_cursor(*prev)
+
+                old, t_old = _best(lambda: legacy_page(db, page))
+                new, t_new = _best(lambda: keyset_page(db, cursor))
+                # The legacy order has no tie-breaker, so rows may differ within ties
+                assert len(old) == len(new) == PAGE_SIZE
+                print(f"{page:>8} {t_old * 1000:>12.1f}ms {t_new * 1000:>8.1f}ms")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else CELLS)
@@ -0,0 +1,87 @@
+"""
+PDI batch parsing (app/core/parse_pool.py): thread pool vs process pool.
+
+"thread" is the previous approach (a thread pool in the web process);
+"process" sends raw bytes to forkserver workers and gets column arrays
+back. openpyxl holds the GIL, so the thread backend stays near single-core
+speed while the process backend scales with PARSE_WORKERS — on a 1-CPU
+machine both land at about the same time, the process backend paying a
+small IPC overhead.
+
+Each backend is warmed first (workers started, modules imported), as the
+app does at startup.
+
+    python -m benchmarks.bench_pdi_parse [files] [workers]
+"""
+import io
+import os
+import sys
+import time
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from app.core.parse_pool import ParsePool
+from app.services.upload_reader import PDI_EXPORT, parse_export_columns
+
+PDI_FILES = 250
+
+
+def make_pdi(r) -> bytes:
+    buf = io.BytesIO()
+    pd.DataFrame({
+        "Internal SN":                        [f"MV{r.integers(10**7, 10**8)}"],
+        "Time":                               [pd.Timestamp("2026-01-04 10:00")],
+        "Voltage(V)":                         [54.2],
+        "Resistance(m¦¸)":                    [12.5],
+        "Continuous Charging Current(A)":     [10.0],
+        "Continuous Charging Voltage(V)":     [58.4],
+        "Continuous Discharging Current(A)":  [30.0],
+        "Continuous Discharging Voltage(V)":  [52.0],
+        "Short circuit protection time (uS)": [180],
+        "Test Result":                        ["Finished PASS"],
+    }).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def parse_all(pool: ParsePool, files: list) -> list:
+    names = [f"pdi_{i}.xlsx" for i in range(len(files))]
+    return [
+        pd.DataFrame(columns).replace({np.nan: None})
+        for columns, _ in pool.map(parse_export_columns, files, repeat(PDI_EXPORT), names)
+    ]
+
+
+def _best(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(n_files: int, workers: int):
+    r     = np.random.default_rng(0)
+    files = [make_pdi(r) for _ in range(n_files)]
+
+    print(f"{n_files} PDI files, {workers} workers, {os.cpu_count()} CPUs")
+    print(f"{'backend':<10} {'seconds':>8} {'files/s':>9}")
+    for backend in ("thread", "process"):
+        pool = ParsePool(backend, workers, max_tasks_per_child=200)
+        pool.warm()
+        try:
+            frames  = parse_all(pool, files)
+            assert len(frames) == n_files and all(len(df) == 1 for df in frames)
+            elapsed = _best(lambda: parse_all(pool, files))
+        finally:
+            pool.shutdown()
+        print(f"{backend:<10} {elapsed:>7.3f}s {n_files / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else PDI_FILES,
+        int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 2),
+    )
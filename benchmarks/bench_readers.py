@@ -0,0 +1,186 @@
+"""
+Schema reader (app/services/upload_reader.py) vs plain pd.read_excel, per
+machine export type.
+
+"read_excel" is the previous parse path: pd.read_excel on the bytes, then the
+id / header repair each router applied afterwards. "read_export" is the
+openpyxl read-only schema reader, which returns ids as clean strings and the
+other columns already typed.
+
+Sheets carry exactly the columns the routers use; exports with extra
+columns gain more, since those cells are never typed or copied.
+
+Before timing, checks that ids survive the CSV path verbatim: a leading-zero
+Cell ID, and a 17-digit one in a column that also has a blank (which would
+make pandas infer float64 and round it).
+
+    python -m benchmarks.bench_readers [grading_rows]
+"""
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.grading_engine import clean_str
+from app.services.upload_reader import (
+    BULK_LINK_EXPORT, GRADING_EXPORT, PACK_TEST_EXPORT, PDI_EXPORT, SORTING_EXPORT,
+    iter_upload_chunks, read_export,
+)
+
+GRADING_ROWS = 40_000
+PDI_FILES    = 250
+
+
+def _xlsx(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+# ── Synthetic exports ─────────────────────────────────────────────────────────
+
+def make_grading(n: int, r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Cell ID":                   r.integers(1_000_000, 9_999_999, n),
+        "Lot":                       r.choice([101, 102, 103], n),
+        "Brand":                     r.choice(["TEN POWER", "EVE", "LISHEN"], n),
+        "Specification":             "18650 3000mAh",
+        "OCV Voltage(mV)":           r.normal(3600, 5, n).round(1),
+        "Upper cut off(mV)":         4200,
+        "Lower cut off(mV)":         2750,
+        "Discharging Capacity(mAh)": r.normal(2900, 40, n).round(1),
+        "Result":                    "PASS",
+        "Final SOC(mAh)":            r.normal(1500, 20, n).round(1),
+        "SOC Result":                "PASS",
+        "Final CV Capacity":         r.normal(100, 3, n).round(1),
+        "final Result":              r.choice(["PASS", "NG"], n, p=[0.9, 0.1]),
+        "Date":                      pd.Timestamp("2026-01-01") + pd.to_timedelta(r.integers(0, 1000, n), unit="min"),
+    })
+
+
+def make_sorting(n: int, r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Cell ID":  r.integers(1_000_000, 9_999_999, n),
+        "IR VALUE": np.where(r.random(n) < 0.02, np.nan, r.normal(18, 0.5, n).round(2)),
+        "VOLTAGE":  r.normal(3.6, 0.01, n).round(3),
+        "Date":     pd.Timestamp("2026-01-02"),
+    })
+
+
+def make_pack_test(n: int, r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Barcode":                  r.integers(10_000_000, 99_999_999, n),
+        "Specification":            "60V 29Ah",
+        "Cell type":                "NMC",
+        "Actual Capacity(Ah)":      r.normal(29, 0.2, n).round(2),
+        "OCV Voltage(V)":           r.normal(60, 0.1, n).round(2),
+        "Upper cut off(V)":         67.2,
+        "Lower cut off(V)":         45.5,
+        "Discharging Capacity(Ah)": r.normal(29, 0.2, n).round(2),
+        "Result":                   "PASS",
+        "Final idle Different":     r.normal(0.01, 0.002, n).round(4),
+        "idle diff. Result":        "PASS",
+        "Final Voltage":            r.normal(60, 0.1, n).round(2),
+        "final Result":             r.choice(["PASS", "FAIL"], n, p=[0.95, 0.05]),
+        "Date":                     pd.Timestamp("2026-01-03"),
+    })
+
+
+def make_pdi(r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Internal SN":                        [f"MV{r.integers(10**7, 10**8)}"],
+        "Time":                               [pd.Timestamp("2026-01-04 10:00")],
+        "Voltage(V)":                         [54.2],
+        "Resistance(m¦¸)":                    [12.5],
+        "Continuous Charging Current(A)":     [10.0],
+        "Continuous Charging Voltage(V)":     [58.4],
+        "Continuous Discharging Current(A)":  [30.0],
+        "Continuous Discharging Voltage(V)":  [52.0],
+        "Short circuit protection time (uS)": [180],
+        "Test Result":                        ["Finished PASS"],
+    })
+
+
+def make_bulk_link(n: int, r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "battery_id": r.integers(10_000_000, 99_999_999, n),
+        "model_name": r.choice(["MV-48V-26AH", "MV-60V-29AH"], n),
+    })
+
+
+# ── Previous parse path per export ────────────────────────────────────────────
+
+def old_ids(data: bytes, id_col: str) -> pd.DataFrame:
+    df = pd.read_excel(io.BytesIO(data))
+    df[id_col] = df[id_col].apply(lambda x: clean_str(x) if pd.notna(x) else None)
+    return df
+
+
+def old_stripped(data: bytes, lower: bool = False) -> pd.DataFrame:
+    df = pd.read_excel(io.BytesIO(data))
+    df.columns = df.columns.str.strip().str.lower() if lower else df.columns.str.strip()
+    return df
+
+
+def check_csv_ids() -> None:
+    """CSV ids come back exactly as written, whole-file and chunked."""
+    ids = ["00123", None, "12345678901234567"]
+    csv = "Cell ID,IR VALUE,VOLTAGE,Date\n" + "".join(
+        f"{cell_id or ''},18.5,3.61,2026-01-01\n" for cell_id in ids
+    )
+    whole   = read_export(io.BytesIO(csv.encode()), SORTING_EXPORT, "sorting.csv")
+    chunked = pd.concat(iter_upload_chunks(io.BytesIO(csv.encode()), "sorting.csv", 2, SORTING_EXPORT))
+    for df in (whole, chunked):
+        assert df["Cell ID"].tolist() == ids, df["Cell ID"].tolist()
+        assert df["IR VALUE"].dtype == float, df["IR VALUE"].dtype
+    print("CSV ids: leading zeros and 17-digit ids preserved")
+
+
+def _best(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(grading_rows: int):
+    check_csv_ids()
+    r = np.random.default_rng(0)
+
+    grading   = _xlsx(make_grading(grading_rows, r))
+    sorting   = _xlsx(make_sorting(grading_rows, r))
+    pack_test = _xlsx(make_pack_test(2_000, r))
+    bulk_link = _xlsx(make_bulk_link(5_000, r))
+    pdi_files = [_xlsx(make_pdi(r)) for _ in range(PDI_FILES)]
+
+    cases = [
+        (f"grading ({grading_rows} rows)",
+         lambda: old_ids(grading, "Cell ID"),
+         lambda: read_export(io.BytesIO(grading), GRADING_EXPORT)),
+        (f"sorting ({grading_rows} rows)",
+         lambda: old_ids(sorting, "Cell ID"),
+         lambda: read_export(io.BytesIO(sorting), SORTING_EXPORT)),
+        ("pack test (2000 rows)",
+         lambda: old_stripped(pack_test),
+         lambda: read_export(io.BytesIO(pack_test), PACK_TEST_EXPORT)),
+        ("bulk-link (5000 rows)",
+         lambda: old_stripped(bulk_link, lower=True),
+         lambda: read_export(io.BytesIO(bulk_link), BULK_LINK_EXPORT)),
+        (f"PDI ({PDI_FILES} x 1-row files)",
+         lambda: [old_stripped(f) for f in pdi_files],
+         lambda: [read_export(io.BytesIO(f), PDI_EXPORT) for f in pdi_files]),
+    ]
+
+    print(f"{'export':<28} {'read_excel':>11} {'read_export':>12} {'speedup':>8}")
+    for name, old, new in cases:
+        t_old = _best(old)
+        t_new = _best(new)
+        print(f"{name:<28} {t_old:>10.3f}s {t_new:>11.3f}s {t_old / t_new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else GRADING_ROWS)
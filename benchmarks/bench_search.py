@@ -0,0 +1,143 @@
+"""
+Admin list search (app/services/search.py): EXPLAIN plans and timings of
+the ID / text filters with the search indexes (ensure_search_indexes)
+against the same predicates without them. PostgreSQL only; the trigram
+rows need the pg_trgm extension (contrib) and are skipped without it.
+
+Seeds a throwaway schema (bench_search) in the app's database — 1M cells
+with gradings, 200k batteries with a BMS and an invoice — then, per
+search, prints the plan's scan nodes and the best of 5 runs.
+
+    python -m benchmarks.bench_search [cells] [batteries]
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.core.schema_upgrades import SEARCH_INDEXES, ensure_search_indexes
+from app.database import Base, engine
+from app.models.battery_pack import Battery
+from app.models.bms import BMS
+from app.models.cell import Cell, CellGrading
+from app.models.dispatch import Dispatch
+from app.services.search import text_search
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters  # noqa: F401,E401
+
+SCHEMA    = "bench_search"
+CELLS     = 1_000_000
+BATTERIES = 200_000
+
+_SEED = [
+    """INSERT INTO battery_models (model_id, category, series_count, parallel_count, cell_type, welding_type)
+       VALUES ('MV-48V-26AH', 'e-Rickshaw', 13, 10, 'NMC', 'SPOT')""",
+    """INSERT INTO cells (cell_id, status, ng_count, registration_date)
+       SELECT 'MX' || lpad(g::text, 8, '0'), 'pass', 0, now()
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO cell_gradings (cell_id, brand, lot)
+       SELECT 'MX' || lpad(g::text, 8, '0'), (ARRAY['EVE','LISHEN','BAK'])[1 + g % 3], 'LOT-' || (g / 2000)
+       FROM generate_series(1, :cells) g""",
+    """INSERT INTO batteries (battery_id, model_id, overall_status)
+       SELECT 'BT' || lpad(g::text, 7, '0'), 'MV-48V-26AH', 'DISPATCHED'
+       FROM generate_series(1, :batteries) g""",
+    """INSERT INTO bms_inventory (bms_id, battery_id, is_used)
+       SELECT 'BMS' || md5(g::text), 'BT' || lpad(g::text, 7, '0'), TRUE
+       FROM generate_series(1, :batteries) g""",
+    """INSERT INTO dispatch_records (battery_id, customer_name, invoice_id, invoice_date)
+       SELECT 'BT' || lpad(g::text, 7, '0'), 'Customer', 'INV/25-26/' || g, current_date
+       FROM generate_series(1, :batteries) g""",
+]
+
+# (label, query, needs pg_trgm)
+_SEARCHES = [
+    ("cell_id substring",    select(Cell.cell_id).where(text_search(Cell.cell_id, "0042137")), True),
+    ("cell_id prefix",       select(Cell.cell_id).where(text_search(Cell.cell_id, "mx0042*")), False),
+    ("battery_id substring", select(Battery.battery_id).where(text_search(Battery.battery_id, "01234")), True),
+    ("battery_id prefix",    select(Battery.battery_id).where(text_search(Battery.battery_id, "BT00123*")), False),
+    ("bms_id substring",     select(BMS.bms_id).where(text_search(BMS.bms_id, "c4ca42")), True),
+    ("invoice_id prefix",    select(Dispatch.invoice_id).where(text_search(Dispatch.invoice_id, "inv/25-26/1234*")), False),
+    ("lot substring",        select(CellGrading.cell_id).where(text_search(CellGrading.lot, "LOT-123")), True),
+    ("brand substring",      select(func.count()).where(text_search(CellGrading.brand, "lish")), True),
+]
+
+
+def _sql(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _scan_nodes(conn, sql: str) -> str:
+    plan  = [row[0] for row in conn.exec_driver_sql("EXPLAIN " + sql.replace("%", "%%"))]
+    scans = [line.strip().lstrip("-> ").split("  (")[0] for line in plan if "Scan" in line]
+    return "; ".join(scans)
+
+
+def _best(db: Session, query, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(query).all()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _drop_search_indexes(conn):
+    for (table, column), kinds in SEARCH_INDEXES.items():
+        for kind in kinds:
+            conn.execute(text(f"DROP INDEX IF EXISTS ix_{kind}_{table}_{column}"))
+
+
+def main(cells: int, batteries: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_search needs PostgreSQL")
+
+    # ensure_search_indexes opens its own connections: pin them to the schema
+    schema_engine = create_engine(engine.url, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.commit()
+        try:
+            conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"cells": cells, "batteries": batteries})
+            conn.commit()
+            print(f"seeded {cells} cells / {batteries} batteries in {time.perf_counter() - start:.1f}s")
+
+            trigram = ensure_search_indexes(schema_engine)
+            schema_engine.dispose()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            if not trigram:
+                print("pg_trgm not available: substring searches skipped")
+
+            db       = Session(bind=conn)
+            searches = [(label, query) for label, query, needs in _SEARCHES if trigram or not needs]
+
+            indexed = {}
+            for label, query in searches:
+                indexed[label] = (_best(db, query), _scan_nodes(conn, _sql(query)))
+
+            _drop_search_indexes(conn)
+            conn.commit()
+            print(f"{'search':<22} {'indexed':>9} {'no index':>9}  plan (indexed)")
+            for label, query in searches:
+                t_idx, plan = indexed[label]
+                print(f"{label:<22} {t_idx * 1000:>7.1f}ms {_best(db, query) * 1000:>7.1f}ms  {plan}")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CELLS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else BATTERIES,
+    )
@@ -0,0 +1,147 @@
+"""
+Admin traceability paging: the previous joinedload + count + OFFSET +
+pack-result query vs the single keyset / LATERAL statement
+(app/services/traceability.py). PostgreSQL only.
+
+Seeds a throwaway schema (bench_traceability) in the app's database — 300k
+batteries, a PDI report for 90% of them (a retest for every tenth), a BMS,
+pack test and dispatch for most — then times one page at increasing depths
+both ways and checks they show the same batteries. Keyset pages are
+reached with the cursor of the row just before them, as a client following
+next_cursor would; the cached total is not timed.
+
+    python -m benchmarks.bench_traceability [batteries]
+"""
+import sys
+import time
+
+from sqlalchemy import desc, event, text
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.pagination import encode_cursor
+from app.database import Base, engine
+from app.models.battery_pack import Battery
+from app.routers.admin_router import get_battery_traceability
+
+# Every mapped class must be registered before the first query
+import app.models.battery, app.models.bms, app.models.cell, app.models.dispatch   # noqa: F401,E401
+import app.models.pack_test, app.models.pdi, app.models.upload, app.models.counters  # noqa: F401,E401
+
+SCHEMA    = "bench_traceability"
+BATTERIES = 300_000
+PAGE_SIZE = 15
+DEPTHS    = (1, 100, 5_000, 19_000)   # page numbers
+
+_SEED = [
+    """INSERT INTO battery_models (model_id, category, series_count, parallel_count, cell_type, welding_type)
+       VALUES ('MV-48V-26AH', 'e-Rickshaw', 13, 10, 'NMC', 'SPOT')""",
+    """INSERT INTO batteries (battery_id, model_id, had_ng_status, overall_status, created_at)
+       SELECT 'B' || g, 'MV-48V-26AH', g % 17 = 0, (ARRAY['PROD','FG PENDING','DISPATCHED'])[1 + g % 3],
+              timestamp '2026-01-01' + (g / 2) * interval '1 minute'
+       FROM generate_series(1, :batteries) g""",
+    """INSERT INTO pdi_reports (battery_id, test_result, created_at)
+       SELECT 'B' || g, CASE WHEN g % 9 = 0 THEN 'Fail' ELSE 'Finished PASS' END,
+              timestamp '2026-01-02' + g * interval '1 second'
+       FROM generate_series(1, :batteries) g WHERE g % 10 <> 0
+       UNION ALL
+       SELECT 'B' || g, 'Finished PASS', timestamp '2026-03-01' + g * interval '1 second'
+       FROM generate_series(1, :batteries) g WHERE g % 10 = 1""",
+    """INSERT INTO bms_inventory (bms_id, battery_id, is_used)
+       SELECT 'S' || g, 'B' || g, TRUE FROM generate_series(1, :batteries) g WHERE g % 4 <> 0""",
+    """INSERT INTO pack_testing_reports (battery_id, final_result)
+       SELECT 'B' || g, CASE WHEN g % 7 = 0 THEN 'FAIL' ELSE 'PASS' END
+       FROM generate_series(1, :batteries) g WHERE g % 3 <> 0""",
+    """INSERT INTO dispatch_records (battery_id, customer_name, invoice_id, invoice_date)
+       SELECT 'B' || g, 'Customer ' || (g % 50), 'INV' || g, date '2026-04-01'
+       FROM generate_series(1, :batteries) g WHERE g % 3 = 2""",
+]
+
+
+def legacy_page(db: Session, page: int) -> list:
+    """What get_battery_traceability used to run per page."""
+    query = db.query(Battery).options(
+        joinedload(Battery.pdi_reports),
+        joinedload(Battery.bms_record),
+        joinedload(Battery.dispatch_record),
+    )
+    query.count()
+    batteries = query.order_by(desc(Battery.created_at)).offset((page - 1) * PAGE_SIZE).limit(PAGE_SIZE).all()
+    db.execute(
+        text("SELECT battery_id, final_result FROM pack_testing_reports WHERE battery_id = ANY(:ids)"),
+        {"ids": [b.battery_id for b in batteries]},
+    ).fetchall()
+    return sorted(b.battery_id for b in batteries)
+
+
+def keyset_page(db: Session, cursor) -> list:
+    data = get_battery_traceability(
+        page=1, page_size=PAGE_SIZE, cursor=cursor, include_total=False,
+        battery_id=None, status=None, date_from=None, date_to=None, db=db,
+    )["data"]
+    return sorted(item["battery_id"] for item in data["items"])
+
+
+def _timed(fn, repeat: int = 5) -> tuple:
+    statements = []
+    listener   = lambda *a, **k: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        times = []
+        for _ in range(repeat):
+            statements.clear()
+            start  = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return result, min(times), len(statements)
+
+
+def main(batteries: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("bench_traceability needs PostgreSQL")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.commit()
+        try:
+            Base.metadata.create_all(conn)
+            start = time.perf_counter()
+            for sql in _SEED:
+                conn.execute(text(sql), {"batteries": batteries})
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            print(f"seeded {batteries} batteries in {time.perf_counter() - start:.1f}s")
+
+            db = Session(bind=conn)
+            print(f"{'page':>8} {'legacy':>16} {'keyset + LATERAL':>20}")
+            for page in DEPTHS:
+                if (page - 1) * PAGE_SIZE >= batteries:
+                    break
+                cursor = None
+                if page > 1:
+                    prev = (
+                        db.query(Battery.created_at, Battery.battery_id)
+                        .order_by(Battery.created_at.desc(), Battery.battery_id.desc())
+                        .offset((page - 1) * PAGE_SIZE - 1).limit(1).one()
+                    )
+                    cursor = encode_cursor(*prev)
+
+                old, t_old, n_old = _timed(lambda: legacy_page(db, page))
+                new, t_new, n_new = _timed(lambda: keyset_page(db, cursor))
+                # created_at ties (two batteries per minute) may straddle a page
+                # boundary in the legacy order, which has no tie-breaker
+                assert len(set(old) ^ set(new)) <= 2, (old, new)
+                print(f"{page:>8} {t_old * 1000:>8.1f}ms ({n_old} st) {t_new * 1000:>10.1f}ms ({n_new} st)")
+            db.close()
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else BATTERIES)